@@ -0,0 +1,85 @@
+"""
+Compares the construction time of the fractional LP with row-wise expressions
+(legacy) and with sparse matrices (default) on square grids of increasing size.
+The instance is compiled before timing, such that only the model building counts.
+Besides the total build time, the time for adding the coverage and flow constraints
+is reported separately (the variables and the objective are the same for both).
+"""
+
+import time
+
+import networkx as nx
+
+from pcpptc.grid_solver.cycle_cover.fractional_grid_solver.linear_program import (
+    LinearProgram,
+)
+from pcpptc.grid_solver.grid_instance import (
+    CoverageNecessities,
+    PenaltyCoverage,
+    PointBasedInstance,
+    PointVertex,
+    SimpleTouringCosts,
+)
+
+
+def grid_instance(n: int) -> PointBasedInstance:
+    points = {
+        (x, y): PointVertex(float(x), float(y)) for x in range(n) for y in range(n)
+    }
+    graph = nx.relabel_nodes(nx.grid_2d_graph(n, n), points)
+    coverage_necessities = CoverageNecessities(PenaltyCoverage(3.0))
+    return PointBasedInstance(
+        graph,
+        SimpleTouringCosts(turn_factor=2.0, distance_factor=1.0),
+        coverage_necessities,
+    )
+
+
+CONSTRAINT_METHODS = (
+    "_build_coverage_constraints",
+    "_build_flow_constraints",
+    "_build_coverage_constraints_from_matrix",
+    "_build_flow_constraints_from_matrix",
+)
+constraint_time = [0.0]
+
+
+def _timed(f):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = f(*args, **kwargs)
+        constraint_time[0] += time.perf_counter() - start
+        return result
+
+    return wrapper
+
+
+for name in CONSTRAINT_METHODS:
+    setattr(LinearProgram, name, _timed(getattr(LinearProgram, name)))
+
+
+def build_time(instance: PointBasedInstance, matrix_form: bool):
+    constraint_time[0] = 0.0
+    start = time.perf_counter()
+    lp = LinearProgram(instance, matrix_form=matrix_form)
+    lp.model.update()
+    return time.perf_counter() - start, constraint_time[0]
+
+
+if __name__ == "__main__":
+    print(
+        "vertices, passages, total legacy[s], total matrix[s],"
+        " constraints legacy[s], constraints matrix[s], speedup"
+    )
+    for n in (25, 50, 100, 150):
+        instance = grid_instance(n)
+        compiled = instance.compiled()
+        compiled.passages, compiled.coverage_matrix(), compiled.flow_matrix()
+        legacy, legacy_constraints = build_time(instance, matrix_form=False)
+        matrix, matrix_constraints = build_time(instance, matrix_form=True)
+        print(
+            f"{len(compiled)}, {compiled.number_of_passages}, "
+            f"{legacy:.3f}, {matrix:.3f}, "
+            f"{legacy_constraints:.3f}, {matrix_constraints:.3f}, "
+            f"{legacy_constraints / matrix_constraints:.1f}"
+        )
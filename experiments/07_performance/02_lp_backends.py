@@ -0,0 +1,53 @@
+"""
+Compares the LP backends (Gurobi, HiGHS) on the grids of the experiment instances:
+runtime and objective of the fractional LP and of the integralizing branch and bound.
+A backend that fails (e.g., because of a size-limited license) is reported as such.
+
+Usage: python 02_lp_backends.py [number_of_instances] [bnb_steps]
+"""
+
+import os
+import sys
+import time
+
+from pcpptc import PolygonInstance
+from pcpptc.grid_solver.cycle_cover.fractional_grid_solver import (
+    FractionalGridSolver,
+    IntegralizingFractionalSolver,
+)
+from pcpptc.grid_solver.lp_backend import LP_BACKENDS
+from pcpptc.instance_converter import RegularHexagonal
+
+INSTANCES = os.path.join(os.path.dirname(__file__), "../01_grid/instances/")
+
+
+def measure(solver, instance):
+    start = time.perf_counter()
+    try:
+        _, objective = solver(instance)
+    except Exception as e:  # e.g. license errors
+        return f"failed ({type(e).__name__})", ""
+    return f"{objective:.4f}", f"{time.perf_counter() - start:.3f}"
+
+
+if __name__ == "__main__":
+    number_of_instances = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    bnb_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print("instance, vertices, solver, backend, objective, time[s]")
+    for i in range(number_of_instances):
+        polygon_instance = PolygonInstance.from_json(
+            file_path=os.path.join(INSTANCES, f"{i}.instance.json")
+        )
+        instance = RegularHexagonal()(polygon_instance)
+        instance.compiled()
+        n = instance.graph.number_of_nodes()
+        for backend in LP_BACKENDS:
+            solvers = {
+                "lp": FractionalGridSolver(lp_backend=backend),
+                f"bnb{bnb_steps}": IntegralizingFractionalSolver(
+                    bnb_steps, lp_backend=backend
+                ),
+            }
+            for name, solver in solvers.items():
+                objective, runtime = measure(solver, instance)
+                print(f"{i}, {n}, {name}, {backend}, {objective}, {runtime}")
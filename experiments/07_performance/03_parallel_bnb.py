@@ -0,0 +1,46 @@
+"""
+Runtime of the integralizing branch and bound with the nodes solved sequentially and
+by a process pool (workers, nodes branched at once) on the grids of the experiment
+instances.
+
+Usage: python 03_parallel_bnb.py [number_of_instances] [bnb_steps] [backend]
+"""
+
+import os
+import sys
+import time
+
+from pcpptc import PolygonInstance
+from pcpptc.grid_solver.cycle_cover.fractional_grid_solver import (
+    IntegralizingFractionalSolver,
+)
+from pcpptc.instance_converter import RegularHexagonal
+
+INSTANCES = os.path.join(os.path.dirname(__file__), "../01_grid/instances/")
+CONFIGURATIONS = [(1, 1), (2, 1), (8, 4), (32, 16)]  # (workers, parallel nodes)
+
+if __name__ == "__main__":
+    number_of_instances = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    bnb_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    backend = sys.argv[3] if len(sys.argv) > 3 else "highs"
+    print("instance, vertices, workers, parallel_nodes, objective, time[s]")
+    for i in range(number_of_instances):
+        polygon_instance = PolygonInstance.from_json(
+            file_path=os.path.join(INSTANCES, f"{i}.instance.json")
+        )
+        instance = RegularHexagonal()(polygon_instance)
+        instance.compiled()
+        n = instance.graph.number_of_nodes()
+        for workers, parallel_nodes in CONFIGURATIONS:
+            solver = IntegralizingFractionalSolver(
+                bnb_steps,
+                lp_backend=backend,
+                workers=workers,
+                parallel_nodes=parallel_nodes,
+            )
+            start = time.perf_counter()
+            _, objective = solver(instance)
+            runtime = time.perf_counter() - start
+            print(
+                f"{i}, {n}, {workers}, {parallel_nodes}, {objective:.4f}, {runtime:.3f}"
+            )
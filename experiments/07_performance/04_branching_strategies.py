@@ -0,0 +1,54 @@
+"""
+Counts the BnB steps each branching strategy of the integralizing branch and bound
+needs until the best node is integral, on the partial-coverage instances
+(see ../05_partial_coverage). Runs that do not become integral within the step
+limit are reported with `integral=False`.
+
+Usage: python 04_branching_strategies.py [instance_dir] [max_steps] [backend]
+"""
+
+import os
+import sys
+import time
+
+from pcpptc import PolygonInstance
+from pcpptc.grid_solver.cycle_cover.fractional_grid_solver.integralizer import (
+    IntegralizingBnBTree,
+    IntGapCostStrategy,
+    PseudoCostStrategy,
+    StrongBranchingStrategy,
+)
+from pcpptc.instance_converter import RegularHexagonal
+
+INSTANCES = os.path.join(
+    os.path.dirname(__file__), "../05_partial_coverage/instances2/"
+)
+STRATEGIES = {
+    "int_gap_cost": IntGapCostStrategy,
+    "pseudo_cost": PseudoCostStrategy,
+    "strong_branching": StrongBranchingStrategy,
+}
+
+if __name__ == "__main__":
+    instance_dir = sys.argv[1] if len(sys.argv) > 1 else INSTANCES
+    max_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    backend = sys.argv[3] if len(sys.argv) > 3 else "highs"
+    print("instance, vertices, strategy, steps, integral, objective, time[s]")
+    for f in sorted(os.listdir(instance_dir)):
+        if "instance.json" not in f:
+            continue
+        polygon_instance = PolygonInstance.from_json(
+            file_path=os.path.join(instance_dir, f)
+        )
+        instance = RegularHexagonal(full_coverage=False)(polygon_instance)
+        n = instance.graph.number_of_nodes()
+        for name, strategy in STRATEGIES.items():
+            start = time.perf_counter()
+            bnb = IntegralizingBnBTree(instance, bs=strategy(), lp_backend=backend)
+            while not bnb.is_integral() and bnb.steps < max_steps:
+                bnb.branch()
+            runtime = time.perf_counter() - start
+            print(
+                f"{f.split('.')[0]}, {n}, {name}, {bnb.steps}, {bnb.is_integral()},"
+                f" {bnb.get_objective():.4f}, {runtime:.3f}"
+            )
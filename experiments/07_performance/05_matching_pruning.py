@@ -0,0 +1,57 @@
+"""
+Matching time, number of edges, and matching weight of the atomic strip matching with
+the full edge set and with only the m cheapest transitions per strip end, on the grids
+of the experiment instances. The fractional solution and the atomic strips are
+computed once per instance and shared by all configurations.
+
+Usage: python 05_matching_pruning.py [number_of_instances] [backend]
+"""
+
+import os
+import sys
+import time
+
+from pcpptc import PolygonInstance
+from pcpptc.grid_solver.cycle_cover.atomic_strip_matcher import (
+    AtomicStripMatching,
+    TransitionCostCalculator,
+)
+from pcpptc.grid_solver.cycle_cover.solver import CycleCoverSolver
+from pcpptc.instance_converter import RegularHexagonal
+
+INSTANCES = os.path.join(os.path.dirname(__file__), "../01_grid/instances/")
+CANDIDATES = [None, 16, 8, 4, 2]  # None: full edge set
+
+if __name__ == "__main__":
+    number_of_instances = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    backend = sys.argv[2] if len(sys.argv) > 2 else "highs"
+    print("instance, vertices, candidates, edges, restored_points, weight, time[s]")
+    for i in range(number_of_instances):
+        polygon_instance = PolygonInstance.from_json(
+            file_path=os.path.join(INSTANCES, f"{i}.instance.json")
+        )
+        instance = RegularHexagonal()(polygon_instance)
+        n = instance.graph.number_of_nodes()
+        cc_solver = CycleCoverSolver(adaptive_strips=True, lp_backend=backend)
+        fractional_solution = cc_solver._solve_fractionally(instance)
+        atomic_strips = cc_solver._create_atomic_strips(instance, fractional_solution)
+        for candidates in CANDIDATES:
+            start = time.perf_counter()
+            asm = AtomicStripMatching(
+                instance.compiled(),
+                TransitionCostCalculator(instance.touring_costs),
+                bulk=True,
+                candidates=candidates,
+            )
+            for p in instance.graph.nodes:
+                for o in atomic_strips[p]:
+                    s = asm.create_atomic_strip(p, o.orientation)
+                    if o.is_skippable():
+                        asm.add_skip_penalty(s, o.penalty)
+            asm.solve()
+            runtime = time.perf_counter() - start
+            restored = asm.pruning.restored_points if asm.pruning else 0
+            print(
+                f"{i}, {n}, {candidates}, {asm.number_of_matching_edges}, {restored},"
+                f" {asm.matching_weight:.4f}, {runtime:.3f}"
+            )
@@ -0,0 +1,65 @@
+"""
+Relaxations (expansions of directed edges) and wall time of the shortest path search
+over directed edges with the FIFO queue (label-correcting, legacy) and the priority
+queue (Dijkstra, default), on the grids of the experiment instances. As in the cycle
+connection, the search starts at all directed edges leaving the first cycle of the
+cycle cover. The cycle cover is computed once per instance.
+
+Usage: python 06_dedge_dijkstra.py [number_of_instances] [backend]
+"""
+
+import os
+import sys
+import time
+
+from pcpptc import PolygonInstance
+from pcpptc.grid_solver.cycle_connecting.dedge_dijkstra import (
+    DEdgeDijkstraTree,
+    EdgeCostFunction,
+)
+from pcpptc.grid_solver.cycle_cover.solver import CycleCoverSolver
+from pcpptc.instance_converter import RegularHexagonal
+
+INSTANCES = os.path.join(os.path.dirname(__file__), "../01_grid/instances/")
+QUEUES = ["deque", "heap"]
+
+if __name__ == "__main__":
+    number_of_instances = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    backend = sys.argv[2] if len(sys.argv) > 2 else "highs"
+    print("instance, vertices, sources, queue, relaxations, max_cost_diff, time[s]")
+    for i in range(number_of_instances):
+        polygon_instance = PolygonInstance.from_json(
+            file_path=os.path.join(INSTANCES, f"{i}.instance.json")
+        )
+        instance = RegularHexagonal()(polygon_instance)
+        n = instance.graph.number_of_nodes()
+        cycles = CycleCoverSolver(adaptive_strips=True, lp_backend=backend)(instance)
+        sources = {
+            (v, w)
+            for v in cycles[0].covered_vertices()
+            for w in instance.graph.neighbors(v)
+        }
+        reference = None
+        for queue in QUEUES:
+            start = time.perf_counter()
+            tree = DEdgeDijkstraTree(
+                instance,
+                cost_function=EdgeCostFunction(instance, multiplier=2.0),
+                queue=queue,
+            )
+            for e in sources:
+                tree.update(e, 0.0)
+            tree.propagate()
+            runtime = time.perf_counter() - start
+            costs = [
+                tree.cost(e) for v, w in instance.graph.edges for e in [(v, w), (w, v)]
+            ]
+            if reference is None:
+                reference = costs
+            diff = max(
+                (abs(a - b) for a, b in zip(costs, reference) if a != b), default=0.0
+            )
+            print(
+                f"{i}, {n}, {len(sources)}, {queue}, {tree.relaxations},"
+                f" {diff:.6f}, {runtime:.3f}"
+            )
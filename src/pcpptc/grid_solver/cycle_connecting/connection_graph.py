@@ -0,0 +1,321 @@
+"""
+The connection costs of all cycles of a cycle cover in a single multi-source shortest
+path search, instead of one `VertexPassageShortestPath` per cycle.
+"""
+
+import heapq
+import math
+import typing
+import unittest
+from collections import defaultdict
+
+import networkx as nx
+import numpy as np
+
+from ..grid_instance import (
+    CoverageNecessities,
+    OptionalCoverage,
+    PointBasedInstance,
+    PointVertex,
+    SimpleTouringCosts,
+    VertexPassage,
+)
+from ..grid_solution import (
+    Cycle,
+    FractionalSolution,
+    Validation,
+    create_cycle_solution,
+)
+from .dedge_dijkstra import EdgeCostFunction, line_graph
+
+# The connections are doubled paths, as in `VertexPassageShortestPath`.
+MULTIPLIER = 2.0
+
+
+class CycleConnectionCosts:
+    """
+    Computes the costs of connecting cycles via doubled shortest paths (the same
+    costs as `CycleMerger.estimate_cost`) for all pairs of adjacent cycles at once:
+    1. Every directed edge v->n at a passage of a cycle is a source with the costs of
+       opening the passage towards n.
+    2. A single Dijkstra on the directed edges, in which every edge is labelled with
+       the cycle it has been reached from. This partitions the directed edges into
+       regions of the cycles, like a Voronoi diagram.
+    3. The connection candidates of two cycles A and B are
+       - the direct connections at a vertex used by both,
+       - the paths from A to an edge u->v with v on B, and
+       - the paths from A to u->v concatenated with the reversed paths from B to v->u.
+    Every candidate is the cost of a feasible connection. Only cycles whose regions
+    touch get a connection, which is sufficient for the PCST (as in Mehlhorn's Steiner
+    tree approximation) and keeps the graph sparse.
+
+    The search can be bounded with a radius per cycle: edges reached from a cycle
+    are not expanded further if their costs exceed its radius. With the prizes as
+    radii, every connection that is cheaper than the prize of one of its cycles is
+    still found.
+    """
+
+    def __init__(self, instance: PointBasedInstance, epsilon: float = 1e-4):
+        self._instance = instance
+        self._compiled = compiled = instance.compiled()
+        self._epsilon = epsilon
+        indptr, successors, passages = line_graph(compiled)
+        costs = EdgeCostFunction(instance, multiplier=MULTIPLIER).transition_costs(
+            compiled, successors, passages
+        )
+        # lists, as they are only accessed element-wise
+        self._successor_indptr = indptr.tolist()
+        self._successors = successors.tolist()
+        self._transition_costs = costs.tolist()
+        touring_costs = instance.touring_costs
+        self._passage_costs = compiled.vertex_passage_costs(halving=False)
+        self._turn_costs = (
+            touring_costs.vertex_turn_factors(compiled)[compiled.passage_vertex]
+            * compiled.passage_turn_angles
+        )
+        self._doubled_distances = (
+            MULTIPLIER
+            * touring_costs.edge_distance_costs(compiled)[compiled.adjacency_edges]
+        )
+
+    def _openings(
+        self, passages: np.ndarray
+    ) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        For every passage p through v and every neighbor n of v, the two passages
+        that replace p if it is opened towards n. Returns the index of p in
+        `passages`, the directed edge v->n, and both replacements.
+        """
+        compiled = self._compiled
+        vertex = compiled.passage_vertex[passages]
+        counts = compiled.degrees[vertex]
+        index = np.repeat(np.arange(len(passages)), counts)
+        starts = np.cumsum(counts) - counts
+        slots = np.arange(len(index)) - starts[index]
+        p, v = passages[index], vertex[index]
+        r0 = compiled.passage_table[v, slots, compiled.passage_slot_a[p]]
+        r1 = compiled.passage_table[v, slots, compiled.passage_slot_b[p]]
+        return index, compiled.adjacency_indptr[v] + slots, r0, r1
+
+    def _search(
+        self,
+        dedges: np.ndarray,
+        costs: np.ndarray,
+        labels: np.ndarray,
+        radii: typing.Optional[typing.Sequence[float]] = None,
+    ) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Multi-source Dijkstra on the directed edges, only expanding edges within the
+        radius of their label. Returns the costs and the labels (-1 if unreachable)
+        of all directed edges.
+        """
+        n = len(self._compiled.adjacency_indices)
+        dedge_costs = [math.inf] * n
+        dedge_labels = [-1] * n
+        for e, c, label in zip(dedges.tolist(), costs.tolist(), labels.tolist()):
+            if c < dedge_costs[e]:
+                dedge_costs[e] = c
+                dedge_labels[e] = label
+        heap = [(c, e) for e, c in enumerate(dedge_costs) if c < math.inf]
+        heapq.heapify(heap)
+        indptr = self._successor_indptr
+        successors = self._successors
+        transition_costs = self._transition_costs
+        epsilon = self._epsilon
+        while heap:
+            cost_to_e, e = heapq.heappop(heap)
+            if cost_to_e > dedge_costs[e]:
+                continue  # outdated entry
+            label = dedge_labels[e]
+            if radii is not None and cost_to_e > radii[label]:
+                continue
+            for i in range(indptr[e], indptr[e + 1]):
+                s = successors[i]
+                cost = cost_to_e + transition_costs[i]
+                if dedge_costs[s] - epsilon > cost:
+                    dedge_costs[s] = cost
+                    dedge_labels[s] = label
+                    heapq.heappush(heap, (cost, s))
+        return np.array(dedge_costs), np.array(dedge_labels, dtype=np.int64)
+
+    def _direct_candidates(
+        self, passages: np.ndarray, labels: np.ndarray
+    ) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The direct connections of the passages of different cycles at the same
+        vertex, as in `IntersectingVertexPassageConnection`.
+        """
+        compiled = self._compiled
+        vertex = compiled.passage_vertex[passages]
+        order = np.argsort(vertex, kind="stable")
+        groups = np.split(order, np.flatnonzero(np.diff(vertex[order])) + 1)
+        pairs = [
+            (i, j)
+            for group in groups
+            if len(group) > 1
+            for k, i in enumerate(group.tolist())
+            for j in group[k + 1 :].tolist()
+            if labels[i] != labels[j]
+        ]
+        if not pairs:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+        i, j = np.array(pairs, dtype=np.int64).T
+        p, q = passages[i], passages[j]
+        v = compiled.passage_vertex[p]
+        pa, pb = compiled.passage_slot_a[p], compiled.passage_slot_b[p]
+        qa, qb = compiled.passage_slot_a[q], compiled.passage_slot_b[q]
+        table, tc = compiled.passage_table, self._turn_costs
+        costs = np.minimum(
+            tc[table[v, pa, qa]] + tc[table[v, pb, qb]],
+            tc[table[v, pa, qb]] + tc[table[v, pb, qa]],
+        ) - (tc[p] + tc[q])
+        return labels[i], labels[j], costs
+
+    def __call__(
+        self,
+        cycle_cover: typing.List[Cycle],
+        radii: typing.Optional[typing.Sequence[float]] = None,
+        max_neighbors: typing.Optional[int] = None,
+    ) -> typing.Dict[typing.Tuple[int, int], float]:
+        """
+        Returns the connection costs {(i, j): cost} with i < j of all adjacent pairs
+        of cycles, by their index in the cycle cover.
+        `radii` bounds the search around every cycle (see above). With
+        `max_neighbors`, only the cheapest connections of every cycle are kept.
+        """
+        compiled = self._compiled
+        passage_ids = compiled.passage_ids
+        passages = np.array(
+            [passage_ids[vp] for cycle in cycle_cover for vp in cycle.passages],
+            dtype=np.int64,
+        )
+        labels = np.repeat(
+            np.arange(len(cycle_cover)),
+            [len(cycle.passages) for cycle in cycle_cover],
+        )
+        index, dedges, r0, r1 = self._openings(passages)
+        pc, tc = self._passage_costs, self._turn_costs
+        start_costs = pc[r0] + pc[r1] - pc[passages[index]]
+        if radii is not None:
+            radii = [float(r) for r in radii]
+        costs, dedge_labels = self._search(dedges, start_costs, labels[index], radii)
+
+        # the paths ending at a passage of another cycle
+        path_ends = compiled.adjacency_reverse[dedges]
+        end_costs = costs[path_ends] + tc[r0] + tc[r1] - tc[passages[index]]
+        # the paths meeting at the border of two regions
+        reverse = compiled.adjacency_reverse
+        meet_costs = costs + costs[reverse] - self._doubled_distances
+        direct = self._direct_candidates(passages, labels)
+
+        label_a = np.concatenate([dedge_labels[path_ends], dedge_labels, direct[0]])
+        label_b = np.concatenate([labels[index], dedge_labels[reverse], direct[1]])
+        candidates = np.concatenate([end_costs, meet_costs, direct[2]])
+        valid = (label_a >= 0) & (label_b >= 0) & (label_a != label_b)
+        lo = np.minimum(label_a, label_b)[valid]
+        hi = np.maximum(label_a, label_b)[valid]
+        candidates = candidates[valid]
+        order = np.lexsort((candidates, hi, lo))
+        lo, hi, candidates = lo[order], hi[order], candidates[order]
+        first = np.ones(len(lo), dtype=bool)
+        first[1:] = (lo[1:] != lo[:-1]) | (hi[1:] != hi[:-1])
+        costs = {
+            (i, j): c
+            for i, j, c in zip(
+                lo[first].tolist(), hi[first].tolist(), candidates[first].tolist()
+            )
+        }
+        if max_neighbors is not None:
+            costs = nearest_connections(costs, max_neighbors)
+        return costs
+
+
+def nearest_connections(
+    costs: typing.Dict[typing.Tuple[int, int], float], max_neighbors: int
+) -> typing.Dict[typing.Tuple[int, int], float]:
+    """
+    Keeps the connections that are among the `max_neighbors` cheapest of at least
+    one of their cycles.
+    """
+    if max_neighbors < 1:
+        msg = "max_neighbors has to be positive."
+        raise ValueError(msg)
+    connections = defaultdict(list)
+    for pair, c in costs.items():
+        for i in pair:
+            connections[i].append((c, pair))
+    keep = {
+        pair
+        for candidates in connections.values()
+        for _, pair in heapq.nsmallest(max_neighbors, candidates)
+    }
+    return {pair: c for pair, c in costs.items() if pair in keep}
+
+
+def _squares(n: int):
+    """
+    A 2x(3n-1) grid with n disjoint squares.
+    """
+    points = [[PointVertex(x, y) for x in range(3 * n - 1)] for y in range(2)]
+    graph = nx.Graph()
+    for x in range(3 * n - 1):
+        graph.add_edge(points[0][x], points[1][x])
+        if x > 0:
+            for y in range(2):
+                graph.add_edge(points[y][x - 1], points[y][x])
+    instance = PointBasedInstance(
+        graph,
+        SimpleTouringCosts(distance_factor=1, turn_factor=5),
+        CoverageNecessities(OptionalCoverage()),
+    )
+    fs = FractionalSolution()
+    for i in range(n):
+        x0, x1 = 3 * i, 3 * i + 1
+        fs[VertexPassage(points[0][x0], points[1][x0], points[0][x1])] = 1.0
+        fs[VertexPassage(points[1][x0], points[0][x0], points[1][x1])] = 1.0
+        fs[VertexPassage(points[1][x1], points[1][x0], points[0][x1])] = 1.0
+        fs[VertexPassage(points[0][x1], points[0][x0], points[1][x1])] = 1.0
+    return instance, create_cycle_solution(instance.graph, fs, Validation())
+
+
+class CycleConnectionCostsTest(unittest.TestCase):
+    def test_two_squares(self):
+        instance, cc = _squares(2)
+        costs = CycleConnectionCosts(instance)(cc)
+        assert list(costs) == [(0, 1)]
+        self.assertAlmostEqual(costs[(0, 1)], 4.0, 2)
+
+    def test_matches_cycle_merger(self):
+        from .cycle_merger import CycleMerger
+
+        instance, cc = _squares(4)
+        costs = CycleConnectionCosts(instance)(cc)
+        assert len(costs) >= len(cc) - 1
+        for (i, j), c in costs.items():
+            estimate = CycleMerger(instance, cc[i]).estimate_cost(cc[j])
+            self.assertGreaterEqual(c, estimate - 1e-3)
+
+        def left(i):
+            return min(p.x for p in cc[i].covered_vertices())
+
+        order = sorted(range(len(cc)), key=left)
+        for i, j in zip(order[:-1], order[1:]):
+            estimate = CycleMerger(instance, cc[i]).estimate_cost(cc[j])
+            self.assertAlmostEqual(costs[(min(i, j), max(i, j))], estimate, 2)
+
+    def test_bounded(self):
+        instance, cc = _squares(4)
+        costs = CycleConnectionCosts(instance)(cc)
+        bounded = CycleConnectionCosts(instance)(cc, radii=[0.0] * len(cc))
+        assert set(bounded) <= set(costs)
+        for pair, c in bounded.items():
+            self.assertGreaterEqual(c, costs[pair] - 1e-3)
+        radii = [max(costs.values())] * len(cc)
+        large_radii = CycleConnectionCosts(instance)(cc, radii=radii)
+        for pair, c in costs.items():
+            self.assertAlmostEqual(large_radii[pair], c, 2)
+        nearest = CycleConnectionCosts(instance)(cc, max_neighbors=1)
+        assert all(costs[pair] == c for pair, c in nearest.items())
+        for i in range(len(cc)):
+            assert any(i in pair for pair in nearest)
@@ -1,5 +1,7 @@
+import typing
+
 from ..grid_instance import PointBasedInstance
-from ..grid_solution import Cycle, create_cycle_solution
+from ..grid_solution import Cycle, Validation, create_cycle_solution
 from .shortest_path import CycleCheapestConnection
 
 
@@ -7,18 +9,25 @@ class CycleMerger:
     """
     Merges a cycle to a tour via a doubled shortest path.
     The cheapest of such shortest paths is used, including the connection costs at the
-    ends.
+    ends. The merged cycles are checked according to `validation` (nothing by
+    default).
     """
 
-    def __init__(self, instance: PointBasedInstance, cycle: Cycle):
+    def __init__(
+        self,
+        instance: PointBasedInstance,
+        cycle: Cycle,
+        validation: typing.Optional[Validation] = None,
+    ):
         self.instance = instance
+        self.validation = validation
         self._cheapest_connections = CycleCheapestConnection(instance, cycle)
         self.cycle = cycle
 
     def merge(self, cycle: Cycle) -> Cycle:
         c = self._cheapest_connections.get_connection(cycle)
         fs = cycle.to_fractional_solution() + self.cycle.to_fractional_solution() + c
-        cc = create_cycle_solution(self.instance.graph, fs)
+        cc = create_cycle_solution(self.instance.graph, fs, self.validation)
         assert len(cc) == 1
         self.cycle = cc[0]
         self._cheapest_connections.update_cycle(self.cycle)
@@ -1,11 +1,18 @@
+import heapq
 import math
 import typing
 import unittest
 from collections import deque
 
 import networkx as nx
+import numpy as np
 
-from ..grid_instance import PointBasedInstance, PointVertex, SimpleTouringCosts
+from ..grid_instance import (
+    CompiledGraph,
+    PointBasedInstance,
+    PointVertex,
+    SimpleTouringCosts,
+)
 
 DEdge = typing.Tuple[PointVertex, PointVertex]
 
@@ -27,41 +34,152 @@ class EdgeCostFunction:
         )
         return self._multiplier * (d + t)
 
+    def transition_costs(
+        self, compiled: CompiledGraph, successors: np.ndarray, passages: np.ndarray
+    ) -> np.ndarray:
+        """
+        Vectorized version of `__call__` for the transitions of `line_graph`.
+        """
+        touring_costs = self._instance.touring_costs
+        d = touring_costs.edge_distance_costs(compiled)
+        t = touring_costs.vertex_turn_factors(compiled)
+        return self._multiplier * (
+            d[compiled.adjacency_edges[successors]]
+            + t[compiled.passage_vertex[passages]]
+            * compiled.passage_turn_angles[passages]
+        )
+
+
+def line_graph(
+    compiled: CompiledGraph,
+) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The directed edges (CSR positions) as vertices of the line graph: the successors
+    of u->v are all v->w. Returns the CSR pointers and the successors, as well as the
+    passage u-v-w of every transition.
+    """
+    heads = compiled.adjacency_indices
+    counts = compiled.degrees[heads]
+    indptr = np.zeros(len(heads) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    predecessors = np.repeat(np.arange(len(heads)), counts)
+    slots = np.arange(indptr[-1]) - indptr[predecessors]
+    v = heads[predecessors]
+    successors = compiled.adjacency_indptr[v] + slots
+    slot_in = compiled.adjacency_slots[compiled.adjacency_reverse[predecessors]]
+    passages = compiled.passage_table[v, slot_in, slots]
+    return indptr, successors, passages
+
 
 class DEdgeDijkstraTree:
     """
     The paths point from source to target. Check the asserts in `get_path`.
+
+    Two queues are available:
+    - "heap": Dijkstra on the line graph with a priority queue. Every directed edge
+      is only expanded when its cost is final (until new sources are added), and
+      costs, predecessors, and transition costs are stored in arrays indexed by the
+      CSR position of the directed edge. The cost function has to provide
+      `transition_costs`.
+    - "deque": The original FIFO label-correcting search (Bellman-Ford like). It
+      expands an edge again every time its cost improves.
+    `relaxations` counts the expansions of directed edges.
+    With the heap, sources can also be removed again, see `invalidate`.
     """
 
+    QUEUES = ("heap", "deque")
+
     def __init__(
         self,
         instance: PointBasedInstance,
         epsilon: float = 1e-4,
         cost_function: typing.Optional[EdgeCostFunction] = None,
+        queue: str = "heap",
     ):
+        if queue not in self.QUEUES:
+            msg = f"Unknown queue '{queue}', use one of {self.QUEUES}."
+            raise ValueError(msg)
         self._instance = instance
+        self._neighbors = instance.compiled().neighbors
+        self._queue = queue
         self._improved_edges = deque()
         self._predecessors = {}
         self._costs = {}
         self._epsilon = epsilon
+        self.relaxations = 0
         if cost_function:
             self._cost_function = cost_function
         else:
             self._cost_function = EdgeCostFunction(instance)
+        if queue == "heap":
+            self._init_heap(instance.compiled())
+
+    def _init_heap(self, compiled: CompiledGraph):
+        self._compiled = compiled
+        indptr, successors, passages = line_graph(compiled)
+        costs = self._cost_function.transition_costs(compiled, successors, passages)
+        # lists, as they are only accessed element-wise
+        self._successor_indptr = indptr.tolist()
+        self._successors = successors.tolist()
+        self._transition_costs = costs.tolist()
+        self._adjacency_indptr = compiled.adjacency_indptr.tolist()
+        self._adjacency_reverse = compiled.adjacency_reverse.tolist()
+        self._adjacency_sources = compiled.adjacency_sources.tolist()
+        self._adjacency_slots = compiled.adjacency_slots.tolist()
+        n = len(compiled.adjacency_indices)
+        self._dedge_costs = [math.inf] * n
+        self._dedge_predecessors = [-1] * n
+        self._heap = []
+
+    def _dedge_id(self, e: DEdge) -> int:
+        vertex_ids = self._compiled.vertex_ids
+        return self._compiled.dedge(vertex_ids[e[0]], vertex_ids[e[1]])
+
+    def _dedge(self, i: int) -> DEdge:
+        vertices = self._compiled.vertices
+        return (
+            vertices[self._compiled.adjacency_sources[i]],
+            vertices[self._compiled.adjacency_indices[i]],
+        )
 
     def propagate(self):
         """
         Propagates the updated costs through the shortest path tree. If there are no
         updates necessary, the call is cheap.
         """
+        if self._queue == "heap":
+            self._propagate_heap()
+            return
         while self._improved_edges:
             e = self._improved_edges.popleft()
+            self.relaxations += 1
             cost_to_e = self._costs[e]
-            for successor_vertices in self._instance.graph.neighbors(e[1]):
+            for successor_vertices in self._neighbors(e[1]):
                 successor_edge = (e[1], successor_vertices)
                 cost = cost_to_e + self._cost_function(successor_edge, predecessor=e)
                 self.update(successor_edge, cost, predecessor=e)
 
+    def _propagate_heap(self):
+        heap = self._heap
+        costs = self._dedge_costs
+        predecessors = self._dedge_predecessors
+        indptr = self._successor_indptr
+        successors = self._successors
+        transition_costs = self._transition_costs
+        epsilon = self._epsilon
+        while heap:
+            cost_to_e, e = heapq.heappop(heap)
+            if cost_to_e != costs[e]:
+                continue  # outdated entry, e has been improved or invalidated
+            self.relaxations += 1
+            for i in range(indptr[e], indptr[e + 1]):
+                s = successors[i]
+                cost = cost_to_e + transition_costs[i]
+                if costs[s] - epsilon > cost:
+                    costs[s] = cost
+                    predecessors[s] = e
+                    heapq.heappush(heap, (cost, s))
+
     def update(
         self, e: DEdge, value: float, predecessor: typing.Optional[DEdge] = None
     ) -> bool:
@@ -71,6 +189,16 @@ class DEdgeDijkstraTree:
         There is an epsilon to prevent tiny changes to propagate through the whole graph
         due to floating point imprecision.
         """
+        if self._queue == "heap":
+            i = self._dedge_id(e)
+            if self._dedge_costs[i] - self._epsilon > value:
+                self._dedge_costs[i] = value
+                self._dedge_predecessors[i] = (
+                    self._dedge_id(predecessor) if predecessor else -1
+                )
+                heapq.heappush(self._heap, (value, i))
+                return True
+            return False
         if self._costs.get(e, float("inf")) - self._epsilon > value:
             self._costs[e] = value
             self._improved_edges.append(e)
@@ -79,13 +207,59 @@ class DEdgeDijkstraTree:
         else:
             return False
 
+    def invalidate(self, roots: typing.Iterable[DEdge]) -> typing.List[DEdge]:
+        """
+        Resets the costs of the roots and of all edges whose shortest path runs over
+        them (their subtrees), e.g., because a source has been removed. The reset
+        edges are repaired from their remaining predecessors; sources within them
+        have to be added again via `update`. Call `propagate` afterwards.
+        Returns the reset edges. Only supported with the heap.
+        """
+        if self._queue != "heap":
+            msg = "Invalidating edges is only supported with queue='heap'."
+            raise ValueError(msg)
+        costs = self._dedge_costs
+        predecessors = self._dedge_predecessors
+        indptr = self._successor_indptr
+        successors = self._successors
+        transition_costs = self._transition_costs
+        reset = {self._dedge_id(e) for e in roots}
+        stack = list(reset)
+        while stack:
+            e = stack.pop()
+            for i in range(indptr[e], indptr[e + 1]):
+                s = successors[i]
+                if predecessors[s] == e and s not in reset:
+                    reset.add(s)
+                    stack.append(s)
+        for e in reset:
+            costs[e] = math.inf
+            predecessors[e] = -1
+        # repair from the incoming edges u->v of every reset edge v->w
+        for s in reset:
+            v = self._adjacency_sources[s]
+            slot = self._adjacency_slots[s]
+            for k in range(self._adjacency_indptr[v], self._adjacency_indptr[v + 1]):
+                e = self._adjacency_reverse[k]
+                cost = costs[e] + transition_costs[indptr[e] + slot]
+                if costs[s] - self._epsilon > cost:
+                    costs[s] = cost
+                    predecessors[s] = e
+            if costs[s] < math.inf:
+                heapq.heappush(self._heap, (costs[s], s))
+        return [self._dedge(e) for e in reset]
+
     def cost(self, e: DEdge) -> float:
         """
         Returns the cost to this edge.
         """
+        if self._queue == "heap":
+            return self._dedge_costs[self._dedge_id(e)]
         return self._costs.get(e, float("inf"))
 
     def get_path(self, target: DEdge) -> typing.List[DEdge]:
+        if self._queue == "heap":
+            return self._get_path_heap(target)
         path = [target]
         e = self._predecessors[target]
         while e:
@@ -96,6 +270,19 @@ class DEdgeDijkstraTree:
         assert all(path[i][1] == path[i + 1][0] for i in range(len(path) - 1))
         return path
 
+    def _get_path_heap(self, target: DEdge) -> typing.List[DEdge]:
+        i = self._dedge_id(target)
+        if self._dedge_costs[i] == math.inf:
+            raise KeyError(target)
+        path = []
+        while i >= 0:
+            path.append(i)
+            i = self._dedge_predecessors[i]
+        path = [self._dedge(i) for i in reversed(path)]
+        assert path[-1] == target
+        assert all(path[i][1] == path[i + 1][0] for i in range(len(path) - 1))
+        return path
+
 
 class DEdgeDijkstraTreeTest(unittest.TestCase):
     def test_no_turn_line_no_cost(self):
@@ -189,3 +376,62 @@ class DEdgeDijkstraTreeTest(unittest.TestCase):
             dtree.update((points[0], points[1]), 0.0)
             dtree.propagate()
             assert dtree.cost((points[-2], points[-1])) == length - 2 + 5 * 0.5 * math.pi
+
+    def test_heap_equals_deque(self):
+        G = nx.grid_2d_graph(6, 5)
+        mapping = {p: PointVertex(*p) for p in G.nodes}
+        G = nx.relabel_nodes(G, mapping)
+        # diagonals, such that the turn angles are not only multiples of pi/2
+        G.add_edge(mapping[(0, 0)], mapping[(1, 1)])
+        G.add_edge(mapping[(3, 1)], mapping[(4, 2)])
+        instance = PointBasedInstance(
+            G, SimpleTouringCosts(turn_factor=2.0, distance_factor=1.0), None
+        )
+        sources = [
+            ((mapping[(0, 0)], mapping[(1, 0)]), 0.0),
+            ((mapping[(5, 4)], mapping[(5, 3)]), 1.0),
+        ]
+        trees = {q: DEdgeDijkstraTree(instance, queue=q) for q in ("heap", "deque")}
+        for tree in trees.values():
+            for e, c in sources:
+                tree.update(e, c)
+            tree.propagate()
+        heap, fifo = trees["heap"], trees["deque"]
+        for v, w in G.edges:
+            for e in [(v, w), (w, v)]:
+                self.assertAlmostEqual(heap.cost(e), fifo.cost(e), delta=1e-3)
+                path = heap.get_path(e)
+                cost = heap.cost(path[0])
+                for e0, e1 in zip(path[:-1], path[1:]):
+                    cost += heap._cost_function(e1, predecessor=e0)
+                self.assertAlmostEqual(cost, heap.cost(e))
+        assert heap.relaxations <= fifo.relaxations
+
+    def test_invalidate(self):
+        G = nx.grid_2d_graph(5, 4)
+        mapping = {p: PointVertex(*p) for p in G.nodes}
+        G = nx.relabel_nodes(G, mapping)
+        instance = PointBasedInstance(
+            G, SimpleTouringCosts(turn_factor=2.0, distance_factor=1.0), None
+        )
+        sources = [
+            ((mapping[(0, 0)], mapping[(1, 0)]), 0.0),
+            ((mapping[(4, 3)], mapping[(4, 2)]), 0.5),
+            ((mapping[(2, 0)], mapping[(2, 1)]), 3.0),
+        ]
+        tree = DEdgeDijkstraTree(instance)
+        for e, c in sources:
+            tree.update(e, c)
+        tree.propagate()
+        reset = tree.invalidate([sources[1][0]])
+        assert sources[1][0] in reset and sources[0][0] not in reset
+        for e, c in [sources[0], sources[2]]:
+            tree.update(e, c)  # sources within the reset edges have to be re-added
+        tree.propagate()
+        expected = DEdgeDijkstraTree(instance)
+        for e, c in [sources[0], sources[2]]:
+            expected.update(e, c)
+        expected.propagate()
+        for v, w in G.edges:
+            for e in [(v, w), (w, v)]:
+                self.assertAlmostEqual(tree.cost(e), expected.cost(e), delta=1e-3)
@@ -18,6 +18,10 @@ class IntersectingVertexPassageConnection:
         if source not in self._sources[source.v]:
             self._sources[source.v].append(source)
 
+    def remove_source(self, source: VertexPassage):
+        if source in self._sources[source.v]:
+            self._sources[source.v].remove(source)
+
     def _replacements(
         self, source: VertexPassage, target: VertexPassage
     ) -> typing.Tuple[VertexPassage, VertexPassage]:
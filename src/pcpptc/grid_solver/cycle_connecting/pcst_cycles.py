@@ -3,63 +3,106 @@ import typing
 import networkx as nx
 
 from ..grid_instance import PointBasedInstance
-from ..grid_solution import Cycle, is_feasible_cycle_cover
+from ..grid_solution import Cycle, Validation
+from .connection_graph import CycleConnectionCosts, nearest_connections
 from .cycle_merger import CycleMerger
 from .cycle_penalty_accumulation import calculate_cycle_penalties
-from .pcst_solver import solve_pcst
+from .pcst_solver import PCST_ENGINES, solve_pcst
 
 
-def _cycle_connecting_costs(
-    instance: PointBasedInstance, cycle_cover: typing.List[Cycle]
-) -> typing.Dict[typing.Tuple[int, int], float]:
-    costs = {}
-    for i, cycle_a in enumerate(cycle_cover):
-        cycle_merge = CycleMerger(instance, cycle_a)
-        for j, cycle_b in enumerate(cycle_cover):
-            if j <= i:
-                continue
-            c = cycle_merge.estimate_cost(cycle_b)
-            costs[(i, j)] = 2 * c
-    return costs
+def _connect_components(
+    graph: nx.Graph,
+    cycle_cover: typing.List[Cycle],
+    costs: typing.Dict[typing.Tuple[int, int], float],
+):
+    """
+    Adds the cheapest connections between the components of the graph (Kruskal).
+    """
+    components = nx.utils.UnionFind(graph.nodes)
+    for v, w in graph.edges:
+        components.union(v, w)
+    for (i, j), c in sorted(costs.items(), key=lambda x: x[1]):
+        a, b = cycle_cover[i], cycle_cover[j]
+        if components[a] != components[b]:
+            graph.add_edge(a, b, weight=c)
+            components.union(a, b)
 
 
 def _compute_connection_graph(
     instance: PointBasedInstance,
     cycle_cover: typing.List[Cycle],
-    cycle_merger: typing.Optional[typing.Dict[Cycle, CycleMerger]] = None,
+    only_positive_prizes: bool = False,
+    bounded: bool = False,
+    max_neighbors: typing.Optional[int] = None,
 ) -> nx.Graph:
+    """
+    The sparse graph of the adjacent cycles with the connection costs as edge
+    weights and the accumulated penalties as prizes. With `only_positive_prizes`,
+    the cycles with negative prizes are left out before computing the connections,
+    such that the remaining cycles can connect through their area.
+    With `bounded`, the connections are only searched up to the prize of a cycle, as
+    a connection costlier than both prizes is hardly useful. `max_neighbors` limits
+    the connections per cycle. As several cycles can share a connection, the
+    components of the sparse graph are afterwards connected by their cheapest
+    connections. For `bounded`, this needs a second (unbounded) search, but only if
+    the graph is disconnected.
+    """
     cycle_penalties = calculate_cycle_penalties(
         instance, cycle_cover, substract_touring_costs=True
     )
+    if only_positive_prizes:
+        cycle_cover = [c for c in cycle_cover if cycle_penalties[c] >= 0]
     graph = nx.Graph()
     for cycle in cycle_cover:
         graph.add_node(cycle, **{"prize": cycle_penalties[cycle]})
-
-    for i, cycle_a in enumerate(cycle_cover):
-        if cycle_merger and cycle_a in cycle_merger:
-            cycle_merge = cycle_merger[cycle_a]
-        else:
-            cycle_merge = CycleMerger(instance, cycle_a)
-        for j, cycle_b in enumerate(cycle_cover):
-            if j <= i:
-                continue
-            c = cycle_merge.estimate_cost(cycle_b)
-            graph.add_edge(cycle_a, cycle_b, weight=c)
+    connection_costs = CycleConnectionCosts(instance)
+    radii = None
+    if bounded:
+        radii = [max(cycle_penalties[c], 0.0) for c in cycle_cover]
+    costs = connection_costs(cycle_cover, radii)
+    limited = costs
+    if max_neighbors is not None:
+        limited = nearest_connections(costs, max_neighbors)
+    for (i, j), c in limited.items():
+        graph.add_edge(cycle_cover[i], cycle_cover[j], weight=c)
+    if limited is costs and not bounded:
+        return graph
+    if graph.number_of_nodes() > 1 and not nx.is_connected(graph):
+        # filled in lazily, only if the components have to be connected
+        if bounded:
+            costs = connection_costs(cycle_cover)
+        _connect_components(graph, cycle_cover, costs)
     return graph
 
 
 class CycleMergeGraph:
-    def __init__(self, instance: PointBasedInstance, cycle_cover: typing.List[Cycle]):
+    def __init__(
+        self,
+        instance: PointBasedInstance,
+        cycle_cover: typing.List[Cycle],
+        bounded: bool = False,
+        max_neighbors: typing.Optional[int] = None,
+        validation: typing.Optional[Validation] = None,
+    ):
+        """
+        See `_compute_connection_graph` for `bounded` and `max_neighbors`.
+        """
         self.instance = instance
+        self.validation = validation
         self.cycle_cover = list(cycle_cover)
-        self._cycle_merger = {
-            cycle: CycleMerger(instance, cycle) for cycle in cycle_cover
-        }
+        self.bounded = bounded
+        self.max_neighbors = max_neighbors
+        # created on the first merge, as every merger runs a full shortest path search
+        self._cycle_merger = {}
         self._refer = {}
 
-    def get_cost_graph(self) -> nx.Graph:
+    def get_cost_graph(self, only_positive_prizes: bool = False) -> nx.Graph:
         graph = _compute_connection_graph(
-            self.instance, self.cycle_cover, self._cycle_merger
+            self.instance,
+            self.cycle_cover,
+            only_positive_prizes,
+            bounded=self.bounded,
+            max_neighbors=self.max_neighbors,
         )
         return graph
 
@@ -73,25 +116,36 @@ class CycleMergeGraph:
         cycle_b = self._resolve(cycle_b)
         if cycle_a is cycle_b:
             return cycle_a
-        cm = self._cycle_merger[cycle_a]
+        cm = self._cycle_merger.get(cycle_a)
+        if cm is None:
+            cm = CycleMerger(self.instance, cycle_a, self.validation)
         merged_cycle = cm.merge(cycle_b)
         for c in (cycle_a, cycle_b):
             self.cycle_cover.remove(c)
-            self._cycle_merger.pop(c)
+            self._cycle_merger.pop(c, None)
             self._refer[c] = merged_cycle
         self.cycle_cover.append(merged_cycle)
         self._cycle_merger[merged_cycle] = cm
         return merged_cycle
 
 
-def _compute_pcst_on_cycles(cmg: CycleMergeGraph) -> nx.Graph:
-    graph = cmg.get_cost_graph()
-    bad_cycles = [c for c, prize in graph.nodes(data="prize") if prize < 0]
-    for c in bad_cycles:
-        graph.remove_node(c)
+def _compute_pcst_on_cycles(
+    cmg: CycleMergeGraph,
+    lp_backend: str = "gurobi",
+    engine: str = "mip",
+    time_limit: typing.Optional[float] = 60.0,
+) -> nx.Graph:
+    graph = cmg.get_cost_graph(only_positive_prizes=True)
     if graph.number_of_nodes() > 1:
         assert graph.number_of_edges() >= 1
-        pcst = solve_pcst(graph, edge_weight_label="weight", vertex_prize_label="prize")
+        pcst = solve_pcst(
+            graph,
+            edge_weight_label="weight",
+            vertex_prize_label="prize",
+            lp_backend=lp_backend,
+            engine=engine,
+            time_limit=time_limit,
+        )
         return pcst
     else:
         return graph
@@ -106,12 +160,16 @@ def _greedy_connect_free(cmg: CycleMergeGraph):
     return cmg.cycle_cover
 
 
-def _merge(pcst: nx.Graph, instance: PointBasedInstance) -> Cycle:
+def _merge(
+    pcst: nx.Graph,
+    instance: PointBasedInstance,
+    validation: typing.Optional[Validation] = None,
+) -> Cycle:
     assert pcst.number_of_nodes() > 0
     cycles = list(pcst.nodes())
     if pcst.number_of_nodes() == 1:
         return cycles[0]
-    cycle_merger = CycleMerger(instance, cycles[0])
+    cycle_merger = CycleMerger(instance, cycles[0], validation)
     for c in nx.dfs_postorder_nodes(pcst, cycles[0]):
         if c != cycles[0]:
             cycle_merger.merge(c)
@@ -119,13 +177,29 @@ def _merge(pcst: nx.Graph, instance: PointBasedInstance) -> Cycle:
 
 
 def connect_cycles_via_pcst(
-    instance: PointBasedInstance, cycle_cover: typing.List[Cycle]
+    instance: PointBasedInstance,
+    cycle_cover: typing.List[Cycle],
+    lp_backend: str = "gurobi",
+    validation: typing.Optional[Validation] = None,
+    bounded_connections: bool = False,
+    max_connections: typing.Optional[int] = None,
+    pcst_engine: str = "mip",
+    pcst_time_limit: typing.Optional[float] = 60.0,
 ) -> typing.Optional[Cycle]:
     """
     Uses the method from the original approximation algorithm to compute a pcst
     on the cycles (connection costs as edge weights and accumulates penalties as prizes)
-    and connect the cycles in the pcst.
+    and connect the cycles in the pcst. The PCST is solved by `pcst_engine` (see
+    `solve_pcst`), the MIP with `lp_backend`.
+    The resulting tour is checked according to `validation` (full by default).
+    `bounded_connections` and `max_connections` make the cost graph sparser, see
+    `_compute_connection_graph`.
     """
+    if pcst_engine not in PCST_ENGINES:
+        msg = f"Unknown PCST engine '{pcst_engine}', use one of {PCST_ENGINES}."
+        raise ValueError(msg)
+    if validation is None:
+        validation = Validation()
     if not cycle_cover:
         return None
     assert len(cycle_cover) >= 1, "There should be cycles to merge"
@@ -133,18 +207,22 @@ def connect_cycles_via_pcst(
         print("Solution is already connected! :)")
         return cycle_cover[0]
     print(f"Connecting {len(cycle_cover)} cycles")
-    cmg = CycleMergeGraph(instance, cycle_cover)
+    cmg = CycleMergeGraph(
+        instance,
+        cycle_cover,
+        bounded=bounded_connections,
+        max_neighbors=max_connections,
+        validation=validation,
+    )
     print("Trying to connect greedily")
     _greedy_connect_free(cmg)
     print(f"{len(cmg.cycle_cover)} cycles remaining")
     print("Computing PCST")
-    pcst = _compute_pcst_on_cycles(cmg)
+    pcst = _compute_pcst_on_cycles(cmg, lp_backend, pcst_engine, pcst_time_limit)
     if pcst.number_of_nodes() == 0:
         return None
     assert nx.is_connected(pcst), "PCST should be connected."
     print("Connecting PCST via DFS")
-    tour = _merge(pcst, instance)
-    assert is_feasible_cycle_cover(
-        instance=instance, solution=tour.to_fractional_solution()
-    )
+    tour = _merge(pcst, instance, validation)
+    validation.check_cycle_cover("pcst_tour", instance, tour.to_fractional_solution())
     return tour
@@ -1,19 +1,68 @@
 import itertools
+import math
+import time
+import typing
+import unittest
 
 import networkx as nx
 import numpy as np
 
 from ..grid_solution import Cycle
+from ..lp_backend import EQUAL, GREATER_EQUAL, LESS_EQUAL, create_lp_model
+
+
+PCST_ENGINES = ("mip", "approx", "hybrid")
+
+
+def pcst_objective(
+    graph: nx.Graph, pcst: nx.Graph, edge_weight_label: str, vertex_prize_label: str
+) -> float:
+    """
+    The weight of the tree plus the prizes of the vertices not in the tree.
+    """
+    weights = sum(graph.edges[e][edge_weight_label] for e in pcst.edges)
+    missed = sum(
+        prize for v, prize in graph.nodes(data=vertex_prize_label) if v not in pcst
+    )
+    return weights + missed
 
 
 def solve_pcst(
-    graph: nx.Graph, edge_weight_label: str, vertex_prize_label: str
+    graph: nx.Graph,
+    edge_weight_label: str,
+    vertex_prize_label: str,
+    lp_backend: str = "gurobi",
+    engine: str = "mip",
+    time_limit: typing.Optional[float] = 60.0,
 ) -> nx.Graph:
     """
-    Solves the PCST on nice networkx graphs.
+    Solves the PCST on nice networkx graphs with the engine:
+    - "mip": Exact, as MIP with connectivity cuts (`PcstMip`).
+    - "approx": The GW-approximation of pcst_fast.
+    - "hybrid": The MIP, started from the approximation and stopped after
+      `time_limit` seconds. Falls back to the approximation if the MIP has no
+      better connected solution by then.
     """
-    mip = PcstMip(graph, edge_weight_label, vertex_prize_label)
-    return mip.solve()
+    if engine not in PCST_ENGINES:
+        msg = f"Unknown PCST engine '{engine}', use one of {PCST_ENGINES}."
+        raise ValueError(msg)
+    if engine == "mip":
+        mip = PcstMip(graph, edge_weight_label, vertex_prize_label, lp_backend)
+        return mip.solve()
+    approx = solve_pcst_via_approx(graph, edge_weight_label, vertex_prize_label)
+    if engine == "approx":
+        return approx
+    mip = PcstMip(graph, edge_weight_label, vertex_prize_label, lp_backend, time_limit)
+    mip.set_start(approx)
+    pcst = mip.solve()
+
+    def objective(tree):
+        return pcst_objective(graph, tree, edge_weight_label, vertex_prize_label)
+
+    if pcst is None or objective(approx) < objective(pcst):
+        print("Using the PCST of the approximation.")
+        return approx
+    return pcst
 
 
 def solve_pcst_via_approx(
@@ -23,16 +72,23 @@ def solve_pcst_via_approx(
 
     vertices = list(graph.nodes)
     vertex_ids = {v: i for i, v in enumerate(graph.nodes)}
+    # pcst_fast needs non-negative, finite values. Mandatory vertices are prized
+    # higher than all edges together.
+    edge_weights = np.array(
+        [data[edge_weight_label] for v, w, data in graph.edges(data=True)],
+        dtype=np.float64,
+    ).reshape(-1)
+    edge_weights = np.maximum(edge_weights, 0.0)
     vertex_prizes = np.array(
         [graph.nodes[v][vertex_prize_label] for v in vertices], dtype=np.float64
     )
+    vertex_prizes = np.where(
+        np.isinf(vertex_prizes), edge_weights.sum() + 1.0, vertex_prizes
+    )
+    vertex_prizes = np.maximum(vertex_prizes, 0.0)
     edges = np.array(
         [[vertex_ids[v], vertex_ids[w]] for (v, w) in graph.edges], np.int64
-    )
-    edge_weights = np.array(
-        [data[edge_weight_label] for v, w, data in graph.edges(data=True)],
-        dtype=np.float64,
-    )
+    ).reshape(-1, 2)
     root = -1
     num_clusters = 1
     pruning = "strong"
@@ -55,18 +111,24 @@ def solve_pcst_via_approx(
     return pcst_graph
 
 
-import gurobipy as grb
-
-
 class PcstMip:
     def __init__(
-        self, graph: nx.Graph, edge_weight_label: str, vertex_prize_label: str
+        self,
+        graph: nx.Graph,
+        edge_weight_label: str,
+        vertex_prize_label: str,
+        lp_backend: str = "gurobi",
+        time_limit: typing.Optional[float] = None,
     ):
+        """
+        With a `time_limit` (seconds, for all rounds of connectivity cuts), `solve`
+        may return the best connected solution found in time or None.
+        """
         print(f"PCST Mip with {graph.number_of_nodes()} nodes.")
         print("Values:", [graph.nodes[n][vertex_prize_label] for n in graph.nodes])
         self.graph = graph
-        self.model = grb.Model()
-        self.model.setParam("OutputFlag", 0)
+        self.time_limit = time_limit
+        self.model = create_lp_model(lp_backend, "pcst")
 
         def is_mandatory(n):
             p = graph.nodes[n][vertex_prize_label]
@@ -79,60 +141,94 @@ class PcstMip:
             assert is_mandatory(n)
             return 0.0
 
-        self._node_vars = {
-            n: self.model.addVar(0, 1.0, obj=price(n), vtype=grb.GRB.BINARY)
-            for n in graph.nodes
-        }
-        self._edge_vars = {
-            self._ue(e): self.model.addVar(
-                0, 1.0, obj=graph.edges[e][edge_weight_label], vtype=grb.GRB.BINARY
-            )
-            for e in graph.edges
-        }
+        nodes = list(graph.nodes)
+        node_cols = self.model.add_variables(
+            len(nodes), 0, 1.0, obj=[price(n) for n in nodes], integer=True
+        )
+        self._node_vars = dict(zip(nodes, node_cols.tolist()))
+        edges = list(graph.edges)
+        edge_cols = self.model.add_variables(
+            len(edges),
+            0,
+            1.0,
+            obj=[graph.edges[e][edge_weight_label] for e in edges],
+            integer=True,
+        )
+        self._edge_vars = {self._ue(e): x for e, x in zip(edges, edge_cols.tolist())}
         for n in graph.nodes:
             if is_mandatory(n):
-                self.model.addConstr(self._node_vars[n] == 1)
-            constr = (
-                sum(self._get_edge_var(e) for e in graph.edges(n))
-                <= self._node_vars[n] * graph.number_of_nodes()
-            )
-            self.model.addConstr(constr)
-        constr = sum(self._edge_vars.values()) == sum(self._node_vars.values()) - 1
-        self.model.addConstr(constr)
+                self.model.add_constraint({self._node_vars[n]: 1.0}, EQUAL, 1.0)
+            # sum(edge vars at n) <= |V| * node var
+            constr = {self._get_edge_var(e): 1.0 for e in graph.edges(n)}
+            constr[self._node_vars[n]] = -graph.number_of_nodes()
+            self.model.add_constraint(constr, LESS_EQUAL, 0.0)
+        # sum(edge vars) == sum(node vars) - 1
+        constr = {x: 1.0 for x in self._edge_vars.values()}
+        constr.update({x: -1.0 for x in self._node_vars.values()})
+        self.model.add_constraint(constr, EQUAL, -1.0)
 
     def _ue(self, e):
         return (min(e, key=hash), max(e, key=hash))
 
-    def solve(self):
-        self.model.optimize()
-        g = self.extract_pcst()
-        cmps = list(nx.connected_components(g))
-        if len(cmps) > 1:
-            for i, j in itertools.combinations(range(len(cmps)), 2):
-                v0 = list(cmps[i])[0]
-                v1 = list(cmps[j])[0]
-                outgoing = []
-                for e in self.graph.edges(cmps[i]):
-                    if e[0] not in cmps[i] or e[1] not in cmps[i]:
-                        outgoing.append(e)
-                constr = (
-                    sum(self._get_edge_var(e) for e in outgoing)
-                    >= self._node_vars[v0] + self._node_vars[v1] - 1
-                )
-                self.model.addConstr(constr)
-            return self.solve()
-        else:
-            print(f"Selected {g.number_of_nodes()} cycles.")
-            return g
+    def set_start(self, pcst: nx.Graph):
+        """
+        Uses a connected tree, e.g., of the approximation, as start solution.
+        """
+        edges = {self._ue(e) for e in pcst.edges}
+        self.model.set_start(
+            list(self._node_vars.values()),
+            [1.0 if n in pcst else 0.0 for n in self._node_vars],
+        )
+        self.model.set_start(
+            list(self._edge_vars.values()),
+            [1.0 if e in edges else 0.0 for e in self._edge_vars],
+        )
+
+    def _add_connectivity_cuts(self, cmps: typing.List[typing.Set]):
+        outgoing = [
+            [e for e in self.graph.edges(cmp) if e[0] not in cmp or e[1] not in cmp]
+            for cmp in cmps
+        ]
+        representatives = [next(iter(cmp)) for cmp in cmps]
+        for i, j in itertools.combinations(range(len(cmps)), 2):
+            v0, v1 = representatives[i], representatives[j]
+            # sum(outgoing edge vars) >= x[v0] + x[v1] - 1
+            constr = {self._get_edge_var(e): 1.0 for e in outgoing[i]}
+            constr[self._node_vars[v0]] = -1.0
+            constr[self._node_vars[v1]] = -1.0
+            self.model.add_constraint(constr, GREATER_EQUAL, -1.0)
+
+    def solve(self) -> typing.Optional[nx.Graph]:
+        start = time.perf_counter()
+        while True:
+            if self.time_limit is not None:
+                remaining = self.time_limit - (time.perf_counter() - start)
+                if remaining <= 0:
+                    print("PCST Mip reached the time limit.")
+                    return None
+                self.model.set_time_limit(remaining)
+            self.model.optimize()
+            if not self.model.has_solution():
+                print("PCST Mip found no solution.")
+                return None
+            g = self.extract_pcst()
+            cmps = list(nx.connected_components(g))
+            if len(cmps) <= 1:
+                if not self.model.is_optimal():
+                    print("PCST Mip reached the time limit.")
+                print(f"Selected {g.number_of_nodes()} cycles.")
+                return g
+            self._add_connectivity_cuts(cmps)
 
     def extract_pcst(self):
         g = nx.Graph()
+        values = self.model.values()
         for n, x in self._node_vars.items():
             assert type(n) is Cycle
-            if round(x.X) == 1.0:
+            if round(values[x]) == 1.0:
                 g.add_node(n)
         for e, x in self._edge_vars.items():
-            if round(x.X) == 1.0:
+            if round(values[x]) == 1.0:
                 assert type(e[0]) is Cycle
                 assert type(e[1]) is Cycle
                 g.add_edge(e[0], e[1])
@@ -140,3 +236,25 @@ class PcstMip:
 
     def _get_edge_var(self, e):
         return self._edge_vars[self._ue(e)]
+
+
+class PcstSolverTest(unittest.TestCase):
+    def test_engines(self):
+        # the cycles are only used as (distinct) vertices
+        cycles = {name: Cycle([]) for name in "abcde"}
+        prizes = {"a": 5.0, "b": 1.0, "c": 4.0, "d": math.inf, "e": 0.5}
+        weights = {"ab": 1.0, "bc": 2.0, "cd": 1.0, "de": 3.0, "ae": 0.2}
+        graph = nx.Graph()
+        for v, prize in prizes.items():
+            graph.add_node(cycles[v], prize=prize)
+        for (v, w), weight in weights.items():
+            graph.add_edge(cycles[v], cycles[w], weight=weight)
+        objectives = {}
+        for engine in PCST_ENGINES:
+            pcst = solve_pcst(graph, "weight", "prize", "highs", engine=engine)
+            assert cycles["d"] in pcst and nx.is_tree(pcst)
+            objectives[engine] = pcst_objective(graph, pcst, "weight", "prize")
+        self.assertAlmostEqual(objectives["mip"], objectives["hybrid"])
+        self.assertLessEqual(objectives["mip"], objectives["approx"] + 1e-6)
+        with self.assertRaises(ValueError):
+            solve_pcst(graph, "weight", "prize", engine="exact")
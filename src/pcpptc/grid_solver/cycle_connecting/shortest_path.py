@@ -1,4 +1,5 @@
 import typing
+from collections import defaultdict
 
 from ..grid_instance import PointBasedInstance, PointVertex, VertexPassage
 from ..grid_solution import Cycle, FractionalSolution
@@ -17,6 +18,9 @@ class VertexPassageShortestPath:
         self._instance = instance
         ecf = EdgeCostFunction(instance, multiplier=2.0)
         self._sources: typing.Dict[DEdge, VertexPassage] = {}
+        self._source_passages: typing.Dict[
+            PointVertex, typing.Set[VertexPassage]
+        ] = defaultdict(set)
         self._dijkstra = DEdgeDijkstraTree(instance, cost_function=ecf)
         self._direct_connections = IntersectingVertexPassageConnection(instance)
 
@@ -43,11 +47,33 @@ class VertexPassageShortestPath:
         Adds the vertex passage as source.
         """
         self._direct_connections.add_source(source)
+        self._source_passages[source.v].add(source)
         for n in self._instance.graph.neighbors(source.v):
-            e = (source.v, n)
-            c = self._calculate_start_cost(source, n)
-            if self._dijkstra.update(e, c):
-                self._sources[e] = source
+            self._add_source_edge(source, n)
+        if propagate:
+            self.propagate()
+
+    def _add_source_edge(self, source: VertexPassage, n: PointVertex):
+        e = (source.v, n)
+        c = self._calculate_start_cost(source, n)
+        if self._dijkstra.update(e, c):
+            self._sources[e] = source
+
+    def remove_sources(self, sources: typing.Iterable[VertexPassage], propagate=True):
+        """
+        Removes the vertex passages as sources. Only the shortest paths starting at
+        them are recomputed.
+        """
+        sources = set(sources)
+        for source in sources:
+            self._direct_connections.remove_source(source)
+            self._source_passages[source.v].discard(source)
+        roots = [e for e, source in self._sources.items() if source in sources]
+        for e in roots:
+            del self._sources[e]
+        for e in self._dijkstra.invalidate(roots):
+            for source in self._source_passages.get(e[0], ()):
+                self._add_source_edge(source, e[1])
         if propagate:
             self.propagate()
 
@@ -117,19 +143,38 @@ class CycleCheapestConnection:
     def __init__(self, instance: PointBasedInstance, cycle: Cycle):
         self._instance = instance
         self._vp_sp = VertexPassageShortestPath(instance)
+        self._passages: typing.Set[VertexPassage] = set()
         self.cycle = cycle
         self.update_cycle(cycle)
 
     def update_cycle(self, cycle: Cycle):
         """
-        Replaces the cycle used for the computations. Expects it to be include most
-        parts of the old cycle.
+        Replaces the cycle used for the computations. Only the passages that changed
+        are updated, so this is cheap if it includes most parts of the old cycle
+        (as after a merge): The shortest paths starting at removed passages are
+        repaired, and the added passages only propagate their improvements.
         """
+        passages = set(cycle.passages)
+        removed = self._passages - passages
+        added = passages - self._passages
         self.cycle = cycle
-        for passage in cycle.passages:
+        self._passages = passages
+        if removed:
+            self._vp_sp.remove_sources(removed, propagate=False)
+        for passage in added:
             self._vp_sp.add_source(passage, propagate=False)
         self._vp_sp.propagate()
 
+    def _recompute(self):
+        """
+        Recomputes all shortest paths from scratch. Only a fallback, as the repairs
+        of `update_cycle` should keep all sources in the cycle.
+        """
+        print("Recomputing shortest paths. If this happens, probably buggy.")
+        self._vp_sp = VertexPassageShortestPath(self._instance)
+        self._passages = set()
+        self.update_cycle(self.cycle)
+
     def _get_best_target(self, cycle: Cycle) -> typing.Tuple[VertexPassage, float]:
         return min(
             ((vp, self._vp_sp.get_cost(vp)) for vp in cycle.passages),
@@ -140,19 +185,14 @@ class CycleCheapestConnection:
         """
         Calculates the costs of connecting the cycle to the reference cycle.
         If check is set to true, it will verify that the path is actually valid.
-        When using update, a few paths could become invalid because on vertex passage
-        is replaced on every merge.
+        This should always be the case, as `update_cycle` repairs the paths of the
+        replaced vertex passages.
         """
         target, cost = self._get_best_target(cycle)
         if check:  # if the source of the shortest path really is in the cycle.
             fs, source = self._vp_sp.get_connection(target)
-            if source not in self.cycle.passages:
-                # Recompute distances
-                print(
-                    "Recomputing shortest paths. If this happens often, probably buggy."
-                )
-                self._vp_sp = VertexPassageShortestPath(self._instance)
-                self.update_cycle(self.cycle)
+            if source not in self._passages:
+                self._recompute()
                 return self.get_cost(cycle, check=False)
         return cost
 
@@ -163,9 +203,7 @@ class CycleCheapestConnection:
         """
         target, cost = self._get_best_target(cycle)
         fs, source = self._vp_sp.get_connection(target)
-        if source not in self.cycle.passages:
-            # Recompute distances
-            self._vp_sp = VertexPassageShortestPath(self._instance)
-            self.update_cycle(self.cycle)
+        if source not in self._passages:
+            self._recompute()
             return self.get_connection(cycle)
         return fs
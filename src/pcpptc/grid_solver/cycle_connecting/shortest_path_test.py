@@ -79,3 +79,22 @@ class DijkstraTest(unittest.TestCase):
         self.assertAlmostEqual(dd.cost((points[1][2], points[1][3])), 1.0, 2)
         ccc = CycleCheapestConnection(instance, c)
         self.assertAlmostEqual(ccc.get_cost(cc[0] if c == cc[1] else cc[1]), 4.0, 2)
+
+    def test_update_after_merge(self):
+        from .connection_graph import _squares
+        from .cycle_merger import CycleMerger
+
+        instance, cc = _squares(3)
+        cc.sort(key=lambda c: min(p.x for p in c.covered_vertices()))
+        merger = CycleMerger(instance, cc[1])
+        shortest_paths = merger._cheapest_connections._vp_sp
+        merged = merger.merge(cc[0])
+        self.assertAlmostEqual(
+            merger.estimate_cost(cc[2]),
+            CycleMerger(instance, merged).estimate_cost(cc[2]),
+            2,
+        )
+        # repaired instead of recomputed
+        assert merger._cheapest_connections._vp_sp is shortest_paths
+        tour = merger.merge(cc[2])
+        assert is_feasible_cycle_cover(instance, tour.to_fractional_solution())
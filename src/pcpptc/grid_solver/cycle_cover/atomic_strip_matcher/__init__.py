@@ -1,4 +1,5 @@
 from .atomic_strip_matching import AtomicStripMatching
+from .partitioned_matching import PartitionedMatching
 from .transition_cost import TransitionCostCalculator
 
-__all__ = ["TransitionCostCalculator", "AtomicStripMatching"]
+__all__ = ["TransitionCostCalculator", "AtomicStripMatching", "PartitionedMatching"]
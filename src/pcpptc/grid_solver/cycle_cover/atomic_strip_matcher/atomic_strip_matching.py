@@ -1,26 +1,107 @@
+import math
+import typing
 import unittest
 
 import networkx as nx
-from blossomv import blossomv
+import numpy as np
 
-from ...grid_instance import PointVertex, SimpleTouringCosts, VertexPassage
-from ...grid_solution import FractionalSolution
+from ...grid_instance import (
+    CompiledGraph,
+    PointVertex,
+    SimpleTouringCosts,
+)
+from ...grid_solution import Cycle, FractionalSolution, SparseFractionalSolution
 from .atomic_strip import AtomicStrip, AtomicStrips
 from .atomic_strip_edges import AtomicStripEdges
 from .atomic_strip_vertex import AtomicStripVertex
+from .candidate_pruning import CandidatePruning, vertices_without_certificate
+from .partitioned_matching import PartitionedMatching, repair_matching
+from .perfect_matching import (
+    matched_pairs,
+    matching_weight,
+    min_weight_perfect_matching,
+)
 from .transition_cost import TransitionCostCalculator
 
 
 class AtomicStripMatching:
-    def __init__(self, graph: nx.Graph, transition_costs: TransitionCostCalculator):
+    def __init__(
+        self,
+        graph: typing.Union[nx.Graph, CompiledGraph],
+        transition_costs: TransitionCostCalculator,
+        bulk: bool = False,
+        candidates: typing.Optional[int] = None,
+        partitioning: typing.Optional[PartitionedMatching] = None,
+        incremental: bool = False,
+        repair_rings: int = 2,
+    ):
+        """
+        The graph can also be given in compiled form, which makes the neighbor
+        lookups cheaper.
+        With `bulk`, the transitions are not created as AtomicStripEdge objects when
+        adding a strip. Instead, `solve` computes all of them at once with
+        `TransitionCostCalculator.transition_edges` and only keeps arrays.
+        `self.edges` then only contains the edges that were added explicitly.
+        With `candidates` (requires `bulk`), only the cheapest `candidates`
+        transitions per strip end are kept, see `CandidatePruning`.
+        With `partitioning` (requires `bulk`), the matching is solved in tiles, see
+        `PartitionedMatching`.
+        With `incremental` (requires `bulk`), the matching graph is kept after the
+        first `solve` and cannot be extended anymore. Edge weights and skip
+        penalties can be updated in place and the next `solve` starts from the
+        previous matching: Only the strip ends at points up to `repair_rings` edges
+        away from the changed edges are re-matched, see `repair_matching`. The
+        result is at least as good as the previous matching under the new weights,
+        but not necessarily optimal. Use `solve(full=True)` for an exact re-solve,
+        which still saves rebuilding the matching graph.
+        """
+        if candidates is not None and not bulk:
+            msg = "Candidate pruning requires the bulk mode."
+            raise ValueError(msg)
+        if partitioning is not None and not bulk:
+            msg = "Partitioned matching requires the bulk mode."
+            raise ValueError(msg)
+        if incremental and not bulk:
+            msg = "The incremental mode requires the bulk mode."
+            raise ValueError(msg)
         self.atomic_strips = AtomicStrips()
         self.edges = AtomicStripEdges()
-        self.graph = graph
+        if isinstance(graph, CompiledGraph):
+            self.graph = graph.graph
+            self._compiled = graph
+        else:
+            self.graph = graph
+            self._compiled = CompiledGraph(graph) if bulk else None
+        self._neighbors = graph.neighbors
         self.transition_costs = transition_costs
+        self.bulk = bulk
+        self.pruning = CandidatePruning(candidates) if candidates else None
+        self.partitioning = partitioning
+        self.matching_weight = None  # the weight of the last solution
+        self.number_of_matching_edges = 0  # the edges of the last solved graph
         self._matching_partner = {}
+        self.incremental = incremental
+        self.repair_rings = repair_rings
+        self.repaired_ends = 0  # the re-matched strip ends of the last solve
+        # state of the incremental mode after the first solve
+        self._edge_arrays = None
+        self._edge_keys = None
+        self._end_point_ids = None
+        self._changed_edges = []
+        self._partner = None  # the matched strip end of every strip end
+
+    def _check_extensible(self):
+        if self._edge_arrays is not None:
+            msg = "The matching graph cannot be changed after the first solve."
+            raise ValueError(msg)
 
     def _add_skip_edge(self, atomic_strip: AtomicStrip, weight: float):
-        self.edges.create(atomic_strip.vertices[0], atomic_strip.vertices[1], weight)
+        if self.bulk:
+            self.add_edge(atomic_strip.vertices[0], atomic_strip.vertices[1], weight)
+        else:
+            self.edges.create(
+                atomic_strip.vertices[0], atomic_strip.vertices[1], weight
+            )
 
     def connect_strips_fully(self, s0: AtomicStrip, s1: AtomicStrip):
         for v0 in s0.vertices:
@@ -42,6 +123,7 @@ class AtomicStripMatching:
         """
         If the edge already exists, the weight is adapted to the minimum weight.
         """
+        self._check_extensible()
         exists = self.edges.contains_edge_between(v0, v1)
         if weight < 0:
             msg = "Only values >=0.0 are allowed."
@@ -56,25 +138,181 @@ class AtomicStripMatching:
 
     def _connect_to_all_neighbored_strips(self, s: AtomicStrip):
         point = s.point_vertex
-        for n in self.graph.neighbors(point):
+        for n in self._neighbors(point):
             for s2 in self.atomic_strips.get_atomic_strips_of_point(n):
                 self.connect_strips_fully(s, s2)
 
     def create_atomic_strip(self, point: PointVertex, orientation: float):
+        self._check_extensible()
         s = self.atomic_strips.create(point, orientation)
-        self._connect_to_all_neighbored_strips(s)
+        if not self.bulk:
+            self._connect_to_all_neighbored_strips(s)
         return s
 
     def add_skip_penalty(self, atomic_strip: AtomicStrip, skip_penalty: float):
         assert skip_penalty >= 0, "Non-negative skip penalties are prohibited."
         self._add_skip_edge(atomic_strip, skip_penalty)
 
-    def solve(self):
-        edges = {
-            (e.vertices[0].index, e.vertices[1].index): e.weight for e in self.edges
-        }
-        print(f"Solve matching on {len(self.edges)} edges.")
-        matching = blossomv.min_weight_perfect_matching(edges)
+    def update_edge_weight(
+        self, v0: AtomicStripVertex, v1: AtomicStripVertex, weight: float
+    ):
+        """
+        Sets the weight of an existing edge. Before the first solve, this is only
+        possible for explicitly added edges (e.g., skip edges); in the incremental
+        mode afterwards, for every edge of the matching graph.
+        """
+        if weight < 0:
+            msg = "Only values >=0.0 are allowed."
+            raise ValueError(msg)
+        if self._edge_arrays is not None:
+            self._changed_edges.append(self._edge_index(v0.index, v1.index))
+            self._edge_arrays[2][self._changed_edges[-1]] = weight
+        elif not self.edges.contains_edge_between(v0, v1):
+            msg = "There is no such edge."
+            raise ValueError(msg)
+        if self.edges.contains_edge_between(v0, v1):
+            self.edges.get_edge_between(v0, v1).weight = weight
+
+    def update_skip_penalty(self, atomic_strip: AtomicStrip, skip_penalty: float):
+        """
+        Changes the penalty of a strip that already has a skip penalty.
+        """
+        assert skip_penalty >= 0, "Non-negative skip penalties are prohibited."
+        v0, v1 = atomic_strip.vertices
+        self.update_edge_weight(v0, v1, skip_penalty)
+
+    def _edge_index(self, i: int, j: int) -> int:
+        n = len(self.atomic_strips.vertices)
+        key = min(i, j) * n + max(i, j)
+        order, keys = self._edge_keys
+        pos = int(np.searchsorted(keys, key))
+        if pos == len(keys) or keys[pos] != key:
+            msg = "There is no such edge in the matching graph."
+            raise ValueError(msg)
+        return int(order[pos])
+
+    def _explicit_edge_arrays(
+        self,
+    ) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        n = len(self.edges)
+        ends0 = np.fromiter((e.vertices[0].index for e in self.edges), np.int64, n)
+        ends1 = np.fromiter((e.vertices[1].index for e in self.edges), np.int64, n)
+        weights = np.fromiter((e.weight for e in self.edges), float, n)
+        return ends0, ends1, weights
+
+    def _compiled_graph(self) -> CompiledGraph:
+        if self._compiled is None:
+            self._compiled = CompiledGraph(self.graph)
+        return self._compiled
+
+    def _end_points(self) -> np.ndarray:
+        """
+        The vertex ids of the points of the strip ends.
+        """
+        vertices = self.atomic_strips.vertices
+        vertex_ids = self._compiled_graph().vertex_ids
+        return np.fromiter(
+            (vertex_ids[vertices[i].point_vertex] for i in range(len(vertices))),
+            np.int64,
+            len(vertices),
+        )
+
+    def edge_arrays(self) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        All edges of the matching graph as arrays (ends0, ends1, weights) of strip
+        vertex indices with ends0 < ends1.
+        """
+        ends0, ends1, weights = self._explicit_edge_arrays()
+        if not self.bulk:
+            return ends0, ends1, weights
+        vertices = self.atomic_strips.vertices
+        end_points = self._end_points()
+        end_directions = np.fromiter(
+            (vertices[i].direction for i in range(len(vertices))),
+            float,
+            len(vertices),
+        )
+        t0, t1, tw = self.transition_costs.transition_edges(
+            self._compiled, end_points, end_directions
+        )
+        if self.pruning:
+            keep = self.pruning(
+                self._compiled, end_points, (t0, t1, tw), (ends0, ends1, weights)
+            )
+            print(f"Pruned the matching graph to {keep.sum()}/{len(keep)} transitions.")
+            t0, t1, tw = t0[keep], t1[keep], tw[keep]
+        # explicit edges are never transitions of the same points, but added edges
+        # could be. Keep the minimum weight as `add_edge` does.
+        ends0 = np.concatenate([t0, ends0])
+        ends1 = np.concatenate([t1, ends1])
+        weights = np.concatenate([tw, weights])
+        keys = ends0 * len(vertices) + ends1
+        order = np.lexsort((weights, keys))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = keys[order][1:] != keys[order][:-1]
+        order = order[first]
+        return ends0[order], ends1[order], weights[order]
+
+    def _solve_edges(self, end_points: np.ndarray, edges) -> np.ndarray:
+        if self.partitioning:
+            return self.partitioning(self._compiled, end_points, edges)
+        return min_weight_perfect_matching(*edges)
+
+    def _keep_matching_graph(self, end_points: np.ndarray, edges):
+        ends0, ends1, weights = edges
+        n = len(self.atomic_strips.vertices)
+        keys = np.minimum(ends0, ends1) * n + np.maximum(ends0, ends1)
+        order = np.argsort(keys)
+        self._edge_arrays = (ends0, ends1, weights.copy())
+        self._edge_keys = (order, keys[order])
+        self._end_point_ids = end_points
+
+    def _resolve(self, full: bool) -> np.ndarray:
+        edges = self._edge_arrays
+        if full:
+            self.repaired_ends = len(self._partner)
+            return self._solve_edges(self._end_point_ids, edges)
+        # release the ends of the changed edges and their partners
+        partner = self._partner.copy()
+        changed = np.array(self._changed_edges, dtype=np.int64)
+        released = np.concatenate([edges[0][changed], edges[1][changed]])
+        partner[partner[released]] = -1
+        partner[released] = -1
+        pairs, self.repaired_ends = repair_matching(
+            self._compiled,
+            self._end_point_ids,
+            edges,
+            partner,
+            rings=self.repair_rings,
+        )
+        return pairs
+
+    def solve(self, full: bool = False):
+        """
+        Computes the minimum weight perfect matching and returns the matched pairs of
+        strip vertices. `full` only matters for re-solves in the incremental mode.
+        """
+        if self._edge_arrays is not None:
+            ends0, ends1, weights = self._edge_arrays
+            if self._changed_edges or full:
+                pairs = self._resolve(full)
+            else:
+                self.repaired_ends = 0
+                pairs = matched_pairs(self._partner)
+        else:
+            ends0, ends1, weights = self.edge_arrays()
+            self.number_of_matching_edges = len(weights)
+            print(f"Solve matching on {len(weights)} edges.")
+            end_points = self._end_points() if self.bulk else None
+            pairs = self._solve_edges(end_points, (ends0, ends1, weights))
+            if self.incremental:
+                self._keep_matching_graph(end_points, (ends0, ends1, weights))
+        self._changed_edges = []
+        self.matching_weight = matching_weight(pairs, ends0, ends1, weights)
+        self._partner = np.full(len(self.atomic_strips.vertices), -1)
+        self._partner[pairs[:, 0]] = pairs[:, 1]
+        self._partner[pairs[:, 1]] = pairs[:, 0]
+        matching = pairs.tolist()
         self._matching_partner = {
             self.atomic_strips.vertices[e[0]]: self.atomic_strips.vertices[e[1]]
             for e in matching
@@ -111,27 +349,115 @@ class AtomicStripMatching:
             yield v
             v = self.atomic_strips.vertices.get_partner(v)
 
+    def _cycle_passages(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        The passage ids of the cycles of the matching, cycle after cycle, and the
+        start of every cycle in this array (plus the end).
+        Can only be called after `solve()`!
+        """
+        compiled = self._compiled_graph()
+        partner = self._partner.tolist()
+        points = self._end_points().tolist()
+        visited = bytearray(len(partner))
+        ends_a, centers, ends_b = [], [], []
+        cycle_starts = [0]
+        cycle = []
+        for v in range(len(partner)):
+            if visited[v]:
+                continue
+            # alternate between the matching edge and the strip (strip ends 2i, 2i+1)
+            u, steps = v, 0
+            cycle.clear()
+            while True:
+                w = partner[u]
+                visited[u] = visited[w] = 1
+                for p in (points[u], points[w]):
+                    if not cycle or cycle[-1] != p:
+                        cycle.append(p)
+                steps += 1
+                u = w ^ 1
+                if u == v:
+                    break
+            if steps < 2:
+                continue  # a skipped strip
+            if cycle[-1] == cycle[0]:
+                cycle.pop()
+            n = len(cycle)
+            for i in range(n):
+                ends_a.append(cycle[i])
+                centers.append(cycle[(i + 1) % n])
+                ends_b.append(cycle[(i + 2) % n])
+            cycle_starts.append(len(centers))
+        passages = compiled.passage_ids_of(
+            np.array(centers, dtype=np.int64),
+            np.array(ends_a, dtype=np.int64),
+            np.array(ends_b, dtype=np.int64),
+        )
+        return passages, np.array(cycle_starts, dtype=np.int64)
+
+    def to_sparse_solution(self) -> SparseFractionalSolution:
+        """
+        The passages of the matching as solution over the passage ids.
+        Can only be called after `solve()`!
+        """
+        passages, _ = self._cycle_passages()
+        return SparseFractionalSolution(
+            self._compiled_graph(), passages, np.ones(len(passages))
+        )
+
     def to_solution(self) -> FractionalSolution:
-        fractional_solution = FractionalSolution()
-        already_visited_vertices = set()
-        for v in self.atomic_strips.vertices:
-            if v not in already_visited_vertices:
-                c = list(self.walk(v))
-                if len(c) > 2:
-                    points = []
-                    for v_ in c:
-                        already_visited_vertices.add(v_)
-                        if not points or v_.point_vertex != points[-1]:
-                            points.append(v_.point_vertex)
-                    if points[-1] == points[0]:
-                        points.pop()
-                    for i in range(len(points)):
-                        j = (i + 1) % len(points)
-                        k = (i + 2) % len(points)
-                        vp = VertexPassage(points[j], end_a=points[i], end_b=points[k])
-                        fractional_solution.add(vp, 1.0)
-            already_visited_vertices.add(v)
-        return fractional_solution
+        return self.to_sparse_solution().to_fractional_solution()
+
+    def to_cycles(self) -> typing.List[Cycle]:
+        """
+        The cycles of the matching. Makes `create_cycle_solution` unnecessary.
+        Can only be called after `solve()`!
+        """
+        passages, starts = self._cycle_passages()
+        vertex_passages = self._compiled_graph().passages
+        passages = passages.tolist()
+        return [
+            Cycle([vertex_passages[p] for p in passages[start:end]])
+            for start, end in zip(starts[:-1].tolist(), starts[1:].tolist())
+        ]
+
+
+def _unit_grid(width: int, height: int) -> nx.Graph:
+    """
+    The grid graph of `width` x `height` points with unit distances.
+    """
+    points = [
+        PointVertex(float(x), float(y)) for x in range(width) for y in range(height)
+    ]
+    graph = nx.Graph()
+    graph.add_nodes_from(points)
+    for p in points:
+        for q in points:
+            if abs(p.x - q.x) + abs(p.y - q.y) == 1.0:
+                graph.add_edge(p, q)
+    return graph
+
+
+def _two_strip_matching(
+    graph: nx.Graph,
+    penalty: typing.Optional[typing.Callable[[PointVertex], float]] = None,
+    **kwargs,
+) -> typing.Tuple[AtomicStripMatching, typing.List[AtomicStrip]]:
+    """
+    A matching with a horizontal and a vertical strip at every point of the graph.
+    With `penalty`, the strips of a point can be skipped for `penalty(point)`.
+    """
+    tcc = TransitionCostCalculator(
+        SimpleTouringCosts(turn_factor=1.0, distance_factor=1.0)
+    )
+    asm = AtomicStripMatching(graph, tcc, **kwargs)
+    strips = []
+    for p in graph.nodes:
+        for o in (0.0, 0.5 * math.pi):
+            strips.append(asm.create_atomic_strip(p, o))
+            if penalty is not None:
+                asm.add_skip_penalty(strips[-1], penalty(p))
+    return asm, strips
 
 
 class AtomicStripMatchingTest(unittest.TestCase):
@@ -157,3 +483,98 @@ class AtomicStripMatchingTest(unittest.TestCase):
         assert s0.vertices not in edges
         assert s1.vertices in edges
         assert s2.vertices not in edges
+
+    def test_bulk_edges(self):
+        points = [PointVertex(x, y) for x, y in [(0, 0), (1, 0), (1, 1), (0, 1)]]
+        graph = nx.Graph()
+        graph.add_nodes_from(points)
+        graph.add_edges_from([(points[i], points[(i + 1) % 4]) for i in range(4)])
+        tcc = TransitionCostCalculator(
+            SimpleTouringCosts(turn_factor=1.0, distance_factor=2.0)
+        )
+        edge_sets = []
+        for bulk in (False, True):
+            asm = AtomicStripMatching(graph, tcc, bulk=bulk)
+            for i, p in enumerate(points):
+                for o in (0.0, 0.5 * i, 2.0):
+                    s = asm.create_atomic_strip(p, o)
+                asm.add_skip_penalty(s, 0.5)
+            ends0, ends1, weights = asm.edge_arrays()
+            edge_sets.append(
+                {(v, w): x for v, w, x in zip(ends0.tolist(), ends1.tolist(), weights)}
+            )
+        assert edge_sets[0].keys() == edge_sets[1].keys()
+        for e, w in edge_sets[0].items():
+            self.assertAlmostEqual(w, edge_sets[1][e])
+
+    def test_pruned_edges(self):
+        # the grid is bipartite and transitions connect neighbors, so the color
+        # classes need equally many points for a perfect matching
+        graph = _unit_grid(4, 3)
+        asm, _ = _two_strip_matching(graph, bulk=True, candidates=2)
+        ends0, ends1, weights = asm.edge_arrays()
+        full, _ = _two_strip_matching(graph, bulk=True)
+        full_edges = full.edge_arrays()
+        assert len(weights) <= len(full_edges[2])
+        full_weights = dict(zip(zip(*full_edges[:2]), full_edges[2]))
+        for v, w, x in zip(ends0, ends1, weights):
+            assert full_weights[(v, w)] == x
+        n = len(asm.atomic_strips.vertices)
+        assert len(vertices_without_certificate(n, ends0, ends1)) == 0
+
+    def test_partitioned(self):
+        graph = _unit_grid(6, 6)
+        weights = []
+        for partitioning in (None, PartitionedMatching(tile_size=2.0)):
+            asm, strips = _two_strip_matching(
+                graph, bulk=True, partitioning=partitioning
+            )
+            edges = asm.solve()
+            assert len(edges) == len(strips)
+            assert all(asm[asm[v]] == v for v in asm.atomic_strips.vertices)
+            weights.append(asm.matching_weight)
+        assert weights[0] <= weights[1] + 1e-6
+
+    def test_incremental(self):
+        graph = _unit_grid(4, 4)
+        points = list(graph.nodes)
+        asm, strips = _two_strip_matching(
+            graph, lambda p: 0.1, bulk=True, incremental=True
+        )
+        asm.solve()
+        first = asm.matching_weight
+        asm.solve()
+        assert asm.repaired_ends == 0 and asm.matching_weight == first
+        with self.assertRaises(ValueError):
+            asm.create_atomic_strip(points[0], 1.0)
+
+        def penalty(p):
+            return 100.0 if p in points[:4] else 0.1
+
+        for s in strips[:8]:
+            asm.update_skip_penalty(s, penalty(s.point_vertex))
+        asm.solve()
+        assert 0 < asm.repaired_ends
+        assert all(asm[asm[v]] == v for v in asm.atomic_strips.vertices)
+        repaired = asm.matching_weight
+        asm.solve(full=True)
+        fresh, _ = _two_strip_matching(graph, penalty, bulk=True)
+        fresh.solve()
+        self.assertAlmostEqual(asm.matching_weight, fresh.matching_weight)
+        assert fresh.matching_weight <= repaired + 1e-6
+
+    def test_cycles(self):
+        asm, _ = _two_strip_matching(
+            _unit_grid(4, 3), lambda p: 0.5 if p.x < 2 else 100.0, bulk=True
+        )
+        asm.solve()
+        cycles = asm.to_cycles()
+        assert cycles and all(c.is_connected() for c in cycles)
+        solution = asm.to_sparse_solution()
+        from_cycles = SparseFractionalSolution.from_cycles(solution.compiled, cycles)
+        assert solution == from_cycles
+        assert solution.is_flow_feasible() and solution.is_integral()
+        # the points with expensive skip penalties are covered
+        covered = solution.coverages()
+        for v, p in enumerate(solution.compiled.vertices):
+            assert p.x < 2 or covered[v] >= 1
@@ -0,0 +1,135 @@
+"""
+Pruning of the atomic strip matching graph. Only the cheapest transitions of every
+strip end are kept as candidates. Because this can destroy all perfect matchings, the
+pruned graph is certified and repaired locally where no certificate is found.
+"""
+
+import typing
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components, maximum_bipartite_matching
+
+
+def cheapest_per_end(
+    ends0: np.ndarray, ends1: np.ndarray, weights: np.ndarray, n: int, m: int
+) -> np.ndarray:
+    """
+    Returns a mask of the edges that are among the m cheapest edges of at least one
+    of their ends. `n` is the number of vertices.
+    """
+    ends = np.concatenate([ends0, ends1])
+    edges = np.tile(np.arange(len(ends0)), 2)
+    order = np.lexsort((np.concatenate([weights, weights]), ends))
+    sorted_ends = ends[order]
+    group_starts = np.searchsorted(sorted_ends, np.arange(n))
+    rank = np.arange(len(order)) - group_starts[sorted_ends]
+    keep = np.zeros(len(ends0), dtype=bool)
+    keep[edges[order[rank < m]]] = True
+    return keep
+
+
+def vertices_without_certificate(
+    n: int, ends0: np.ndarray, ends1: np.ndarray
+) -> np.ndarray:
+    """
+    Tries to certify that the graph has a perfect matching and returns the vertices
+    for which this failed (empty if the certificate was found).
+
+    A perfect matching of the bipartite double cover (v->w and w->v for every edge)
+    is computed with Hopcroft-Karp. It is a permutation that decomposes into cycles.
+    If all cycles are even (2-cycles are single edges), taking every second edge of
+    the cycles gives a perfect matching of the graph. Otherwise, the unmatched vertices
+    or the vertices on odd cycles are returned. A returned vertex does not prove that
+    there is no perfect matching.
+    """
+    rows = np.concatenate([ends0, ends1])
+    cols = np.concatenate([ends1, ends0])
+    double_cover = sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n)
+    )
+    partner = maximum_bipartite_matching(double_cover, perm_type="column")
+    unmatched = np.flatnonzero(partner < 0)
+    if len(unmatched) > 0:
+        return unmatched
+    permutation = sp.csr_matrix(
+        (np.ones(n, dtype=np.int8), (np.arange(n), partner)), shape=(n, n)
+    )
+    _, labels = connected_components(permutation, directed=True, connection="weak")
+    cycle_lengths = np.bincount(labels)
+    return np.flatnonzero(cycle_lengths[labels] % 2 == 1)
+
+
+class CandidatePruning:
+    """
+    Keeps the `m` cheapest transitions per strip end. The explicit edges (e.g., the
+    skip edges) are always kept. If the pruned graph cannot be certified to have a
+    perfect matching, all transitions at the points of the problematic strip ends and
+    their neighbored points are restored. After `max_repairs` rounds, the full edge
+    set is used.
+    """
+
+    def __init__(self, m: int, max_repairs: int = 10):
+        if m < 1:
+            msg = "At least one candidate per strip end is necessary."
+            raise ValueError(msg)
+        self.m = m
+        self.max_repairs = max_repairs
+        self.restored_points = 0  # statistics of the last call
+
+    def __call__(
+        self,
+        compiled,
+        end_points: np.ndarray,
+        transitions: typing.Tuple[np.ndarray, np.ndarray, np.ndarray],
+        explicit_edges: typing.Tuple[np.ndarray, np.ndarray, np.ndarray],
+    ) -> np.ndarray:
+        """
+        Returns the mask of the transitions to keep.
+        """
+        n = len(end_points)
+        ends0, ends1, weights = transitions
+        keep = cheapest_per_end(ends0, ends1, weights, n, self.m)
+        restored = np.zeros(len(compiled), dtype=bool)
+        for _ in range(self.max_repairs):
+            problems = vertices_without_certificate(
+                n,
+                np.concatenate([ends0[keep], explicit_edges[0]]),
+                np.concatenate([ends1[keep], explicit_edges[1]]),
+            )
+            if len(problems) == 0:
+                self.restored_points = int(restored.sum())
+                return keep
+            points = np.zeros(len(compiled), dtype=bool)
+            points[end_points[problems]] = True
+            ring = compiled.adjacency_indices[points[compiled.adjacency_sources]]
+            points[ring] = True
+            if not np.any(points & ~restored):
+                break  # nothing left to restore locally
+            restored |= points
+            keep |= restored[end_points[ends0]] | restored[end_points[ends1]]
+        print("Could not certify the pruned matching graph. Using all edges.")
+        self.restored_points = len(compiled)
+        return np.ones(len(ends0), dtype=bool)
+
+
+class CandidatePruningTest(unittest.TestCase):
+    def test_cheapest_per_end(self):
+        ends0 = np.array([0, 0, 0, 1])
+        ends1 = np.array([1, 2, 3, 2])
+        weights = np.array([3.0, 1.0, 2.0, 0.5])
+        keep = cheapest_per_end(ends0, ends1, weights, 4, 1)
+        # 0: (0,2), 1: (1,2), 2: (1,2), 3: (0,3)
+        assert keep.tolist() == [False, True, True, True]
+
+    def test_certificate(self):
+        # a path of 4 vertices has a perfect matching
+        path = np.array([0, 1, 2]), np.array([1, 2, 3])
+        assert len(vertices_without_certificate(4, *path)) == 0
+        # a triangle has none
+        triangle = np.array([0, 1, 0]), np.array([1, 2, 2])
+        assert len(vertices_without_certificate(3, *triangle)) == 3
+        # a star has none
+        star = np.array([0, 0, 0]), np.array([1, 2, 3])
+        assert len(vertices_without_certificate(4, *star)) > 0
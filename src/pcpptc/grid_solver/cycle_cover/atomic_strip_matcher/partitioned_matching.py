@@ -0,0 +1,210 @@
+"""
+A partitioned version of the atomic strip matching for very large grids. Instead of
+one global Blossom V call, the points are split into square tiles that are matched
+independently (in a process pool) and the strips at the tile borders are re-matched
+afterwards.
+"""
+
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .candidate_pruning import vertices_without_certificate
+from .perfect_matching import matched_pairs, min_weight_perfect_matching
+
+Edges = typing.Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _induced(mask: np.ndarray, edges: Edges) -> typing.Tuple[np.ndarray, Edges]:
+    """
+    The subgraph induced by the vertices in the mask, with vertices renumbered to
+    0..k-1. Also returns the original ids of the new vertices.
+    """
+    ends0, ends1, weights = edges
+    vertices = np.flatnonzero(mask)
+    inner = mask[ends0] & mask[ends1]
+    local0 = np.searchsorted(vertices, ends0[inner])
+    local1 = np.searchsorted(vertices, ends1[inner])
+    return vertices, (local0, local1, weights[inner])
+
+
+def _match_tile(
+    edges: Edges, unmatched_costs: np.ndarray
+) -> typing.Optional[np.ndarray]:
+    """
+    Matches a tile in which vertex i may stay unmatched for `unmatched_costs[i]`.
+    For this, the graph is doubled and every vertex is connected to its copy, such
+    that a perfect matching always exists. Returns the matched pairs of the first
+    copy.
+    """
+    k = len(unmatched_costs)
+    if k == 0:
+        return None
+    ends0, ends1, weights = edges
+    copies = np.arange(k)
+    pairs = min_weight_perfect_matching(
+        np.concatenate([ends0, ends0 + k, copies]),
+        np.concatenate([ends1, ends1 + k, copies + k]),
+        np.concatenate([weights, weights, unmatched_costs]),
+    )
+    return pairs[(pairs[:, 0] < k) & (pairs[:, 1] < k)]
+
+
+def _ring(compiled, points: np.ndarray) -> np.ndarray:
+    points = points.copy()
+    points[compiled.adjacency_indices[points[compiled.adjacency_sources]]] = True
+    return points
+
+
+def repair_matching(
+    compiled,
+    end_points: np.ndarray,
+    edges: Edges,
+    partner: np.ndarray,
+    rings: int = 2,
+    max_repairs: int = 5,
+) -> typing.Tuple[np.ndarray, int]:
+    """
+    Completes a partial matching, given by `partner` (the matched end or -1). The
+    free ends, together with all ends at points up to `rings` edges away, are
+    re-matched in one problem. If this problem is not certified to be feasible, the
+    rings are increased. After `max_repairs` rounds, everything is matched globally.
+    Returns the pairs of the perfect matching and the number of re-matched ends.
+    """
+    free = partner < 0
+    if not np.any(free):
+        return matched_pairs(partner), 0
+    points = np.zeros(len(compiled), dtype=bool)
+    points[end_points[free]] = True
+    for _ in range(rings):
+        points = _ring(compiled, points)
+    for _ in range(max_repairs):
+        released = points[end_points]
+        # the partner of a released end is released, too
+        released[partner[released & (partner >= 0)]] = True
+        vertices, (local0, local1, weights) = _induced(released, edges)
+        if len(vertices) == 0:
+            break
+        if len(vertices_without_certificate(len(vertices), local0, local1)) == 0:
+            print(f"Repairing the matching with {len(vertices)} strip ends.")
+            pairs = min_weight_perfect_matching(local0, local1, weights)
+            result = partner.copy()
+            result[vertices] = -1
+            a, b = vertices[pairs[:, 0]], vertices[pairs[:, 1]]
+            result[a] = b
+            result[b] = a
+            assert np.all(result >= 0), "Should be a perfect matching"
+            return matched_pairs(result), len(vertices)
+        points = _ring(compiled, points)
+    print("Could not repair the matching locally. Matching globally.")
+    return min_weight_perfect_matching(*edges), len(end_points)
+
+
+class PartitionedMatching:
+    """
+    Computes a perfect matching of the strip ends in square tiles of side length
+    `tile_size`:
+    1. Every tile is extended by `overlap` and matched on its own. The strip ends
+       may stay unmatched, for free in the overlap and expensive in the tile itself.
+    2. Only pairs with both ends in the tile (not the overlap) are accepted.
+    3. Seam repair: The ends that are not matched yet, together with all ends at
+       points up to `seam_rings` edges away, are re-matched in one problem. If this
+       problem is not certified to be feasible, the rings are increased. As last
+       resort, everything is matched globally.
+    The result is a perfect matching of the full graph and can be used like a global
+    one.
+    """
+
+    def __init__(
+        self,
+        tile_size: float,
+        overlap: typing.Optional[float] = None,
+        workers: int = 1,
+        seam_rings: int = 2,
+        max_seam_repairs: int = 5,
+    ):
+        """
+        Without `overlap`, twice the longest edge of the graph is used.
+        """
+        if tile_size <= 0:
+            msg = "The tile size has to be positive."
+            raise ValueError(msg)
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.workers = workers
+        self.seam_rings = seam_rings
+        self.max_seam_repairs = max_seam_repairs
+        # statistics of the last call
+        self.number_of_tiles = 0
+        self.seam_size = 0
+
+    def _tiles(self, compiled) -> typing.Iterable[typing.Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yields for every tile the masks of the points in the tile and in the extended
+        tile.
+        """
+        overlap = self.overlap
+        if overlap is None:
+            overlap = 2 * float(compiled.edge_lengths.max(initial=0.0))
+        xy = compiled.coordinates
+        origin = xy.min(axis=0)
+        cells = np.floor((xy - origin) / self.tile_size).astype(np.int64)
+        for cell in np.unique(cells, axis=0):
+            low = origin + cell * self.tile_size
+            high = low + self.tile_size
+            core = np.all(cells == cell, axis=1)
+            extended = np.all((xy >= low - overlap) & (xy < high + overlap), axis=1)
+            yield core, extended
+
+    def __call__(self, compiled, end_points: np.ndarray, edges: Edges) -> np.ndarray:
+        """
+        Returns the matched pairs as (k, 2) array of strip end indices.
+        `end_points` are the vertex ids of the strip ends and `edges` the full
+        matching graph as (ends0, ends1, weights).
+        """
+        n = len(end_points)
+        weights = edges[2]
+        expensive = 4 * float(weights.max(initial=0.0)) + 1.0
+        partner = np.full(n, -1, dtype=np.int64)
+
+        tasks = []
+        for core, extended in self._tiles(compiled):
+            vertices, local_edges = _induced(extended[end_points], edges)
+            in_core = core[end_points[vertices]]
+            unmatched_costs = np.where(in_core, expensive, 0.0)
+            tasks.append((vertices, in_core, local_edges, unmatched_costs))
+        self.number_of_tiles = len(tasks)
+        print(f"Matching {len(tasks)} tiles.")
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(
+                    executor.map(
+                        _match_tile,
+                        [t[2] for t in tasks],
+                        [t[3] for t in tasks],
+                    )
+                )
+        else:
+            results = [_match_tile(t[2], t[3]) for t in tasks]
+        for (vertices, in_core, _, _), pairs in zip(tasks, results):
+            if pairs is None:
+                continue
+            accepted = pairs[in_core[pairs[:, 0]] & in_core[pairs[:, 1]]]
+            a, b = vertices[accepted[:, 0]], vertices[accepted[:, 1]]
+            partner[a] = b
+            partner[b] = a
+        return self._repair_seams(compiled, end_points, edges, partner)
+
+    def _repair_seams(
+        self, compiled, end_points: np.ndarray, edges: Edges, partner: np.ndarray
+    ) -> np.ndarray:
+        pairs, self.seam_size = repair_matching(
+            compiled,
+            end_points,
+            edges,
+            partner,
+            rings=self.seam_rings,
+            max_repairs=self.max_seam_repairs,
+        )
+        return pairs
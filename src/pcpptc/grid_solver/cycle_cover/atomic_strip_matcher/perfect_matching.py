@@ -0,0 +1,36 @@
+import numpy as np
+from blossomv import blossomv
+
+
+def min_weight_perfect_matching(
+    ends0: np.ndarray, ends1: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    """
+    Solves the minimum weight perfect matching with Blossom V and returns the matched
+    edges as (k, 2) array. Parallel edges are reduced to the last one.
+    """
+    # the wrapper of Blossom V only accepts a dict {(v0, v1): weight}
+    edges = dict(zip(zip(ends0.tolist(), ends1.tolist()), weights.tolist()))
+    matching = blossomv.min_weight_perfect_matching(edges)
+    return np.array(list(matching), dtype=np.int64).reshape(-1, 2)
+
+
+def matching_weight(
+    pairs: np.ndarray, ends0: np.ndarray, ends1: np.ndarray, weights: np.ndarray
+) -> float:
+    """
+    The sum of the weights of the matched edges.
+    """
+    n = int(max(ends0.max(initial=0), ends1.max(initial=0))) + 1
+    keys = np.minimum(ends0, ends1) * n + np.maximum(ends0, ends1)
+    order = np.argsort(keys)
+    matched = np.min(pairs, axis=1) * n + np.max(pairs, axis=1)
+    return float(weights[order[np.searchsorted(keys[order], matched)]].sum())
+
+
+def matched_pairs(partner: np.ndarray) -> np.ndarray:
+    """
+    The pairs of a perfect matching given by the partner of every vertex.
+    """
+    ends = np.flatnonzero(np.arange(len(partner)) < partner)
+    return np.stack([ends, partner[ends]], axis=1)
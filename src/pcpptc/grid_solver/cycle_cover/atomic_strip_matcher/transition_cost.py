@@ -1,9 +1,18 @@
 import math
+import typing
 import unittest
 
+import networkx as nx
+import numpy as np
+
 from pcpptc.utils import abs_angle_difference, direction
 
-from ...grid_instance import PointVertex, SimpleTouringCosts, TouringCosts
+from ...grid_instance import (
+    CompiledGraph,
+    PointVertex,
+    SimpleTouringCosts,
+    TouringCosts,
+)
 from .atomic_strip_vertex import AtomicStripVertex
 
 
@@ -27,6 +36,58 @@ class TransitionCostCalculator:
         ) + self.touring_cost.turn_cost_at_vertex(at=v1.point_vertex, angle=second_turn)
         return turn_cost + distance_cost
 
+    def transition_edges(
+        self,
+        compiled: CompiledGraph,
+        end_points: np.ndarray,
+        end_directions: np.ndarray,
+    ) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Computes all transitions between the strip ends of neighbored points at once.
+        `end_points[i]` is the vertex id and `end_directions[i]` the direction of the
+        strip end i. Returns the arrays (ends0, ends1, weights) with ends0 < ends1,
+        where every strip end is connected to every strip end at a neighbored point.
+        The weights equal `self(v0, v1)`.
+        """
+        n = len(compiled)
+        end_points = np.asarray(end_points, dtype=np.int64)
+        end_directions = np.asarray(end_directions, dtype=float) % (2 * math.pi)
+        # the strip ends grouped by point
+        order = np.argsort(end_points, kind="stable")
+        counts = np.bincount(end_points, minlength=n)
+        starts = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+        a, b = compiled.edges[:, 0], compiled.edges[:, 1]
+        pairs = counts[a] * counts[b]
+        edge_of_pair = np.repeat(np.arange(len(a)), pairs)
+        offsets = np.zeros(len(a) + 1, dtype=np.int64)
+        np.cumsum(pairs, out=offsets[1:])
+        local = np.arange(int(offsets[-1])) - offsets[edge_of_pair]
+        cb = counts[b][edge_of_pair]
+        ends0 = order[starts[a][edge_of_pair] + local // cb]
+        ends1 = order[starts[b][edge_of_pair] + local % cb]
+
+        # direction of the edge a->b
+        delta = compiled.coordinates[b] - compiled.coordinates[a]
+        edge_direction = np.arctan2(delta[:, 1], delta[:, 0]) % (2 * math.pi)
+        heading = edge_direction[edge_of_pair]
+        first_turn = _abs_angle_difference(end_directions[ends0], heading)
+        second_turn = _abs_angle_difference(
+            heading, (end_directions[ends1] + math.pi) % (2 * math.pi)
+        )
+        turn_factors = self.touring_cost.vertex_turn_factors(compiled)
+        distance_costs = self.touring_cost.edge_distance_costs(compiled)
+        weights = (
+            distance_costs[edge_of_pair]
+            + turn_factors[a][edge_of_pair] * first_turn
+            + turn_factors[b][edge_of_pair] * second_turn
+        )
+        return np.minimum(ends0, ends1), np.maximum(ends0, ends1), weights
+
+
+def _abs_angle_difference(a0: np.ndarray, a1: np.ndarray) -> np.ndarray:
+    return np.minimum((a0 - a1) % (2 * math.pi), (a1 - a0) % (2 * math.pi))
+
 
 class TransitionCostCalculatorTest(unittest.TestCase):
     def test_dist(self):
@@ -52,3 +113,30 @@ class TransitionCostCalculatorTest(unittest.TestCase):
         v0 = AtomicStripVertex(0, PointVertex(1.0, 1.0), 0.0)
         v1 = AtomicStripVertex(1, PointVertex(-1.0, 1.0), math.pi)
         self.assertAlmostEqual(c(v0, v1), 2 * math.pi, 2)
+
+    def test_transition_edges(self):
+        points = [PointVertex(0.0, 0.0), PointVertex(1.0, 0.0), PointVertex(1.0, 2.0)]
+        graph = nx.Graph()
+        graph.add_nodes_from(points)
+        graph.add_edges_from([(points[0], points[1]), (points[1], points[2])])
+        compiled = CompiledGraph(graph)
+        c = TransitionCostCalculator(SimpleTouringCosts(2.0, 1.5))
+        ends = [
+            AtomicStripVertex(i, p, d)
+            for i, (p, d) in enumerate(
+                [(points[1], 0.3), (points[0], 1.0), (points[1], 4.0), (points[2], 2.0)]
+            )
+        ]
+        ends0, ends1, weights = c.transition_edges(
+            compiled,
+            np.array([compiled.vertex_ids[v.point_vertex] for v in ends]),
+            np.array([v.direction for v in ends]),
+        )
+        assert sorted(zip(ends0.tolist(), ends1.tolist())) == [
+            (0, 1),
+            (0, 3),
+            (1, 2),
+            (2, 3),
+        ]
+        for i, j, w in zip(ends0, ends1, weights):
+            self.assertAlmostEqual(w, c(ends[i], ends[j]))
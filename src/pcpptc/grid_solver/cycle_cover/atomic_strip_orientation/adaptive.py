@@ -1,5 +1,6 @@
 import itertools
 import math
+from concurrent.futures import Executor
 
 import numpy as np
 
@@ -11,7 +12,9 @@ from ...grid_instance import (
     TouringCosts,
     VertexPassage,
 )
-from ...grid_solution import FractionalSolution
+from ...grid_solution import FractionalSolution, SparseFractionalSolution
+from .orientation_costs import ForcedOrientationCosts
+from .parallel import map_chunks
 
 
 class DominantStripSelector:
@@ -28,24 +31,30 @@ class DominantStripSelector:
         self.verbose = verbose
 
     def __call__(self, orientations: list, usages: dict, tc: TouringCosts):
-        weight = np.zeros(len(orientations))
-        for vp, x in usages.items():
+        vps = list(usages.keys())
 
-            def diff(o):
-                a0 = turn_angle(
-                    v0=vp.end_a, v1=vp.v, v2=vp.end_b, forced_orientation_at_v1=o
-                )
-                a1 = turn_angle(v0=vp.end_a, v1=vp.v, v2=vp.end_b)
-                assert a0 >= a1 - 1e-5
-                return a0 - a1
-
-            min_diff = min(diff(o) for o in orientations)
-            for i, o in enumerate(orientations):
-                w = self.exp ** ((diff(o) - min_diff) / (0.25 * math.pi))
-                weight[i] += x * w
+        def diff(vp, o):
+            a0 = turn_angle(
+                v0=vp.end_a, v1=vp.v, v2=vp.end_b, forced_orientation_at_v1=o
+            )
+            a1 = turn_angle(v0=vp.end_a, v1=vp.v, v2=vp.end_b)
+            assert a0 >= a1 - 1e-5
+            return a0 - a1
+
+        diffs = np.array([[diff(vp, o) for o in orientations] for vp in vps])
+        usage = np.array([usages[vp] for vp in vps])
+        return self.select(diffs.reshape(len(vps), len(orientations)), usage)
+
+    def select(self, diffs: np.ndarray, usage: np.ndarray) -> int:
+        """
+        `diffs[i, j]` is the additional turn angle of the i-th used passage for the
+        j-th orientation and `usage[i]` its usage.
+        """
+        min_diff = diffs.min(axis=1, initial=math.inf)[:, None]
+        weight = usage @ (self.exp ** ((diffs - min_diff) / (0.25 * math.pi)))
         if self.verbose:
             print("Weights:", weight)
-        return np.argmax(weight)
+        return int(np.argmax(weight))
 
 
 # %%
@@ -88,19 +97,87 @@ class NeighborsByMinMax:
         return np.array([[costdiff(vp, o) for o in os] for vp in vps])
 
     def __call__(self, vps, os, touring_costs, selected_idx):
-        available_idx = [i for i, _ in enumerate(os) if i not in selected_idx]
-        m = self._cost_matrix(vps, os, touring_costs)
+        return self.select(self._cost_matrix(vps, os, touring_costs), selected_idx)
+
+    def select(self, m: np.ndarray, selected_idx: typing.List[int]) -> int:
+        """
+        `m[i, j]` is the additional cost of the i-th passage for the j-th orientation.
+        """
+        available_idx = [i for i in range(m.shape[1]) if i not in selected_idx]
         if selected_idx:
             vp_weights = m[:, selected_idx].min(axis=1) ** 2
         else:
-            vp_weights = np.ones(len(vps))
+            vp_weights = np.ones(m.shape[0])
         return min(available_idx, key=lambda i: m[:, i] @ vp_weights)
 
 
+class _VertexChunk:
+    """
+    The slices of the precomputed arrays for the vertices start..stop-1. Only these
+    slices are sent to a worker process.
+    """
+
+    def __init__(
+        self,
+        strategy: "NeighborBasedStripStrategy",
+        table: ForcedOrientationCosts,
+        neighbor_usage: np.ndarray,
+        bounds: np.ndarray,
+        local: np.ndarray,
+        values: np.ndarray,
+        opportunity_losses: typing.List[float],
+        start: int,
+        stop: int,
+    ):
+        compiled = table.compiled
+        self.strategy = strategy
+        p0, p1 = compiled.passage_indptr[start], compiled.passage_indptr[stop]
+        self.passage_indptr = compiled.passage_indptr[start : stop + 1] - p0
+        self.degrees = compiled.degrees[start:stop]
+        self.orientations = table.orientations[start:stop]
+        self.angles = table.angles[p0:p1]
+        self.costs = table.costs[p0:p1]
+        self.neighbor_usage = neighbor_usage[start:stop]
+        u0, u1 = bounds[start], bounds[stop]
+        self.bounds = bounds[start : stop + 1] - u0
+        self.local = local[u0:u1]
+        self.values = values[u0:u1]
+        self.opportunity_losses = opportunity_losses[start:stop]
+
+    def select(self) -> typing.List[typing.List[AtomicStripBlueprint]]:
+        result = []
+        for i, value in enumerate(self.opportunity_losses):
+            d = self.degrees[i]
+            passages = slice(self.passage_indptr[i], self.passage_indptr[i + 1])
+            used = slice(self.bounds[i], self.bounds[i + 1])
+            result.append(
+                self.strategy._for_vertex_arrays(
+                    value,
+                    self.angles[passages, :d],
+                    self.costs[passages, :d],
+                    self.orientations[i, :d],
+                    self.neighbor_usage[i, :d],
+                    self.local[used],
+                    self.values[used],
+                )
+            )
+        return result
+
+
+def _select_chunk(
+    chunk: _VertexChunk,
+) -> typing.List[typing.List[AtomicStripBlueprint]]:
+    return chunk.select()
+
+
 class NeighborBasedStripStrategy:
-    def __init__(self, k: int, only_usage_based=False):
+    def __init__(self, k: int, only_usage_based=False, chunk_size: int = 1000):
+        """
+        chunk_size: Number of vertices processed at once if an executor is used.
+        """
         self.k = k
         self.only_usage_based = only_usage_based
+        self.chunk_size = chunk_size
         self.dominant_strip_selector = DominantStripSelector()
         self.nbr_by_usage = NeighborByUsage()
         self.nbr_by_minmax = NeighborsByMinMax()
@@ -146,19 +223,97 @@ class NeighborBasedStripStrategy:
         dominant_i = self.dominant_strip_selector(
             orientations, usages, instance.touring_costs
         )
+        return self._blueprints(orientations, dominant_i, value)
+
+    def _blueprints(self, orientations, dominant_i: int, value: float):
         return [
             AtomicStripBlueprint(o, 0.0 if i != dominant_i else value)
             for i, o in enumerate(orientations)
         ]
 
+    def _for_vertex_arrays(
+        self,
+        value: float,
+        angles: np.ndarray,
+        costs: np.ndarray,
+        orientations: np.ndarray,
+        neighbor_usage: np.ndarray,
+        used_passages: np.ndarray,
+        usage: np.ndarray,
+    ):
+        """
+        Same as `for_vertex` but on the precomputed arrays of a vertex v.
+        `angles`/`costs` are the rows of ForcedOrientationCosts for the passages of v,
+        `orientations` the directions of its edges, `neighbor_usage` the usage of its
+        edges, `used_passages` the positions of the used passages within the passages
+        of v, and `usage` their usage.
+        """
+        d = angles.shape[1]
+        idx = list(range(d))
+        if d > self.k or self.only_usage_based:
+            by_usage = np.argsort(-neighbor_usage, kind="stable")
+            idx = [int(i) for i in by_usage if neighbor_usage[i] > 0.02][: self.k]
+            if not self.only_usage_based:
+                while len(idx) < self.k:
+                    idx.append(self.nbr_by_minmax.select(costs, idx))
+        if not idx:
+            return []
+        dominant_i = self.dominant_strip_selector.select(
+            angles[used_passages][:, idx], usage
+        )
+        return self._blueprints(orientations[idx].tolist(), dominant_i, value)
+
     def __call__(
-        self, instance: PointBasedInstance, fractional_solution: FractionalSolution
+        self,
+        instance: PointBasedInstance,
+        fractional_solution: FractionalSolution,
+        executor: typing.Optional[Executor] = None,
     ) -> typing.Dict[PointVertex, typing.List[AtomicStripBlueprint]]:
+        """
+        With an executor, the vertices are processed in chunks in parallel.
+        """
         print("Using adaptive strip selection strategy.")
-        return {
-            v: self.for_vertex(v, instance, fractional_solution.at_vertex(v))
-            for v in instance.graph.nodes
-        }
+        compiled = instance.compiled()
+        table = ForcedOrientationCosts(compiled, instance.touring_costs)
+        if not isinstance(fractional_solution, SparseFractionalSolution):
+            fractional_solution = SparseFractionalSolution.from_fractional_solution(
+                compiled, fractional_solution
+            )
+        ids, values = fractional_solution.ids, fractional_solution.values
+        # usage of the edges at a vertex by slot, a u-turn uses its edge once
+        vertex = compiled.passage_vertex[ids]
+        slot_a, slot_b = compiled.passage_slot_a[ids], compiled.passage_slot_b[ids]
+        neighbor_usage = np.zeros((len(compiled), compiled.max_degree))
+        np.add.at(neighbor_usage, (vertex, slot_a), values)
+        not_uturn = slot_a != slot_b
+        np.add.at(
+            neighbor_usage,
+            (vertex[not_uturn], slot_b[not_uturn]),
+            values[not_uturn],
+        )
+        # the used passages of every vertex are consecutive in `ids`
+        bounds = np.searchsorted(ids, compiled.passage_indptr)
+        local = ids - compiled.passage_indptr[vertex]
+        coverage_necessities = instance.coverage_necessities
+        opportunity_losses = [
+            coverage_necessities[p].opportunity_loss(0.0) for p in compiled.vertices
+        ]
+        chunks = [
+            _VertexChunk(
+                self,
+                table,
+                neighbor_usage,
+                bounds,
+                local,
+                values,
+                opportunity_losses,
+                start,
+                min(start + self.chunk_size, len(compiled)),
+            )
+            for start in range(0, len(compiled), self.chunk_size)
+        ]
+        selection = map_chunks(_select_chunk, chunks, executor)
+        return dict(zip(compiled.vertices, selection))
 
 
 # %%
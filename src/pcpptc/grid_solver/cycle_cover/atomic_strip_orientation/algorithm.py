@@ -1,5 +1,6 @@
 import typing
 import unittest
+from concurrent.futures import Executor, ProcessPoolExecutor
 
 import networkx as nx
 
@@ -8,51 +9,88 @@ from ...grid_solution import FractionalSolution
 from ..fractional_grid_solver import FractionalGridSolver, PointBasedInstance
 from .assignment import FixedRepetitionAtomicStripAssignment
 from .atomic_strip import AtomicStripBlueprint
-from .orientation_list_objective import OrientationListObjective
-from .orientations import NeighborOrientations, StepwiseOrientations
+from .orientation_search import EquiangularOrientationSearch
+from .parallel import VertexNeighborhood, chunked, map_chunks
 from .patterns import EquiangularOrientationList
 
 
+def _select_chunk(job) -> typing.List[typing.List[AtomicStripBlueprint]]:
+    strategy, instance, fractional_solution, vertices, rotations = job
+    return strategy._select(instance, fractional_solution, vertices, rotations)
+
+
 class EquiangularRepetitionAtomicStrips:
     def __init__(
-        self, number_of_different_orientations: int, reptition_of_each_orientation: int
+        self,
+        number_of_different_orientations: int,
+        reptition_of_each_orientation: int,
+        chunk_size: int = 500,
     ):
         """
         number_of_different_orientations: Number of equiangular orientations.
             If number_of_different_orientations=2 there will
              be two different orthogonal orientations.
         reptition_of_each_orientation: The repetition of each orientation.
+        chunk_size: Number of vertices processed at once if an executor is used.
         """
         self.k = number_of_different_orientations
         self.r = reptition_of_each_orientation
-
-    def _get_sample_orientations(self, instance: PointBasedInstance, v: PointVertex):
-        stepwise_orientations = StepwiseOrientations(10)
-        neighbor_orientations = NeighborOrientations(instance)
-        return list(stepwise_orientations()) + list(neighbor_orientations(v))
+        self.chunk_size = chunk_size
 
     def description(self) -> str:
         return (
             f"EquiangularRepetitionalAtomicStrips putting "
             f"{self.k} equiangular atomic strips with {self.r} repeitions on the"
-            f" waypoint minimizing the overhead of fitting the fractional solution."
+            f" waypoint minimizing the overhead of fitting the fractional solution"
+            f" (exact search over the edge directions)."
         )
 
-    def __call__(
-        self, instance: PointBasedInstance, fractional_solution: FractionalSolution
-    ) -> typing.Dict[PointVertex, typing.List[AtomicStripBlueprint]]:
-        print("Using static atomic strip selection strategy.")
+    def _select(
+        self,
+        instance: PointBasedInstance,
+        fractional_solution: FractionalSolution,
+        vertices: typing.Iterable[PointVertex],
+        rotations: typing.Iterable[float],
+    ) -> typing.List[typing.List[AtomicStripBlueprint]]:
+        """
+        Assigns the coverage necessities to the orientations of the pattern rotated
+        by the given angle.
+        """
         pattern = EquiangularOrientationList(self.k)
-        obj = OrientationListObjective(instance, fractional_solution)
         assigner = FixedRepetitionAtomicStripAssignment(
             self.r, instance, fractional_solution
         )
-        result = {}
-        for v in instance.graph.nodes:
-            orientations = self._get_sample_orientations(instance, v)
-            best_set = min((pattern(o) for o in orientations), key=lambda x: obj(v, x))
-            result[v] = list(assigner(v, best_set))
-        return result
+        return [list(assigner(v, pattern(o))) for v, o in zip(vertices, rotations)]
+
+    def __call__(
+        self,
+        instance: PointBasedInstance,
+        fractional_solution: FractionalSolution,
+        executor: typing.Optional[Executor] = None,
+    ) -> typing.Dict[PointVertex, typing.List[AtomicStripBlueprint]]:
+        """
+        With an executor, the vertices are processed in chunks in parallel. A process
+        pool only receives the neighborhoods of the vertices of its chunk.
+        """
+        print("Using static atomic strip selection strategy.")
+        compiled = instance.compiled()
+        vertices = compiled.vertices
+        search = EquiangularOrientationSearch(self.k)
+        rotations = search(compiled, fractional_solution).tolist()
+        if executor is None:
+            selection = self._select(instance, fractional_solution, vertices, rotations)
+            return dict(zip(vertices, selection))
+        jobs = []
+        for chunk, chunk_rotations in zip(
+            chunked(vertices, self.chunk_size), chunked(rotations, self.chunk_size)
+        ):
+            if isinstance(executor, ProcessPoolExecutor):
+                nbh = VertexNeighborhood(instance, fractional_solution, chunk)
+                job = (self, nbh, nbh.fractional_solution, chunk, chunk_rotations)
+            else:
+                job = (self, instance, fractional_solution, chunk, chunk_rotations)
+            jobs.append(job)
+        return dict(zip(vertices, map_chunks(_select_chunk, jobs, executor)))
 
 
 class FoobarAlgorithmTest(unittest.TestCase):
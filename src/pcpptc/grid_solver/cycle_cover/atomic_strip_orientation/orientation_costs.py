@@ -0,0 +1,118 @@
+"""
+Vectorized overhead of forcing a passage into the orientation of an atomic strip.
+Used by the adaptive strip selection, which only considers the orientations along
+the edges at a vertex.
+"""
+
+import math
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from pcpptc.utils import direction, turn_angle
+
+from ...grid_instance import CompiledGraph, PointVertex, TouringCosts
+
+
+def _abs_angle_difference(a0: np.ndarray, a1: np.ndarray) -> np.ndarray:
+    return np.minimum((a0 - a1) % (2 * math.pi), (a1 - a0) % (2 * math.pi))
+
+
+def forced_turn_angles(
+    compiled: CompiledGraph, passages: np.ndarray, orientations: np.ndarray
+) -> np.ndarray:
+    """
+    The additional turn angles of the passages if they have to follow the
+    orientations. `orientations[i, ...]` are the orientations for `passages[i]`,
+    the result has the shape of `orientations`.
+    """
+    shape = (-1,) + (1,) * (orientations.ndim - 1)
+    heading_a = compiled.dedge_directions[compiled.passage_dedge_a[passages]]
+    heading_b = compiled.dedge_directions[compiled.passage_dedge_b[passages]]
+    heading_a, heading_b = heading_a.reshape(shape), heading_b.reshape(shape)
+    forced = np.minimum(
+        _abs_angle_difference(heading_a, orientations)
+        + _abs_angle_difference(heading_b, orientations + math.pi),
+        _abs_angle_difference(heading_b, orientations)
+        + _abs_angle_difference(heading_a, orientations + math.pi),
+    )
+    return forced - compiled.passage_turn_angles[passages].reshape(shape)
+
+
+class ForcedOrientationCosts:
+    """
+    For every vertex v, the candidate orientations are the directions of the edges at
+    v (`orientations[v, slot]` is `direction(v, origin=neighbor)`, nan for unused
+    slots). For every passage p through v and every slot,
+    `angles[p, slot]` is the additional turn angle if p has to follow the orientation,
+    and `costs[p, slot]` the resulting additional turn costs, i.e.,
+    `vertex_passage_cost(vp, forced_orientation=o) - vertex_passage_cost(vp)`.
+    Unused slots are nan.
+    """
+
+    def __init__(self, compiled: CompiledGraph, touring_costs: TouringCosts):
+        self.compiled = compiled
+        self.orientations = self.edge_orientations(compiled)
+
+        self.angles = forced_turn_angles(
+            compiled,
+            np.arange(compiled.number_of_passages),
+            self.orientations[compiled.passage_vertex],
+        )
+        turn_factors = touring_costs.vertex_turn_factors(compiled)
+        self.costs = turn_factors[compiled.passage_vertex][:, None] * self.angles
+
+    @staticmethod
+    def edge_orientations(compiled: CompiledGraph) -> np.ndarray:
+        """
+        `direction(v, origin=neighbor)` for every vertex v and slot, nan for unused
+        slots.
+        """
+        slots = np.arange(compiled.max_degree)
+        valid = slots[None, :] < compiled.degrees[:, None]
+        positions = np.where(valid, compiled.adjacency_indptr[:-1, None] + slots, 0)
+        reverse_directions = compiled.dedge_directions[compiled.adjacency_reverse]
+        return np.where(valid, reverse_directions[positions], np.nan)
+
+    def of_vertex(self, v: int):
+        """
+        The (angles, costs) of the passages of v for the orientations of v.
+        """
+        indptr = self.compiled.passage_indptr
+        passages = slice(int(indptr[v]), int(indptr[v + 1]))
+        d = int(self.compiled.degrees[v])
+        return self.angles[passages, :d], self.costs[passages, :d]
+
+
+class ForcedOrientationCostsTest(unittest.TestCase):
+    def test_matches_turn_angle(self):
+        from ...grid_instance import SimpleTouringCosts
+
+        points = [PointVertex(x, y) for x, y in [(0, 0), (1, 0), (1, 1), (0, 2)]]
+        graph = nx.Graph()
+        graph.add_nodes_from(points)
+        for i in range(4):
+            graph.add_edge(points[i], points[(i + 1) % 4])
+        graph.add_edge(points[0], points[2])
+        compiled = CompiledGraph(graph)
+        tc = SimpleTouringCosts(turn_factor=2.0, distance_factor=1.0)
+        table = ForcedOrientationCosts(compiled, tc)
+        for v, point in enumerate(compiled.vertices):
+            nbrs = compiled.neighbors(point)
+            angles, costs = table.of_vertex(v)
+            for s, n in enumerate(nbrs):
+                o = direction(point.point, n)
+                self.assertAlmostEqual(table.orientations[v, s], o)
+                for i, p in enumerate(compiled.passages_of_vertex(v)):
+                    vp = compiled.passages[p]
+                    a0 = turn_angle(
+                        vp.end_a, vp.v, vp.end_b, forced_orientation_at_v1=o
+                    )
+                    a1 = turn_angle(vp.end_a, vp.v, vp.end_b)
+                    self.assertAlmostEqual(angles[i, s], a0 - a1)
+                    self.assertAlmostEqual(
+                        costs[i, s],
+                        tc.vertex_passage_cost(vp, forced_orientation=o)
+                        - tc.vertex_passage_cost(vp),
+                    )
@@ -0,0 +1,125 @@
+"""
+Exact search for the best rotation of an equiangular orientation pattern, for all
+vertices at once. Replaces sampling orientations and rating each of them with the
+OrientationListObjective.
+"""
+
+import math
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from ...grid_instance import (
+    CompiledGraph,
+    CoverageNecessities,
+    PointBasedInstance,
+    PointVertex,
+    SimpleTouringCosts,
+)
+from ...grid_solution import FractionalSolution, SparseFractionalSolution
+from .orientation_costs import ForcedOrientationCosts, forced_turn_angles
+from .orientation_list_objective import OrientationListObjective
+from .patterns import EquiangularOrientationList
+
+
+def _line_difference(a0: np.ndarray, a1: np.ndarray) -> np.ndarray:
+    """
+    The angle between two lines (orientations modulo pi).
+    """
+    return np.minimum((a0 - a1) % math.pi, (a1 - a0) % math.pi)
+
+
+class EquiangularOrientationSearch:
+    """
+    Finds for every vertex the rotation o of the k equiangular orientations
+    o, o + pi/k, ... that minimizes the OrientationListObjective.
+
+    Both parts of the objective are sums of terms `min_i g(o + i*pi/k)` where g is a
+    sum of circular distances to the directions of the edges at the vertex (the
+    neighbor directions and the headings of the passages). A circular distance is
+    linear except for a convex kink at its direction and a concave kink opposite of
+    it, and the minimum over i only adds concave kinks. Hence, the objective is
+    piecewise linear with convex kinks only at edge directions (modulo pi/k), and one
+    of them is optimal. These at most max-degree candidates are rated for all
+    vertices at once.
+    """
+
+    def __init__(
+        self, k: int, neighbor_factor: float = 0.1, passage_factor: float = 1.0
+    ):
+        self.k = k
+        self.neighbor_factor = neighbor_factor
+        self.passage_factor = passage_factor
+
+    def objective(
+        self, compiled: CompiledGraph, fractional_solution: SparseFractionalSolution
+    ):
+        """
+        Returns the candidate orientations (the edge directions at every vertex,
+        nan for unused slots) and their objective values (inf for unused slots).
+        """
+        candidates = ForcedOrientationCosts.edge_orientations(compiled)
+        valid = ~np.isnan(candidates)
+        patterns = candidates[:, :, None] + np.arange(self.k) * (math.pi / self.k)
+
+        # the angle between the closest orientation and every edge
+        neighbor_diff = _line_difference(
+            patterns[:, :, :, None], candidates[:, None, None, :]
+        ).min(axis=2)
+        neighbor_costs = np.where(valid[:, None, :], neighbor_diff, 0.0).sum(axis=2)
+
+        # the additional turn angle of the closest orientation for every passage
+        ids, values = fractional_solution.ids, fractional_solution.values
+        vertex = compiled.passage_vertex[ids]
+        passage_diff = np.abs(forced_turn_angles(compiled, ids, patterns[vertex]))
+        passage_costs = np.zeros(candidates.shape)
+        np.add.at(passage_costs, vertex, values[:, None] * passage_diff.min(axis=2))
+
+        objective = (
+            self.neighbor_factor * neighbor_costs + self.passage_factor * passage_costs
+        )
+        return candidates, np.where(valid, objective, math.inf)
+
+    def __call__(
+        self, compiled: CompiledGraph, fractional_solution: FractionalSolution
+    ) -> np.ndarray:
+        """
+        Returns the best rotation for every vertex id (0.0 for isolated vertices).
+        """
+        if not isinstance(fractional_solution, SparseFractionalSolution):
+            fractional_solution = SparseFractionalSolution.from_fractional_solution(
+                compiled, fractional_solution
+            )
+        if compiled.max_degree == 0:
+            return np.zeros(len(compiled))
+        candidates, objective = self.objective(compiled, fractional_solution)
+        best = candidates[np.arange(len(compiled)), np.argmin(objective, axis=1)]
+        return np.where(np.isnan(best), 0.0, best % (math.pi / self.k))
+
+
+class EquiangularOrientationSearchTest(unittest.TestCase):
+    def test_not_worse_than_sampling(self):
+        from ..fractional_grid_solver import FractionalGridSolver
+        from .orientations import NeighborOrientations, StepwiseOrientations
+
+        G = nx.grid_2d_graph(4, 3)
+        mapping = {p: PointVertex(*p) for p in G.nodes}
+        G = nx.relabel_nodes(G, mapping)
+        G.add_edge(mapping[(0, 0)], mapping[(1, 1)])
+        G.add_edge(mapping[(2, 1)], mapping[(3, 2)])
+        instance = PointBasedInstance(
+            G, SimpleTouringCosts(1.0, 1.0), CoverageNecessities()
+        )
+        frac_sol, _ = FractionalGridSolver()(instance)
+        compiled = instance.compiled()
+        obj = OrientationListObjective(instance, frac_sol)
+        for k in [1, 2, 3]:
+            pattern = EquiangularOrientationList(k)
+            best = EquiangularOrientationSearch(k)(compiled, frac_sol)
+            for v, p in enumerate(compiled.vertices):
+                samples = list(StepwiseOrientations(10)()) + list(
+                    NeighborOrientations(instance)(p)
+                )
+                sampled = min(obj(p, pattern(o)) for o in samples)
+                self.assertLessEqual(obj(p, pattern(best[v])), sampled + 1e-6)
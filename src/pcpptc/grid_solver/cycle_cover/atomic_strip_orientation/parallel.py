@@ -0,0 +1,113 @@
+"""
+Parallel selection of the atomic strips. The strips of a vertex only depend on the
+fractional solution at the vertex and on its neighborhood, so the vertices can be
+processed in independent chunks by an executor (threads or processes).
+"""
+
+import typing
+import unittest
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import networkx as nx
+
+from ...grid_instance import (
+    CoverageNecessities,
+    PointBasedInstance,
+    PointVertex,
+    SimpleTouringCosts,
+)
+from ...grid_solution import FractionalSolution
+
+C = typing.TypeVar("C")
+T = typing.TypeVar("T")
+
+
+def chunked(
+    items: typing.Sequence[C], chunk_size: int
+) -> typing.List[typing.Sequence[C]]:
+    if chunk_size < 1:
+        msg = "The chunk size has to be positive."
+        raise ValueError(msg)
+    return [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def map_chunks(
+    function: typing.Callable[[C], typing.List[T]],
+    chunks: typing.Iterable[C],
+    executor: typing.Optional[Executor] = None,
+) -> typing.List[T]:
+    """
+    Applies the function to every chunk, in the executor if given, and concatenates
+    the results in the order of the chunks. For a process pool, the function and
+    the chunks have to be picklable.
+    """
+    if executor is None:
+        results = map(function, chunks)
+    else:
+        results = executor.map(function, chunks)
+    return [x for result in results for x in result]
+
+
+class VertexNeighborhood:
+    """
+    The part of an instance and a fractional solution the strip selection of some
+    vertices depends on: their incident edges, their coverage necessities, and their
+    passages. It can be used in place of the instance and is much cheaper to send to
+    another process.
+    """
+
+    def __init__(
+        self,
+        instance: PointBasedInstance,
+        fractional_solution: FractionalSolution,
+        vertices: typing.Iterable,
+    ):
+        vertices = list(vertices)
+        self.graph = nx.Graph()
+        self.graph.add_nodes_from(vertices)
+        self.graph.add_edges_from(instance.graph.edges(vertices))
+        self.touring_costs = instance.touring_costs
+        self.coverage_necessities = CoverageNecessities(
+            instance.coverage_necessities.default
+        )
+        self.fractional_solution = FractionalSolution()
+        for v in vertices:
+            self.coverage_necessities[v] = instance.coverage_necessities[v]
+            for vp, x in fractional_solution.at_vertex(v).items():
+                self.fractional_solution.add(vp, x)
+
+
+class ParallelStripSelectionTest(unittest.TestCase):
+    def test_map_chunks(self):
+        chunks = chunked(list(range(10)), 3)
+        assert [len(c) for c in chunks] == [3, 3, 3, 1]
+        with ThreadPoolExecutor(2) as executor:
+            result = map_chunks(lambda c: [2 * x for x in c], chunks, executor)
+        assert result == [2 * x for x in range(10)]
+
+    def test_executors(self):
+        from ..fractional_grid_solver import FractionalGridSolver
+        from .adaptive import NeighborBasedStripStrategy
+        from .algorithm import EquiangularRepetitionAtomicStrips
+
+        G = nx.grid_2d_graph(4, 3)
+        G = nx.relabel_nodes(G, {p: PointVertex(*p) for p in G.nodes})
+        instance = PointBasedInstance(
+            G, SimpleTouringCosts(1.0, 1.0), CoverageNecessities()
+        )
+        frac_sol, _ = FractionalGridSolver()(instance)
+
+        def attributes(selection):
+            return [[(s.orientation, s.penalty) for s in x] for x in selection.values()]
+
+        # 5 does not divide the 12 vertices, so the last chunk is shorter
+        for strategy in (
+            NeighborBasedStripStrategy(2, chunk_size=5),
+            EquiangularRepetitionAtomicStrips(2, 2, chunk_size=5),
+        ):
+            expected = strategy(instance, frac_sol)
+            for executor_type in (ThreadPoolExecutor, ProcessPoolExecutor):
+                with executor_type(2) as executor:
+                    result = strategy(instance, frac_sol, executor=executor)
+                assert list(result) == list(expected)
+                assert attributes(result) == attributes(expected)
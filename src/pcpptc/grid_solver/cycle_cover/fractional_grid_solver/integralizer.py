@@ -1,65 +1,155 @@
 import abc
+import collections
+import heapq
+import itertools
 import math
 import typing
+import unittest
 
-import gurobipy as gp
+import numpy as np
 
 from ...grid_instance import PointBasedInstance, PointVertex, VertexPassage
 from ...grid_solution import FractionalSolution
+from ...lp_backend import Basis
 from .linear_program import LinearProgram
-from .solver import get_fractional_solution
+from .parallel_node_solver import ParallelNodeSolver
+from .solver import get_solution_values, to_fractional_solution
 
 
 class Node:
+    """
+    A node of the integralizing BnB. Only the root stores the full vector of
+    passage values, every other node stores the values that differ from the root
+    (or the full vector if this is not smaller). A node keeps the bounds of its path
+    from the root instead of a reference to its parent, such that closed nodes are
+    freed and the memory only grows with the open nodes.
+    The full solution is only materialized on demand and can be released again
+    with `release`.
+    """
+
     def __init__(
         self,
-        fractional_solution: FractionalSolution,
+        values: np.ndarray,
         objective_value: float,
-        lb: typing.Dict[VertexPassage, int] = None,
-        ub: typing.Dict[VertexPassage, int] = None,
+        passages: typing.List[VertexPassage],
+        parent: typing.Optional["Node"] = None,
+        bound: typing.Optional[typing.Tuple[VertexPassage, int, int]] = None,
+        basis: typing.Optional[Basis] = None,
     ):
-        if not lb:
-            lb = {}
-        self.lb = lb
-        if not ub:
-            ub = {}
-        self.ub = ub
-        self.solution = fractional_solution
         self.objective_value = objective_value
+        self.passages = passages
+        # (passage, lower bound, upper bound) added by this node
+        self.bound = bound
+        # the bounds added on the path from the root, in this order
+        self.bounds = () if parent is None else parent.bounds + (bound,)
+        self.depth = len(self.bounds)
+        # the values of the root, shared by all nodes of the tree
+        self._root_values = values if parent is None else parent._root_values
+        self._changed = None  # None if `_diff` contains all values
+        self._diff = values
+        if parent is not None:
+            changed = np.flatnonzero(values != self._root_values)
+            if 2 * len(changed) < len(values):
+                self._changed = changed
+                self._diff = values[changed]
+        # basis of the LP solution of this node, used to warm start its children
+        self.basis = basis
+        self._solution = None
+
+    @property
+    def lb(self) -> typing.Dict[VertexPassage, int]:
+        return {vp: lb for vp, lb, _ub in self.bounds if lb is not None}
+
+    @property
+    def ub(self) -> typing.Dict[VertexPassage, int]:
+        return {vp: ub for vp, _lb, ub in self.bounds if ub is not None}
 
-    def _check_if_reasonable_selection(self, vp: VertexPassage):
+    def values(self) -> np.ndarray:
+        """
+        The values of all passages (indexed by passage id).
+        """
+        if self._changed is None:
+            return self._diff.copy()
+        values = self._root_values.copy()
+        values[self._changed] = self._diff
+        return values
+
+    @property
+    def solution(self) -> FractionalSolution:
+        if self._solution is None:
+            self._solution = to_fractional_solution(self.passages, self.values())
+        return self._solution
+
+    def release(self):
+        """
+        Frees the materialized solution. It is rebuilt if needed again.
+        """
+        self._solution = None
+
+    def _check_if_reasonable_selection(self, vp: VertexPassage, lb, ub):
         val = self.solution[vp]
         if abs(round(val) - val) <= 0.01:
             msg = "Selected branching-passage is already integral."
             raise KeyError(msg)
-        if vp in self.lb and math.ceil(val) <= self.lb[vp]:
+        if vp in lb and math.ceil(val) <= lb[vp]:
             msg = "Selected branching-passage introduces no new lower bound."
             raise KeyError(msg)
-        if vp in self.ub and math.floor(val) >= self.ub[vp]:
+        if vp in ub and math.floor(val) >= ub[vp]:
             msg = "Selected branching-passage introduces no new upper bound."
             raise KeyError(msg)
 
-    def branch(
-        self, vp: VertexPassage, lp: LinearProgram
-    ) -> typing.Tuple["Node", "Node"]:
-        self._check_if_reasonable_selection(vp)
+    def children_bounds(self, vp: VertexPassage) -> typing.List[tuple]:
+        """
+        The lower bounds, upper bounds, and added bound of the two children when
+        branching on `vp`.
+        """
+        lb, ub = self.lb, self.ub
+        self._check_if_reasonable_selection(vp, lb, ub)
         val = self.solution[vp]
-        new_lb = self.lb.copy()
+        new_lb = lb.copy()
         new_lb[vp] = math.ceil(val)
-        lb_node = self._create_node(lp, new_lb, self.ub)
-        new_ub = self.ub.copy()
+        new_ub = ub.copy()
         new_ub[vp] = math.floor(val)
-        ub_node = self._create_node(lp, self.lb, new_ub)
+        return [
+            (new_lb, ub, (vp, new_lb[vp], None)),
+            (lb, new_ub, (vp, None, new_ub[vp])),
+        ]
+
+    def branch(
+        self, vp: VertexPassage, lp: LinearProgram
+    ) -> typing.Tuple["Node", "Node"]:
+        children_bounds = self.children_bounds(vp)
+        lb_node, ub_node = (
+            self._create_node(lp, lb, ub, bound) for lb, ub, bound in children_bounds
+        )
+        self.close()
         return lb_node, ub_node
 
-    def _create_node(self, lp, lb, ub):
+    def close(self):
+        """
+        Called after branching. The basis and the solution are no longer needed,
+        the children do not reference this node.
+        """
+        self.basis = None
+        self.release()
+
+    def _create_node(self, lp, lb, ub, bound):
         lp.manual_bounds.set_lb(lb)
         lp.manual_bounds.set_ub(ub)
+        if self.basis is not None:
+            # both children start from the basis of this node
+            lp.model.set_basis(self.basis)
         lp.optimize()
-        if lp.model.Status == gp.GRB.OPTIMAL:
+        if lp.model.is_optimal():
             obj = lp.objective_value()
-            solution = get_fractional_solution(lp)
-            node = Node(solution, obj, lb, ub)
+            node = Node(
+                get_solution_values(lp),
+                obj,
+                self.passages,
+                parent=self,
+                bound=bound,
+                basis=lp.model.get_basis(),
+            )
         else:
             node = None
         return node
@@ -72,19 +162,36 @@ class BranchingStrategy(abc.ABC):
     ) -> VertexPassage:
         raise NotImplementedError()
 
+    def on_branched(
+        self,
+        node: Node,
+        vp: VertexPassage,
+        value: float,
+        children: typing.Tuple[typing.Optional[Node], typing.Optional[Node]],
+    ):
+        """
+        Called after `node` has been branched on `vp` with the fractional `value`.
+        The children are the node with the increased lower bound and the node with
+        the decreased upper bound (None if infeasible).
+        """
+
 
 class IntGapCostStrategy(BranchingStrategy):
     def __call__(
         self, instance: PointBasedInstance, node: Node, lp: LinearProgram
     ) -> VertexPassage:
-        def vp_cost(vp):
-            return instance.touring_costs.vertex_passage_cost(vp, halving=True)
         def rel_cost(vpx):
-            return self._fractionality(vpx[1]) * vp_cost(vpx[0]) * self._vertex_fractionality(vpx[0].v, node.solution)
+            return self._rel_cost(instance, node, vpx)
         vp, val = max(node.solution, key=rel_cost)
         assert rel_cost((vp, val)) > 0.01, "Should be a higher value"
         return vp
 
+    def _rel_cost(self, instance: PointBasedInstance, node: Node, vpx) -> float:
+        vp, val = vpx
+        vp_cost = instance.touring_costs.vertex_passage_cost(vp, halving=True)
+        vertex_fractionality = self._vertex_fractionality(vp.v, node.solution)
+        return self._fractionality(val) * vp_cost * vertex_fractionality
+
     def _fractionality(self, x):
         return min(x - math.floor(x), math.ceil(x) - x)
 
@@ -102,8 +209,10 @@ class ReducedCostBranchingStrategy:
     def __call__(
         self, instance: PointBasedInstance, node: Node, lp: LinearProgram
     ) -> VertexPassage:
+        reduced_costs = lp.model.reduced_costs()
+
         def vp_cost(vp):
-            return abs(lp.vertex_passage_vars[vp].RC)
+            return abs(reduced_costs[lp.vertex_passage_vars[vp]])
         def rel_cost(vpx):
             return self._fractionality(vpx[1]) * vp_cost(vpx[0])
         vp, val = max(node.solution, key=rel_cost)
@@ -114,20 +223,179 @@ class ReducedCostBranchingStrategy:
         return min(x - math.floor(x), math.ceil(x) - x)
 
 
+def _product_score(up: float, down: float, eps: float = 1e-6) -> float:
+    return max(up, eps) * max(down, eps)
+
+
+class PseudoCostStrategy(IntGapCostStrategy):
+    """
+    Pseudo-cost branching: The objective increase of both children is estimated by
+    the average increase per unit of the earlier branches on the same passage (or on
+    all passages if there are none). The passage with the largest product of both
+    estimates is selected. As long as there is no history for one of the
+    directions, it falls back to IntGapCostStrategy.
+    """
+
+    def __init__(self):
+        # for up and down: passage -> [sum of increases per unit, count]
+        self._history = ({}, {})
+        self._totals = ([0.0, 0], [0.0, 0])
+
+    def __call__(
+        self, instance: PointBasedInstance, node: Node, lp: LinearProgram
+    ) -> VertexPassage:
+        if not self._totals[0][1] or not self._totals[1][1]:
+            return super().__call__(instance, node, lp)
+
+        def score(vpx):
+            vp, val = vpx
+            if self._fractionality(val) <= 0.01:
+                return -1.0
+            up = self._pseudo_cost(0, vp) * (math.ceil(val) - val)
+            down = self._pseudo_cost(1, vp) * (val - math.floor(val))
+            return _product_score(up, down)
+
+        vp, val = max(node.solution, key=score)
+        assert score((vp, val)) >= 0, "Should be fractional"
+        return vp
+
+    def _pseudo_cost(self, direction: int, vp: VertexPassage) -> float:
+        total, count = self._history[direction].get(vp, self._totals[direction])
+        return total / count
+
+    def on_branched(self, node, vp, value, children):
+        distances = (math.ceil(value) - value, value - math.floor(value))
+        for direction, child in enumerate(children):
+            if child is None:
+                continue  # infeasible, nothing to learn
+            increase = child.objective_value - node.objective_value
+            increase /= distances[direction]
+            for entry in (
+                self._history[direction].setdefault(vp, [0.0, 0]),
+                self._totals[direction],
+            ):
+                entry[0] += max(increase, 0.0)
+                entry[1] += 1
+
+
+class StrongBranchingStrategy(IntGapCostStrategy):
+    """
+    Limited strong branching: For the `candidates` best passages according to
+    IntGapCostStrategy, both children are solved tentatively with at most
+    `iteration_limit` dual simplex iterations, starting from the basis of the node.
+    The passage with the largest product of the objective increases is selected,
+    an infeasible child counts as infinite increase. The increases are taken from the
+    dual bound of the limited solve; candidates without a valid bound are skipped.
+    """
+
+    def __init__(self, candidates: int = 8, iteration_limit: int = 25):
+        self.candidates = candidates
+        self.iteration_limit = iteration_limit
+
+    def __call__(
+        self, instance: PointBasedInstance, node: Node, lp: LinearProgram
+    ) -> VertexPassage:
+        scored = [(self._rel_cost(instance, node, vpx), vpx) for vpx in node.solution]
+        scored = [x for x in scored if x[0] > 0.01]
+        assert scored, "Should be fractional"
+        scored.sort(key=lambda x: x[0], reverse=True)
+        # the best candidate of IntGapCostStrategy if no candidate has a bound
+        best_vp, best_score = scored[0][1][0], -1.0
+        lp.model.set_iteration_limit(self.iteration_limit)
+        try:
+            for _, (vp, _val) in scored[: self.candidates]:
+                increases = [
+                    self._tentative_increase(node, lp, lb, ub)
+                    for lb, ub, _bound in node.children_bounds(vp)
+                ]
+                if None in increases:
+                    continue
+                score = _product_score(*increases)
+                if score > best_score:
+                    best_vp, best_score = vp, score
+        finally:
+            lp.model.set_iteration_limit(None)
+        return best_vp
+
+    def _tentative_increase(
+        self, node: Node, lp: LinearProgram, lb, ub
+    ) -> typing.Optional[float]:
+        """
+        A lower bound on the objective increase of the child (None if unknown).
+        """
+        lp.manual_bounds.set_lb(lb)
+        lp.manual_bounds.set_ub(ub)
+        if node.basis is not None:
+            lp.model.set_basis(node.basis)
+        lp.optimize()
+        if lp.model.is_infeasible():
+            return math.inf
+        bound = lp.model.dual_bound()
+        if bound is None:
+            return None
+        return max(bound - node.objective_value, 0.0)
+
+
 class IntegralizingBnBTree:
+    """
+    Best-first BnB on the fractional LP. The open nodes are kept in a heap. Only the
+    best open node keeps its materialized solution and only the `max_bases` most
+    recent nodes keep their LP basis, such that the memory does not grow with the
+    number of open nodes times the instance size.
+    With `workers > 1`, the children are solved in parallel by a process pool and
+    every branch step branches the `parallel_nodes` best open nodes at once. Call
+    `close` afterwards to shut the pool down.
+    """
+
     def __init__(
-        self, instance: PointBasedInstance, bs: BranchingStrategy = IntGapCostStrategy()
+        self,
+        instance: PointBasedInstance,
+        bs: BranchingStrategy = IntGapCostStrategy(),
+        lp_backend: str = "gurobi",
+        max_bases: int = 32,
+        workers: int = 1,
+        parallel_nodes: int = 1,
     ):
         self.instance = instance
-        self.lp = LinearProgram(instance)
+        self.lp = LinearProgram(instance, lp_backend=lp_backend)
         self.lp.optimize()
-        node = Node(get_fractional_solution(self.lp), self.lp.objective_value())
-        self.nodes = [node]
+        node = Node(
+            get_solution_values(self.lp),
+            self.lp.objective_value(),
+            self.lp.vertex_passage_vars.compiled.passages,
+            basis=self.lp.model.get_basis(),
+        )
+        self._queue = []
+        self._counter = itertools.count()  # tie breaker, keeps the insertion order
+        self._materialized = None
+        self.max_bases = max_bases
+        self._with_basis = collections.deque()
+        self._push(node)
         self.branching_strategy = bs
         self.steps = 0
+        self.parallel_nodes = parallel_nodes
+        self._node_solver = None
+        if workers > 1:
+            self._node_solver = ParallelNodeSolver(instance, lp_backend, workers)
 
-    def _sort_nodes(self):
-        self.nodes = sorted(self.nodes, key=lambda n: n.objective_value)
+    def close(self):
+        if self._node_solver is not None:
+            self._node_solver.shutdown()
+            self._node_solver = None
+
+    @property
+    def nodes(self) -> typing.List[Node]:
+        """
+        The open nodes, sorted by their objective value.
+        """
+        return [entry[2] for entry in sorted(self._queue)]
+
+    def _push(self, node: Node):
+        heapq.heappush(self._queue, (node.objective_value, next(self._counter), node))
+        if node.basis is not None:
+            self._with_basis.append(node)
+            while len(self._with_basis) > self.max_bases:
+                self._with_basis.popleft().basis = None
 
     def branch(self):
         if self.is_integral():
@@ -135,40 +403,115 @@ class IntegralizingBnBTree:
             raise RuntimeError(msg)
         node = self._pop_best_node()
         vp = self.branching_strategy(self.instance, node, self.lp)
+        if self._node_solver is not None:
+            self._branch_in_parallel([(node, vp)] + self._pop_further_branchings())
+            return node, vp
+        value = node.solution[vp]
         children = node.branch(vp, self.lp)
+        self.branching_strategy.on_branched(node, vp, value, children)
         self.steps += 1
         for child in children:
             if child:
-                self.nodes.append(child)
-        self._sort_nodes()
+                self._push(child)
         return node, vp
 
+    def _pop_further_branchings(self) -> typing.List[tuple]:
+        """
+        Pops the next best fractional nodes to be branched in parallel to the best.
+        """
+        branchings = []
+        integral = []
+        while self._queue and len(branchings) + 1 < self.parallel_nodes:
+            node = heapq.heappop(self._queue)[2]
+            if node.solution.is_integral():
+                integral.append(node)
+                continue
+            vp = self.branching_strategy(self.instance, node, self.lp)
+            branchings.append((node, vp))
+        for node in integral:
+            node.release()
+            self._push(node)
+        return branchings
+
+    def _branch_in_parallel(self, branchings: typing.List[tuple]):
+        jobs = []
+        for node, vp in branchings:
+            for i, (lb, ub, bound) in enumerate(node.children_bounds(vp)):
+                future = self._node_solver.submit(lb, ub, node.basis)
+                jobs.append((node, i, bound, future))
+        branched_values = [node.solution[vp] for node, vp in branchings]
+        children = {id(node): [None, None] for node, _ in branchings}
+        for node, i, bound, future in jobs:
+            result = future.result()
+            if result is None:
+                continue  # infeasible
+            obj, ids, vals, basis = result
+            child_values = np.zeros(len(node.passages))
+            child_values[ids] = vals
+            child = Node(
+                child_values,
+                obj,
+                node.passages,
+                parent=node,
+                bound=bound,
+                basis=basis,
+            )
+            children[id(node)][i] = child
+            self._push(child)
+        for (node, vp), value in zip(branchings, branched_values):
+            node.close()
+            self.branching_strategy.on_branched(
+                node, vp, value, tuple(children[id(node)])
+            )
+        self.steps += len(branchings)
+
     def is_integral(self):
-        return self.nodes[0].solution.is_integral()
+        return self._best_node().solution.is_integral()
 
-    def _best_node(self):
-        return self.nodes[0]
+    def _best_node(self) -> Node:
+        node = self._queue[0][2]
+        if self._materialized is not node:
+            if self._materialized is not None:
+                self._materialized.release()
+            self._materialized = node
+        return node
 
-    def _pop_best_node(self):
-        node = self.nodes[0]
-        self.nodes = self.nodes[1:]
+    def _pop_best_node(self) -> Node:
+        node = self._best_node()
+        heapq.heappop(self._queue)
         return node
 
     def get_solution(self):
-        return self.nodes[0].solution
+        return self._best_node().solution
 
     def get_objective(self):
-        return self.nodes[0].objective_value
+        return self._best_node().objective_value
 
 
 class IntegralizingFractionalSolver:
-    def __init__(self, depth: int = 10):
+    def __init__(
+        self,
+        depth: int = 10,
+        lp_backend: str = "gurobi",
+        workers: int = 1,
+        parallel_nodes: int = 1,
+        branching_strategy: typing.Callable[[], BranchingStrategy] = IntGapCostStrategy,
+    ):
         self.depth = depth
+        self.lp_backend = lp_backend
+        self.workers = workers
+        self.parallel_nodes = parallel_nodes
+        # creates a new (possibly learning) strategy for every instance
+        self.branching_strategy = branching_strategy
 
     def description(self) -> str:
         descr = "IntegralizingFractionalSolver"
         descr += "Computing a fractional solution with some BnB steps to improve integrality."
         descr += f"Up to {self.depth} BnB steps are performed."
+        descr += f"LPs are solved with {self.lp_backend}."
+        if self.workers > 1:
+            descr += f"Nodes are solved by {self.workers} parallel workers,"
+            descr += f" branching up to {self.parallel_nodes} nodes at once."
         return descr
 
     def __call__(
@@ -176,12 +519,93 @@ class IntegralizingFractionalSolver:
     ) -> typing.Tuple[FractionalSolution, float]:
         if depth is None:
             depth = self.depth
-        bnb = IntegralizingBnBTree(instance)
-        print("Initial fractional solution:", bnb.get_objective())
-        for _i in range(depth):
-            if bnb.is_integral():
-                print("Integral fractional solution:", bnb.get_objective())
-                return bnb.get_solution(), bnb.get_objective()
-            bnb.branch()
-        print("Optimized fractional solution:", bnb.get_objective())
-        return bnb.get_solution(), bnb.get_objective()
+        bnb = IntegralizingBnBTree(
+            instance,
+            bs=self.branching_strategy(),
+            lp_backend=self.lp_backend,
+            workers=self.workers,
+            parallel_nodes=self.parallel_nodes,
+        )
+        try:
+            print("Initial fractional solution:", bnb.get_objective())
+            while bnb.steps < depth:
+                if bnb.is_integral():
+                    print("Integral fractional solution:", bnb.get_objective())
+                    return bnb.get_solution(), bnb.get_objective()
+                bnb.branch()
+            print("Optimized fractional solution:", bnb.get_objective())
+            return bnb.get_solution(), bnb.get_objective()
+        finally:
+            bnb.close()
+
+
+class NodeTest(unittest.TestCase):
+    def test_diff_and_bounds(self):
+        v = [PointVertex(float(i), 0.0) for i in range(4)]
+        passages = [VertexPassage(v[i], v[i - 1], v[i + 1]) for i in (1, 2)]
+        passages += [VertexPassage(v[1], v[0], v[0]), VertexPassage(v[2], v[3], v[3])]
+        root = Node(np.array([0.5, 0.5, 1.0, 0.0]), 1.0, passages)
+        lb_node = Node(
+            np.array([1.0, 0.5, 1.0, 0.0]),
+            2.0,
+            passages,
+            parent=root,
+            bound=(passages[0], 1, None),
+        )
+        self.assertEqual(list(lb_node._changed), [0])
+        child = Node(
+            np.array([1.0, 0.0, 2.0, 3.0]),
+            3.0,
+            passages,
+            parent=lb_node,
+            bound=(passages[1], None, 0),
+        )
+        self.assertIsNone(child._changed)  # stored densely
+        leaf = Node(
+            np.array([1.0, 0.0, 2.0, 2.0]),
+            3.0,
+            passages,
+            parent=child,
+            bound=(passages[0], 2, None),
+        )
+        self.assertEqual(list(leaf.values()), [1.0, 0.0, 2.0, 2.0])
+        self.assertEqual(leaf.lb, {passages[0]: 2})
+        self.assertEqual(leaf.ub, {passages[1]: 0})
+        self.assertEqual(leaf.solution[passages[3]], 2.0)
+        self.assertNotIn(passages[1], leaf.solution)
+        self.assertEqual(leaf.depth, 3)
+
+    def test_closed_nodes_are_freed(self):
+        import gc
+        import weakref
+
+        v = [PointVertex(float(i), 0.0) for i in range(3)]
+        passages = [VertexPassage(v[1], v[0], v[2]), VertexPassage(v[1], v[0], v[0])]
+        node = Node(np.array([0.5, 0.5]), 1.0, passages)
+        closed = []
+        for depth in range(3):
+            closed.append(weakref.ref(node))
+            values = np.array([0.5, 0.5]) + depth
+            node = Node(values, 2.0, passages, node, (passages[0], depth, None))
+        gc.collect()
+        # only the root values are shared, no node of the path is kept alive
+        self.assertTrue(all(ref() is None for ref in closed))
+        self.assertEqual(list(node.values()), [2.5, 2.5])
+        self.assertEqual(node.lb, {passages[0]: 2})
+
+
+class PseudoCostStrategyTest(unittest.TestCase):
+    def test_history(self):
+        v = [PointVertex(float(i), 0.0) for i in range(4)]
+        passages = [VertexPassage(v[i], v[i - 1], v[i + 1]) for i in (1, 2)]
+        root = Node(np.array([0.5, 0.25]), 1.0, passages)
+        up = Node(np.array([1.0, 0.0]), 2.0, passages, root, (passages[0], 1, None))
+        strategy = PseudoCostStrategy()
+        strategy.on_branched(root, passages[0], 0.5, (up, None))
+        self.assertAlmostEqual(strategy._pseudo_cost(0, passages[0]), 2.0)
+        self.assertAlmostEqual(strategy._pseudo_cost(0, passages[1]), 2.0)
+        self.assertEqual(strategy._totals[1][1], 0)  # infeasible, nothing learned
+        down = Node(np.array([0.0, 1.0]), 1.25, passages, root, (passages[1], None, 0))
+        strategy.on_branched(root, passages[1], 0.25, (None, down))
+        self.assertAlmostEqual(strategy._pseudo_cost(1, passages[1]), 1.0)
+        self.assertAlmostEqual(strategy._pseudo_cost(1, passages[0]), 1.0)
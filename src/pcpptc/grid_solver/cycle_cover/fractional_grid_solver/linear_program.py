@@ -1,8 +1,11 @@
+import math
 import typing
 
-import gurobipy as gp
+import numpy as np
+import scipy.sparse as sp
 
 from ...grid_instance import PointBasedInstance, VertexPassage
+from ...lp_backend import EQUAL, GREATER_EQUAL, LpModel, create_lp_model
 from .penalty_variables import PenaltyVariables
 from .vertex_passage_variables import VertexPassageVariablesInGraph
 
@@ -10,39 +13,38 @@ from .vertex_passage_variables import VertexPassageVariablesInGraph
 class ManualBounds:
     """
     For manually setting bounds for building your own bnb.
+    The bounds are set directly on the variables, such that the LP stays the same
+    and the solver can continue from its last basis.
     """
 
-    def __init__(self, model, vertex_passage_vars):
+    def __init__(self, model: LpModel, vertex_passage_vars):
         self.model = model
         self.vertex_passage_vars = vertex_passage_vars
-        self._lower_bounds = {}
-        self._upper_bounds = {}
+        self._lower_bounds: typing.Dict[VertexPassage, int] = {}
+        self._upper_bounds: typing.Dict[VertexPassage, int] = {}
+
+    def _changed(self, old: dict, new: dict) -> set:
+        return {vp for vp in old.keys() | new.keys() if old.get(vp) != new.get(vp)}
+
+    def _apply(self, vps: set):
+        if not vps:
+            return
+        vps = list(vps)
+        self.model.set_bounds(
+            [self.vertex_passage_vars[vp] for vp in vps],
+            [self._lower_bounds.get(vp, 0.0) for vp in vps],
+            [self._upper_bounds.get(vp, math.inf) for vp in vps],
+        )
 
     def set_lb(self, lb: typing.Dict[VertexPassage, int]):
-        # clean lower bounds
-        for vp, bound in list(self._lower_bounds.keys()):
-            if vp not in lb or bound > lb[vp]:
-                constr = self._lower_bounds.pop((vp, bound))
-                self.model.remove(constr)
-        # create new lower bounds
-        for vp, bound in lb.items():
-            if (vp, bound) not in self._lower_bounds:
-                x = self.vertex_passage_vars[vp]
-                constr = self.model.addConstr(x >= bound)
-                self._lower_bounds[(vp, bound)] = constr
+        changed = self._changed(self._lower_bounds, lb)
+        self._lower_bounds = dict(lb)
+        self._apply(changed)
 
     def set_ub(self, ub: typing.Dict[VertexPassage, int]):
-        # clean lower bounds
-        for vp, bound in list(self._upper_bounds.keys()):
-            if vp not in ub or bound < ub[vp]:
-                constr = self._upper_bounds.pop((vp, bound))
-                self.model.remove(constr)
-        # create new lower bounds
-        for vp, bound in ub.items():
-            if (vp, bound) not in self._upper_bounds:
-                x = self.vertex_passage_vars[vp]
-                constr = self.model.addConstr(x <= bound)
-                self._upper_bounds[(vp, bound)] = constr
+        changed = self._changed(self._upper_bounds, ub)
+        self._upper_bounds = dict(ub)
+        self._apply(changed)
 
     def reset_bounds(self):
         self.set_lb({})
@@ -52,19 +54,32 @@ class ManualBounds:
 class LinearProgram:
     """
     Builds a linear program for a min-turn penalty cycle_cover cover on an embedded graph.
+    With `matrix_form` (default), the constraints are added as sparse matrices based on
+    the incidence matrices of the compiled instance. Otherwise, they are built row by
+    row (slower, kept for comparison).
+    The LP is solved by the given `lp_backend` (see `lp_backend.LP_BACKENDS`).
     """
 
-    def __init__(self, instance: PointBasedInstance):
+    def __init__(
+        self,
+        instance: PointBasedInstance,
+        matrix_form: bool = True,
+        lp_backend: str = "gurobi",
+    ):
         self.instance = instance
-        self.model = gp.Model("fractional_grid_covering_lp")
-        self.model.setParam("OutputFlag", 0)
+        self.matrix_form = matrix_form
+        self.model = create_lp_model(lp_backend, "fractional_grid_covering_lp")
         self.vertex_passage_vars = VertexPassageVariablesInGraph(
             instance=instance, model=self.model
         )
         self.penalty_vars = PenaltyVariables(instance=instance, model=self.model)
         self.build_objective()
-        self._build_coverage_constraints()
-        self._build_flow_constraints()
+        if matrix_form:
+            self._build_coverage_constraints_from_matrix()
+            self._build_flow_constraints_from_matrix()
+        else:
+            self._build_coverage_constraints()
+            self._build_flow_constraints()
         self.manual_bounds = ManualBounds(self.model, self.vertex_passage_vars)
 
     def optimize(self):
@@ -74,16 +89,15 @@ class LinearProgram:
         self.model.optimize()
 
     def objective_value(self) -> float:
-        return self.model.getObjective().getValue()
+        return self.model.objective_value()
 
     def build_objective(self):
         """
         Builds the touring_costs. You can call this after changing the positions of the
         vertices without changing the edges.
         """
-        touring_costs = self.vertex_passage_vars.obj()
-        penalty_costs = self.penalty_vars.obj()
-        self.model.setObjective(touring_costs + penalty_costs, gp.GRB.MINIMIZE)
+        self.model.set_objective(*self.vertex_passage_vars.obj())
+        self.model.set_objective(*self.penalty_vars.obj())
 
     def _build_coverage_constraints(self):
         """
@@ -96,22 +110,60 @@ class LinearProgram:
             if t == 0:
                 # Doesn't have to be covered
                 continue
-            cov_sum = sum(self.vertex_passage_vars.get_variables_of_vertex(v).values())
-            penalty_vars_of_v = self.penalty_vars[v]
-            if len(penalty_vars_of_v) > 0:
-                self.model.addConstr(
-                    cov_sum + sum(x[0] for x in penalty_vars_of_v) >= t
-                )
-            else:
-                self.model.addConstr(cov_sum >= t)
+            cov_sum = {
+                x: 1.0
+                for x in self.vertex_passage_vars.get_variables_of_vertex(v).values()
+            }
+            for x, _ in self.penalty_vars[v]:
+                cov_sum[x] = 1.0
+            self.model.add_constraint(cov_sum, GREATER_EQUAL, t)
+
+    def _build_coverage_constraints_from_matrix(self):
+        """
+        Same as `_build_coverage_constraints` but with a single sparse matrix.
+        """
+        compiled = self.instance.compiled()
+        coverage_necessities = self.instance.coverage_necessities
+        demand = np.array(
+            [len(coverage_necessities[v]) for v in compiled.vertices], dtype=float
+        )
+        rows = np.flatnonzero(demand > 0)  # the others do not have to be covered
+        penalty_vars = self.penalty_vars.columns
+        penalty_matrix = sp.csr_matrix(
+            (
+                np.ones(len(penalty_vars)),
+                (self.penalty_vars.vertex_ids, np.arange(len(penalty_vars))),
+            ),
+            shape=(len(compiled), len(penalty_vars)),
+        )
+        matrix = sp.hstack([compiled.coverage_matrix(), penalty_matrix], format="csr")
+        columns = np.concatenate([self.vertex_passage_vars.variables, penalty_vars])
+        self.model.add_constraints(matrix[rows], GREATER_EQUAL, demand[rows], columns)
+
+    def _build_flow_constraints_from_matrix(self):
+        """
+        Same as `_build_flow_constraints` but with a single sparse matrix.
+        """
+        compiled = self.instance.compiled()
+        self.model.add_constraints(
+            compiled.flow_matrix(),
+            EQUAL,
+            0.0,
+            self.vertex_passage_vars.variables,
+        )
 
     def _build_flow_constraints(self):
-        for e in self.instance.graph.edges:
-            def m(vp):
-                return 2 if vp.is_uturn() else 1
-            vars = self.vertex_passage_vars
-            def elements(v, o):
-                return vars.get_outgoing_variables(v, o).items()
-            def out(v, o):
-                return sum(m(vp) * var for vp, var in elements(v, o))
-            self.model.addConstr(out(e[0], e[1]) - out(e[1], e[0]) == 0)
+        """
+        For every edge, the passages leaving on both sides have to be equal.
+        """
+        compiled = self.instance.compiled()
+        variables = self.vertex_passage_vars.variables
+        multiplicity = compiled.passage_multiplicity
+
+        for v, w in compiled.edges.tolist():
+            flow = {}
+            for i in compiled.outgoing_passages(v, w).tolist():
+                flow[int(variables[i])] = float(multiplicity[i])
+            for i in compiled.outgoing_passages(w, v).tolist():
+                flow[int(variables[i])] = -float(multiplicity[i])
+            self.model.add_constraint(flow, EQUAL, 0.0)
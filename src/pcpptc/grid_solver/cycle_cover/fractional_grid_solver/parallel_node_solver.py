@@ -0,0 +1,75 @@
+import typing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from ...grid_instance import PointBasedInstance, VertexPassage
+from ...lp_backend import Basis
+from .linear_program import LinearProgram
+from .solver import get_solution_values
+
+# The LP of the worker process, built once by `_init_worker`.
+_worker_lp: typing.Optional[LinearProgram] = None
+
+# objective, passage ids with non-zero value, their values, basis
+NodeResult = typing.Tuple[float, np.ndarray, np.ndarray, typing.Optional[Basis]]
+
+
+def _init_worker(instance: PointBasedInstance, lp_backend: str):
+    global _worker_lp
+    _worker_lp = LinearProgram(instance, lp_backend=lp_backend)
+
+
+def _solve_node(
+    lb: typing.Dict[int, int],
+    ub: typing.Dict[int, int],
+    basis: typing.Optional[Basis],
+) -> typing.Optional[NodeResult]:
+    lp = _worker_lp
+    passages = lp.vertex_passage_vars.compiled.passages
+    lp.manual_bounds.set_lb({passages[i]: b for i, b in lb.items()})
+    lp.manual_bounds.set_ub({passages[i]: b for i, b in ub.items()})
+    if basis is not None:
+        lp.model.set_basis(basis)
+    lp.optimize()
+    if not lp.model.is_optimal():
+        return None
+    values = get_solution_values(lp)
+    ids = np.flatnonzero(values)
+    return lp.objective_value(), ids, values[ids], lp.model.get_basis()
+
+
+class ParallelNodeSolver:
+    """
+    Solves the LPs of BnB nodes in a process pool. Every worker builds its own copy
+    of the LP once and afterwards only receives the bounds of the node (by passage
+    id) and the basis to start from.
+    """
+
+    def __init__(self, instance: PointBasedInstance, lp_backend: str, workers: int):
+        self.passage_ids = instance.compiled().passage_ids
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(instance, lp_backend),
+        )
+
+    def submit(
+        self,
+        lb: typing.Dict[VertexPassage, int],
+        ub: typing.Dict[VertexPassage, int],
+        basis: typing.Optional[Basis] = None,
+    ) -> "Future[typing.Optional[NodeResult]]":
+        """
+        Solves the LP with the given bounds. The result is None if it is infeasible.
+        """
+        ids = self.passage_ids
+        return self._executor.submit(
+            _solve_node,
+            {ids[vp]: b for vp, b in lb.items()},
+            {ids[vp]: b for vp, b in ub.items()},
+            basis,
+        )
+
+    def shutdown(self):
+        self._executor.shutdown()
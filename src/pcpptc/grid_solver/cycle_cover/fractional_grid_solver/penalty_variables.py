@@ -1,64 +1,38 @@
-import math
 import typing
 from collections import defaultdict
 
-import gurobipy as gp
+import numpy as np
 
-from ...grid_instance import CoverageNecessity, PointBasedInstance, PointVertex
+from ...grid_instance import PointBasedInstance
+from ...lp_backend import LpModel
 
 
 class PenaltyVariables:
     """
     A dict that automatically creates all the penalty variables.
+    The variables are column indices of the model.
+    A penalty variable is only created if the penalty is cheaper than the cheapest
+    cycle covering the vertex, see `CompiledInstance.penalty_candidates`.
     """
 
-    def __init__(self, instance: PointBasedInstance, model: gp.Model):
+    def __init__(self, instance: PointBasedInstance, model: LpModel):
+        compiled = instance.compiled()
+        self.vertex_ids, self.penalties = compiled.penalty_candidates()
+        self.columns = model.add_variables(len(self.penalties), lb=0.0, ub=1.0)
         self._data = defaultdict(list)
-        for v in instance.graph.nodes:
-            coverage_necessity = instance.coverage_necessities[v]
-            if self._no_variables_necessary(coverage_necessity):
-                continue
-            min_cc = self._compute_cost_of_cheapest_cycle(instance, v)
-            for p in coverage_necessity.penalty_vector:
-                assert p > 0.0, "all penalties should be positive"
-                if (
-                    p < min_cc
-                ):  # only if it is cheaper than the cheapest cycle_cover, it is useful to pay a penalty
-                    x = model.addVar(vtype=gp.GRB.CONTINUOUS, lb=0.0, ub=1.0)
-                    self._data[v].append((x, p))
+        vertices = compiled.vertices
+        for v, x, p in zip(
+            self.vertex_ids.tolist(), self.columns.tolist(), self.penalties.tolist()
+        ):
+            self._data[vertices[v]].append((x, p))
 
-    def _no_variables_necessary(self, coverage_necessity: CoverageNecessity) -> bool:
-        if len(coverage_necessity) == 0:
-            return True  # Doesn't need to be covered.
-        if all(x == math.inf for x in coverage_necessity.penalty_vector):
-            return True  # Not allowed to pay penalty instead
-        return False
-
-    def _compute_cost_of_cheapest_cycle(
-        self, instance: PointBasedInstance, v: PointVertex
-    ) -> float:
-        n = min(
-            instance.graph.neighbors(v),
-            key=lambda n: instance.touring_costs.distance_cost_of_edge(v, n),
-        )
-        t0 = instance.touring_costs.turn_cost_at_vertex(v, (n, n))
-        assert t0 >= 0
-        t1 = instance.touring_costs.turn_cost_at_vertex(n, (v, v))
-        assert t1 >= 0
-        t1 = instance.touring_costs.turn_cost_at_vertex(n, (v, v))
-        d = 2 * instance.touring_costs.distance_cost_of_edge(v, n)
-        assert d >= 0
-        return t0 + d + t1
-
-    def obj(self):
+    def obj(self) -> typing.Tuple[np.ndarray, np.ndarray]:
         """
-        Returns the penalty objective to be added to the LP objective.
+        Returns the penalty variables and their objective coefficients.
         """
-        if not self._data:
-            return 0.0
-        return sum(sum(x * p for (x, p) in l) for l in self._data.values())
+        return self.columns, self.penalties
 
-    def __getitem__(self, item) -> typing.List[typing.Tuple[gp.Var, float]]:
+    def __getitem__(self, item) -> typing.List[typing.Tuple[int, float]]:
         return self._data[item]
 
     def get_stats(self):
@@ -1,33 +1,50 @@
 import typing
 
-from ...grid_instance import PointBasedInstance
+import numpy as np
+
+from ...grid_instance import PointBasedInstance, VertexPassage
 from ...grid_solution import FractionalSolution
 from .linear_program import LinearProgram
 
 
-def get_fractional_solution(lp: LinearProgram):
+def get_solution_values(lp: LinearProgram) -> np.ndarray:
+    """
+    The values of all passages (indexed by passage id). Values up to 0.01 are zero.
+    """
+    values = lp.model.values(lp.vertex_passage_vars.variables)
+    values[values <= 0.01] = 0.0
+    return values
+
+
+def to_fractional_solution(
+    passages: typing.List[VertexPassage], values: np.ndarray
+) -> FractionalSolution:
     result = FractionalSolution()
-    for vp, x in lp.vertex_passage_vars.items():
-        if x.x > 0.01:
-            result[vp] = x.x
+    for i in np.flatnonzero(values).tolist():
+        result[passages[i]] = values[i]
     return result
 
 
+def get_fractional_solution(lp: LinearProgram):
+    passages = lp.vertex_passage_vars.compiled.passages
+    return to_fractional_solution(passages, get_solution_values(lp))
+
+
 class FractionalGridSolver:
     """
     Solves the optimal fractional penalty cycle_cover cover with distance and turn costs for
     an embedded graph, target.g., a grid.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, lp_backend: str = "gurobi"):
+        self.lp_backend = lp_backend
 
     def description(self) -> str:
-        return "FractionalGridSolver based on Gurobi."
+        return f"FractionalGridSolver based on {self.lp_backend}."
 
     def __call__(
         self, instance: PointBasedInstance
     ) -> typing.Tuple[FractionalSolution, float]:
-        lp = LinearProgram(instance)
+        lp = LinearProgram(instance, lp_backend=self.lp_backend)
         lp.optimize()
         return get_fractional_solution(lp), lp.objective_value()
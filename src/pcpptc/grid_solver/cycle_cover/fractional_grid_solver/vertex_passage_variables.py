@@ -1,47 +1,44 @@
-import itertools
+import typing
 
-import gurobipy as gp
+import numpy as np
 
-from ...grid_instance import PointBasedInstance, VertexPassage
+from ...grid_instance import PointBasedInstance
+from ...lp_backend import LpModel
 
 
 class VertexPassageVariablesInGraph(dict):
     """
-    A dict with all the vertex passage variables of a graph.
+    A dict with all the vertex passage variables (column indices) of a graph.
     It automatically creates the variables during init.
     Additionally it provides some functions to obtain specific subsets of these variables.
+    The variables are created in the order of the passage ids of the compiled instance,
+    such that `variables[i]` is the variable of the passage with id i.
     """
 
-    def __init__(self, instance: PointBasedInstance, model: gp.Model):
+    def __init__(self, instance: PointBasedInstance, model: LpModel):
         super().__init__()
         self.instance = instance
         self.graph = instance.graph
+        self.compiled = instance.compiled()
         self.model = model
-        for v in self.graph.nodes:
-            for u, w in itertools.combinations_with_replacement(
-                self.graph.neighbors(v), r=2
-            ):
-                vp = VertexPassage(v, end_a=u, end_b=w)
-                var = model.addVar(vtype=gp.GRB.CONTINUOUS, lb=0.0)
-                self[vp] = var
+        self.variables = model.add_variables(self.compiled.number_of_passages, lb=0.0)
+        self.update(zip(self.compiled.passages, self.variables.tolist()))
 
     def get_variables_of_vertex(self, v) -> dict:
         """
         Returns all variables that cover/pass v.
         """
-        result = {}
-        for u, w in itertools.combinations_with_replacement(
-            self.graph.neighbors(v), r=2
-        ):
-            vp = VertexPassage(v, end_a=u, end_b=w)
-            result[vp] = self[vp]
-        return result
+        passages = self.compiled.passages
+        return {
+            passages[i]: int(self.variables[i])
+            for i in self.compiled.passages_of_vertex(self.compiled.vertex_ids[v])
+        }
 
-    def _cost(self, vp: VertexPassage) -> float:
-        return self.instance.touring_costs.vertex_passage_cost(vp, halving=True)
-
-    def obj(self):
-        return sum(self._cost(vp) * x for (vp, x) in self.items())
+    def obj(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the variables and their objective coefficients.
+        """
+        return self.variables, self.compiled.vertex_passage_costs(halving=True)
 
     def get_outgoing_variables(self, v, out) -> dict:
         """
@@ -49,8 +46,9 @@ class VertexPassageVariablesInGraph(dict):
         Used target.g. for the constrained that for each edge, there has to be an equal usage
         on both sides.
         """
-        result = {}
-        for n in self.graph.neighbors(v):
-            vp = VertexPassage(v, end_a=out, end_b=n)
-            result[vp] = self[vp]
-        return result
+        ids = self.compiled.vertex_ids
+        passages = self.compiled.passages
+        return {
+            passages[i]: int(self.variables[i])
+            for i in self.compiled.outgoing_passages(ids[v], ids[out]).tolist()
+        }
@@ -1,12 +1,13 @@
-
-import gurobipy as gp
+import typing
 
 from ...grid_instance import VertexPassage
 from ...grid_solution import (
     Cycle,
     FractionalSolution,
+    Validation,
     create_cycle_solution,
 )
+from ...lp_backend import GREATER_EQUAL, LpModel
 from .vp_variables import (
     VertexPassageVariablesInGraph,
 )
@@ -17,20 +18,22 @@ class CycleElimination:
         self,
         instance,
         area,
-        model: gp.Model,
+        model: LpModel,
         vp_vars: VertexPassageVariablesInGraph,
-        lazy: bool,
+        validation: typing.Optional[Validation] = None,
     ):
         self.model = model
         self.vp_vars = vp_vars
         self.instance = instance
         self.area = area
-        self.lazy = lazy
+        self.validation = validation
 
     def separate(self, fractional_solution: FractionalSolution):
         # assert is_feasible_cycle_cover(self.instance, fractional_solution)
         print("Checking for cycles in solution.")
-        cc = create_cycle_solution(self.instance.graph, fractional_solution)
+        cc = create_cycle_solution(
+            self.instance.graph, fractional_solution, self.validation
+        )
         print(f"Found {len(cc)} cycles.")
         if len(cc) > 1:
             for c in cc:
@@ -40,16 +43,15 @@ class CycleElimination:
 
     def eliminate(self, cycle):
         el_vp = self.passages_in_area(cycle)[0]
-        constr = (
-            sum(self.vp_vars[vp] for vp in self.leaving_passages(cycle))
-            >= self.vp_vars[el_vp]
-        )
-        if self.lazy:
-            print("Adding lazy subtour elimination constraint.")
-            self.model.cbLazy(constr)
-        else:
-            print("Adding subtour elimination constraint.")
-            self.model.addConstr(constr)
+        # sum(leaving passages) - x[el_vp] >= 0
+        constr = {}
+        for vp in self.leaving_passages(cycle):
+            x = self.vp_vars[vp]
+            constr[x] = constr.get(x, 0.0) + 1.0
+        x = self.vp_vars[el_vp]
+        constr[x] = constr.get(x, 0.0) - 1.0
+        print("Adding subtour elimination constraint.")
+        self.model.add_constraint(constr, GREATER_EQUAL, 0.0)
 
     def passages_in_area(self, cycle: Cycle):
         fs = cycle.to_fractional_solution()
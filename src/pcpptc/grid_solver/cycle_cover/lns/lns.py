@@ -1,33 +1,50 @@
+import typing
+
 from ...grid_instance import PointBasedInstance
-from ...grid_solution import (
-    FractionalSolution,
-    is_feasible_cycle_cover,
-)
+from ...grid_solution import FractionalSolution, Validation
 from .area_selector import AreaSelector
 from .cycle_elimination import CycleElimination
 from .mip import MixedIntegerProgram
 
 
-def local_optimize_cc_area(
-    instance: PointBasedInstance, fractional_solution: FractionalSolution, area
-):
-    lp = MixedIntegerProgram(instance, area, fractional_solution)
-    lp.optimize()
+def _extract_solution(
+    lp: MixedIntegerProgram, fractional_solution: FractionalSolution
+) -> FractionalSolution:
     result = FractionalSolution()
     result += fractional_solution
+    values = lp.model.values()
     for vp, x in lp.vertex_passage_vars.items():
-        result[vp] = round(x.X)
+        result[vp] = round(values[x])
     return result
 
 
+def local_optimize_cc_area(
+    instance: PointBasedInstance,
+    fractional_solution: FractionalSolution,
+    area,
+    lp_backend: str = "gurobi",
+):
+    lp = MixedIntegerProgram(instance, area, fractional_solution, lp_backend)
+    lp.optimize()
+    return _extract_solution(lp, fractional_solution)
+
+
 class CcLns:
-    def __init__(self, area_size=50, repetitions: int = 10):
+    def __init__(
+        self,
+        area_size=50,
+        repetitions: int = 10,
+        lp_backend: str = "gurobi",
+        validation: typing.Optional[Validation] = None,
+    ):
         self.area_selector = AreaSelector(area_size)
         self.repetitions = repetitions
+        self.lp_backend = lp_backend
+        self.validation = validation if validation is not None else Validation()
 
     def _opt_step(self, instance, solution, area) -> FractionalSolution:
-        opt_solution = local_optimize_cc_area(instance, solution, area)
-        assert is_feasible_cycle_cover(instance, opt_solution)
+        opt_solution = local_optimize_cc_area(instance, solution, area, self.lp_backend)
+        self.validation.check_cycle_cover("cc_lns", instance, opt_solution)
         return opt_solution
 
     def description(self) -> str:
@@ -56,30 +73,42 @@ def local_optimize_tour_area(
     fractional_solution: FractionalSolution,
     area,
     max_subtour_eliminations,
+    lp_backend: str = "gurobi",
+    validation: typing.Optional[Validation] = None,
 ):
-    lp = MixedIntegerProgram(instance, area, fractional_solution)
-    ce = CycleElimination(instance, area, lp.model, lp.vertex_passage_vars, lazy=False)
+    lp = MixedIntegerProgram(instance, area, fractional_solution, lp_backend)
+    ce = CycleElimination(
+        instance,
+        area,
+        lp.model,
+        lp.vertex_passage_vars,
+        validation=validation,
+    )
     result = None
     while result is None or ce.separate(result):
         if max_subtour_eliminations < 0:
             print("Not able to connect tour with given number of eliminations.")
             return fractional_solution
         lp.optimize()
-        result = FractionalSolution()
-        result += fractional_solution
-        for vp, x in lp.vertex_passage_vars.items():
-            result[vp] = round(x.X)
+        result = _extract_solution(lp, fractional_solution)
         max_subtour_eliminations -= 1
     return result
 
 
 class TourLns:
     def __init__(
-        self, area_size=50, repetitions: int = 10, max_subtour_eliminations: int = 10
+        self,
+        area_size=50,
+        repetitions: int = 10,
+        max_subtour_eliminations: int = 10,
+        lp_backend: str = "gurobi",
+        validation: typing.Optional[Validation] = None,
     ):
         self.area_selector = AreaSelector(area_size, only_covered_roots=True)
         self.max_subtour_eliminations = max_subtour_eliminations
         self.repetitions = repetitions
+        self.lp_backend = lp_backend
+        self.validation = validation if validation is not None else Validation()
 
     def description(self) -> str:
         descr = "Local Relaxation Tour Optimization:\n"
@@ -93,9 +122,14 @@ class TourLns:
 
     def _opt_step(self, instance, solution, area) -> FractionalSolution:
         opt_solution = local_optimize_tour_area(
-            instance, solution, area, self.max_subtour_eliminations
+            instance,
+            solution,
+            area,
+            self.max_subtour_eliminations,
+            self.lp_backend,
+            self.validation,
         )
-        assert is_feasible_cycle_cover(instance, opt_solution)
+        self.validation.check_cycle_cover("tour_lns", instance, opt_solution)
         return opt_solution
 
     def continous_optimization(
@@ -1,6 +1,5 @@
-import gurobipy as gp
-
 from ...grid_instance import PointBasedInstance
+from ...lp_backend import EQUAL, GREATER_EQUAL, create_lp_model
 from .penalty_variables import PenaltyVariables
 from .vp_variables import VertexPassageVariablesInGraph
 
@@ -10,11 +9,12 @@ class MixedIntegerProgram:
     Builds a linear program for a min-turn penalty cycle_cover cover on an embedded graph.
     """
 
-    def __init__(self, instance: PointBasedInstance, area, fs):
+    def __init__(
+        self, instance: PointBasedInstance, area, fs, lp_backend: str = "gurobi"
+    ):
         self.instance = instance
         self.area = area
-        self.model = gp.Model("fractional_grid_covering_lp")
-        self.model.setParam("OutputFlag", 0)
+        self.model = create_lp_model(lp_backend, "fractional_grid_covering_lp")
         self.vertex_passage_vars = VertexPassageVariablesInGraph(
             instance=instance, area=area, fractional_solution=fs, model=self.model
         )
@@ -33,16 +33,15 @@ class MixedIntegerProgram:
         self.model.optimize()
 
     def objective_value(self) -> float:
-        return self.model.getObjective().getValue()
+        return self.model.objective_value()
 
     def build_objective(self):
         """
         Builds the touring_costs. You can call this after changing the positions of the
         vertices without changing the edges.
         """
-        touring_costs = self.vertex_passage_vars.obj()
-        penalty_costs = self.penalty_vars.obj()
-        self.model.setObjective(touring_costs + penalty_costs, gp.GRB.MINIMIZE)
+        self.model.set_objective(*self.vertex_passage_vars.obj())
+        self.model.set_objective(*self.penalty_vars.obj())
 
     def _build_coverage_constraints(self):
         """
@@ -55,23 +54,32 @@ class MixedIntegerProgram:
             if t == 0:
                 # Doesn't have to be covered
                 continue
-            cov_sum = sum(self.vertex_passage_vars.get_variables_of_vertex(v).values())
-            penalty_vars_of_v = self.penalty_vars[v]
-            if len(penalty_vars_of_v) > 0:
-                self.model.addConstr(
-                    cov_sum + sum(x[0] for x in penalty_vars_of_v) >= t
-                )
-            else:
-                self.model.addConstr(cov_sum >= t)
+            cov_sum = {
+                x: 1.0
+                for x in self.vertex_passage_vars.get_variables_of_vertex(v).values()
+            }
+            for x, _ in self.penalty_vars[v]:
+                cov_sum[x] = 1.0
+            self.model.add_constraint(cov_sum, GREATER_EQUAL, t)
 
     def _build_flow_constraints(self):
-        for e in self.instance.graph.edges:
-            if e[0] in self.area and e[1] in self.area:
-                def m(vp):
-                    return 2 if vp.is_uturn() else 1
-                vars = self.vertex_passage_vars
-                def elements(v, o):
-                    return vars.get_outgoing_variables(v, o).items()
-                def out(v, o):
-                    return sum(m(vp) * var for vp, var in elements(v, o))
-                self.model.addConstr(out(e[0], e[1]) - out(e[1], e[0]) == 0)
+        """
+        For every edge in the area, the passages leaving on both sides have to be
+        equal.
+        """
+        compiled = self.instance.compiled()
+        area = {compiled.vertex_ids[v] for v in self.area}
+        columns = self.vertex_passage_vars.passage_columns()
+        multiplicity = compiled.passage_multiplicity
+
+        for v, w in compiled.edges.tolist():
+            if v not in area or w not in area:
+                continue
+            flow = {}
+            for i in compiled.outgoing_passages(v, w).tolist():
+                if columns[i] >= 0:
+                    flow[int(columns[i])] = float(multiplicity[i])
+            for i in compiled.outgoing_passages(w, v).tolist():
+                if columns[i] >= 0:
+                    flow[int(columns[i])] = -float(multiplicity[i])
+            self.model.add_constraint(flow, EQUAL, 0.0)
@@ -1,16 +1,19 @@
-import math
 import typing
 from collections import defaultdict
 
-import gurobipy as gp
+import numpy as np
 
-from ...grid_instance import CoverageNecessity, PointBasedInstance, PointVertex
+from ...grid_instance import PointBasedInstance
 from ...grid_solution import FractionalSolution
+from ...lp_backend import LpModel
 
 
 class PenaltyVariables:
     """
     A dict that automatically creates all the penalty variables.
+    The variables are column indices of the model.
+    The candidates are precomputed once per instance, see
+    `CompiledInstance.penalty_candidates`, and only selected for the area here.
     """
 
     def __init__(
@@ -18,57 +21,37 @@ class PenaltyVariables:
         instance: PointBasedInstance,
         area,
         fractional_solution: FractionalSolution,
-        model: gp.Model,
+        model: LpModel,
     ):
-        self._data = defaultdict(list)
         self.fractional_solution = fractional_solution
-        for v in area:
-            coverage_necessity = instance.coverage_necessities[v]
-            if self._no_variables_necessary(coverage_necessity):
-                continue
-            min_cc = self._compute_cost_of_cheapest_cycle(instance, v)
-            for p in coverage_necessity.penalty_vector:
-                assert p > 0.0, "all penalties should be positive"
-                if (
-                    p < min_cc
-                ):  # only if it is cheaper than the cheapest cycle_cover, it is useful to pay a penalty
-                    x = model.addVar(vtype=gp.GRB.BINARY)
-                    if fractional_solution.coverage(v) > 0:
-                        x.start = 0
-                    else:
-                        x.start = 1
-                    self._data[v].append((x, p))
-
-    def _no_variables_necessary(self, coverage_necessity: CoverageNecessity) -> bool:
-        if len(coverage_necessity) == 0:
-            return True  # Doesn't need to be covered.
-        if all(x == math.inf for x in coverage_necessity.penalty_vector):
-            return True  # Not allowed to pay penalty instead
-        return False
-
-    def _compute_cost_of_cheapest_cycle(
-        self, instance: PointBasedInstance, v: PointVertex
-    ) -> float:
-        n = min(
-            instance.graph.neighbors(v),
-            key=lambda n: instance.touring_costs.distance_cost_of_edge(v, n),
+        compiled = instance.compiled()
+        vertex_ids, penalties = compiled.penalty_candidates()
+        in_area = np.zeros(len(compiled), dtype=bool)
+        in_area[[compiled.vertex_ids[v] for v in area]] = True
+        selected = in_area[vertex_ids]
+        self.vertex_ids = vertex_ids[selected]
+        self.penalties = penalties[selected]
+        self.columns = model.add_variables(
+            len(self.penalties), lb=0, ub=1, integer=True
         )
-        t0 = instance.touring_costs.turn_cost_at_vertex(v, (n, n))
-        assert t0 >= 0
-        t1 = instance.touring_costs.turn_cost_at_vertex(n, (v, v))
-        assert t1 >= 0
-        t1 = instance.touring_costs.turn_cost_at_vertex(n, (v, v))
-        d = 2 * instance.touring_costs.distance_cost_of_edge(v, n)
-        assert d >= 0
-        return t0 + d + t1
+        vertices = compiled.vertices
+        covered = {
+            v: fractional_solution.coverage(vertices[v]) > 0
+            for v in set(self.vertex_ids.tolist())
+        }
+        start = [0.0 if covered[v] else 1.0 for v in self.vertex_ids.tolist()]
+        model.set_start(self.columns, start)
+        self._data = defaultdict(list)
+        for v, x, p in zip(
+            self.vertex_ids.tolist(), self.columns.tolist(), self.penalties.tolist()
+        ):
+            self._data[vertices[v]].append((x, p))
 
-    def obj(self):
+    def obj(self) -> typing.Tuple[np.ndarray, np.ndarray]:
         """
-        Returns the penalty objective to be added to the LP objective.
+        Returns the penalty variables and their objective coefficients.
         """
-        if not self._data:
-            return 0.0
-        return sum(sum(x * p for (x, p) in l) for l in self._data.values())
+        return self.columns, self.penalties
 
-    def __getitem__(self, item) -> typing.List[typing.Tuple[gp.Var, float]]:
+    def __getitem__(self, item) -> typing.List[typing.Tuple[int, float]]:
         return self._data[item]
@@ -1,15 +1,16 @@
-import itertools
+import typing
 
-import gurobipy as gp
+import numpy as np
 
-from ...grid_instance import PointBasedInstance, VertexPassage
+from ...grid_instance import PointBasedInstance
 from ...grid_solution import FractionalSolution
+from ...lp_backend import EQUAL, LpModel
 from .fixed_edges import FixedEdges
 
 
 class VertexPassageVariablesInGraph(dict):
     """
-    A dict with all the vertex passage variables of a graph.
+    A dict with all the vertex passage variables (column indices) of a graph.
     It automatically creates the variables during init.
     Additionally it provides some functions to obtain specific subsets of these variables.
     """
@@ -19,30 +20,43 @@ class VertexPassageVariablesInGraph(dict):
         instance: PointBasedInstance,
         area,
         fractional_solution: FractionalSolution,
-        model: gp.Model,
+        model: LpModel,
     ):
         super().__init__()
         self.instance = instance
         self.graph = instance.graph
+        self.compiled = instance.compiled()
         self.model = model
         self.area = area
         self.fixed_edges = FixedEdges(area, fractional_solution)
         self.fractional_solution = fractional_solution
+        self._passage_ids = []  # passage id of each variable
+        self._variables = np.zeros(0, dtype=np.int64)
         self._add_variables()
         self._add_fixed_constraints()
 
     def _add_variables(self):
+        compiled = self.compiled
+        passages = compiled.passages
         for v in self.area:
-            for u, w in itertools.combinations_with_replacement(
-                self.graph.neighbors(v), r=2
-            ):
-                u_included = u in self.area or self.fixed_edges[(v, u)] > 0
-                w_included = w in self.area or self.fixed_edges[(v, w)] > 0
-                if u_included and w_included:
-                    vp = VertexPassage(v, end_a=u, end_b=w)
-                    var = self.model.addVar(vtype=gp.GRB.INTEGER, lb=0.0)
-                    var.Start = self.fractional_solution[vp]
-                    self[vp] = var
+            vid = compiled.vertex_ids[v]
+            included = [
+                n in self.area or self.fixed_edges[(v, n)] > 0
+                for n in compiled.neighbors(v)
+            ]
+            for i in compiled.passages_of_vertex(vid):
+                a = compiled.passage_slot_a[i]
+                b = compiled.passage_slot_b[i]
+                if included[a] and included[b]:
+                    self._passage_ids.append(i)
+        self._variables = self.model.add_variables(
+            len(self._passage_ids), lb=0.0, integer=True
+        )
+        vps = [passages[i] for i in self._passage_ids]
+        self.model.set_start(
+            self._variables, [self.fractional_solution[vp] for vp in vps]
+        )
+        self.update(zip(vps, self._variables.tolist()))
 
     def _add_fixed_constraints(self):
         for v in self.area:
@@ -50,27 +64,31 @@ class VertexPassageVariablesInGraph(dict):
                 def mult(vp):
                     return 2 if vp.is_uturn() else 1
                 out_vars = self.get_outgoing_variables(v, out=w).items()
-                passage = sum(mult(vp) * x for vp, x in out_vars)
-                self.model.addConstr(passage == n)
+                passage = {x: mult(vp) for vp, x in out_vars}
+                self.model.add_constraint(passage, EQUAL, n)
 
     def get_variables_of_vertex(self, v) -> dict:
         """
         Returns all variables that cover/pass v.
         """
-        result = {}
-        for u, w in itertools.combinations_with_replacement(
-            self.graph.neighbors(v), r=2
-        ):
-            vp = VertexPassage(v, end_a=u, end_b=w)
-            if vp in self:
-                result[vp] = self[vp]
-        return result
+        passages = self.compiled.passages
+        ids = self.compiled.passages_of_vertex(self.compiled.vertex_ids[v])
+        return {passages[i]: self[passages[i]] for i in ids if passages[i] in self}
 
-    def _cost(self, vp: VertexPassage) -> float:
-        return self.instance.touring_costs.vertex_passage_cost(vp, halving=True)
+    def passage_columns(self) -> np.ndarray:
+        """
+        Returns the variable of every passage id (-1 if it has none).
+        """
+        columns = np.full(self.compiled.number_of_passages, -1, dtype=np.int64)
+        columns[self._passage_ids] = self._variables
+        return columns
 
-    def obj(self):
-        return sum(self._cost(vp) * x for (vp, x) in self.items())
+    def obj(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the variables and their objective coefficients.
+        """
+        costs = self.compiled.vertex_passage_costs(halving=True)
+        return self._variables, costs[self._passage_ids]
 
     def get_outgoing_variables(self, v, out) -> dict:
         """
@@ -78,9 +96,11 @@ class VertexPassageVariablesInGraph(dict):
         Used target.g. for the constrained that for each edge, there has to be an equal usage
         on both sides.
         """
+        ids = self.compiled.vertex_ids
+        passages = self.compiled.passages
         result = {}
-        for n in self.graph.neighbors(v):
-            vp = VertexPassage(v, end_a=out, end_b=n)
+        for i in self.compiled.outgoing_passages(ids[v], ids[out]).tolist():
+            vp = passages[i]
             if vp in self:
                 result[vp] = self[vp]
         return result
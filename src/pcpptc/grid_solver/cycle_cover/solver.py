@@ -1,12 +1,13 @@
 import typing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 
 from ..grid_instance import PointBasedInstance
-from ..grid_solution import (
-    Cycle,
-    FractionalSolution,
-    create_cycle_solution,
+from ..grid_solution import Cycle, FractionalSolution
+from .atomic_strip_matcher import (
+    AtomicStripMatching,
+    PartitionedMatching,
+    TransitionCostCalculator,
 )
-from .atomic_strip_matcher import AtomicStripMatching, TransitionCostCalculator
 from .atomic_strip_orientation import (
     EquiangularRepetitionAtomicStrips,
     NeighborBasedStripStrategy,
@@ -30,12 +31,33 @@ class CycleCoverSolver:
         adaptive_strips=False,
         integralize: int = 0,
         callbacks=CycleCoverSolverCallbacks(),
+        lp_backend: str = "gurobi",
+        integralize_workers: int = 1,
+        integralize_parallel_nodes: int = 1,
+        matching_candidates: typing.Optional[int] = None,
+        matching_tile_size: typing.Optional[float] = None,
+        matching_workers: int = 1,
+        strip_workers: int = 1,
+        strip_executor: str = "process",
     ):
         self.callbacks = callbacks
+        if strip_executor not in ("thread", "process"):
+            msg = f"Unknown executor '{strip_executor}' (use 'thread' or 'process')."
+            raise ValueError(msg)
+        self.strip_workers = strip_workers
+        self.strip_executor = strip_executor
+        self.matching_candidates = matching_candidates
+        self.matching_tile_size = matching_tile_size
+        self.matching_workers = matching_workers
         if integralize:
-            self._lp_solver = IntegralizingFractionalSolver(integralize)
+            self._lp_solver = IntegralizingFractionalSolver(
+                integralize,
+                lp_backend=lp_backend,
+                workers=integralize_workers,
+                parallel_nodes=integralize_parallel_nodes,
+            )
         else:
-            self._lp_solver = FractionalGridSolver()
+            self._lp_solver = FractionalGridSolver(lp_backend=lp_backend)
 
         if adaptive_strips:
             self._atomic_strip_selector = NeighborBasedStripStrategy(k * r)
@@ -54,8 +76,19 @@ class CycleCoverSolver:
         descr += self._atomic_strip_selector.description()
         return descr
 
+    def _executor(self) -> typing.Optional[Executor]:
+        if self.strip_workers <= 1:
+            return None
+        if self.strip_executor == "thread":
+            return ThreadPoolExecutor(max_workers=self.strip_workers)
+        return ProcessPoolExecutor(max_workers=self.strip_workers)
+
     def _create_atomic_strips(self, pbi: PointBasedInstance, frac: FractionalSolution):
-        atomic_strips = self._atomic_strip_selector(pbi, frac)
+        executor = self._executor()
+        if executor is None:
+            return self._atomic_strip_selector(pbi, frac)
+        with executor:
+            atomic_strips = self._atomic_strip_selector(pbi, frac, executor=executor)
         return atomic_strips
 
     def _solve_fractionally(self, pbi: PointBasedInstance) -> FractionalSolution:
@@ -65,28 +98,39 @@ class CycleCoverSolver:
         return fractional_solution
 
     def __call__(self, pbi: PointBasedInstance) -> typing.List[Cycle]:
-        solution = self.optimize(pbi)
-        cc = create_cycle_solution(pbi.graph, solution)
-        return cc
+        # the cycles are directly taken from the matching
+        return self._optimize_matching(pbi).to_cycles()
 
     def optimize(self, pbi: PointBasedInstance) -> FractionalSolution:
+        return self._optimize_matching(pbi).to_solution()
+
+    def _optimize_matching(self, pbi: PointBasedInstance) -> AtomicStripMatching:
         print("Cycle Cover: Computing fractional solution...")
         fractional_solution = self._solve_fractionally(pbi)
         print("Cycle Cover: Creating matching problem...")
         atomic_strips = self._create_atomic_strips(pbi, fractional_solution)
         print("Cycle Cover: Solving matching...")
-        solution = self._match_atomic_strips(pbi, atomic_strips)
-        return solution
+        return self._solve_matching(pbi, atomic_strips)
+
+    def _partitioning(self) -> typing.Optional[PartitionedMatching]:
+        if self.matching_tile_size is None:
+            return None
+        return PartitionedMatching(
+            self.matching_tile_size, workers=self.matching_workers
+        )
 
-    def _match_atomic_strips(self, pbi, atomic_strips) -> FractionalSolution:
+    def _solve_matching(self, pbi, atomic_strips) -> AtomicStripMatching:
         asm = AtomicStripMatching(
-            pbi.graph, TransitionCostCalculator(pbi.touring_costs)
+            pbi.compiled(),
+            TransitionCostCalculator(pbi.touring_costs),
+            bulk=True,
+            candidates=self.matching_candidates,
+            partitioning=self._partitioning(),
         )
         for p in pbi.graph.nodes:
             for o in atomic_strips[p]:
                 s = asm.create_atomic_strip(p, o.orientation)
                 if o.is_skippable():
                     asm.add_skip_penalty(s, o.penalty)
-        edges = asm.solve()
-        solution = asm.to_solution()
-        return solution
+        asm.solve()
+        return asm
@@ -4,6 +4,7 @@ The optimize uses this representation an can completely ignore the
 polygonal instance.
 """
 
+from .compiled_instance import CompiledGraph, CompiledInstance
 from .coverage_necessity import (
     CoverageNecessities,
     CoverageNecessity,
@@ -30,4 +31,6 @@ __all__ = [
     "PointBasedInstance",
     "TouringCosts",
     "VertexPassage",
+    "CompiledGraph",
+    "CompiledInstance",
 ]
@@ -0,0 +1,478 @@
+"""
+Array-backed snapshots of the grid instance. The solver components can use integer
+ids instead of hashing PointVertex and VertexPassage objects in their hot loops.
+"""
+
+import itertools
+import typing
+import unittest
+
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+
+from .point import PointVertex
+from .vertex_passage import VertexPassage
+
+
+def _readonly(a: np.ndarray) -> np.ndarray:
+    a.setflags(write=False)
+    return a
+
+
+class CompiledGraph:
+    """
+    An immutable snapshot of an embedded graph.
+    * Vertices get the ids 0..n-1 in the order of `graph.nodes`.
+    * The adjacency is stored in CSR format (`adjacency_indptr`, `adjacency_indices`).
+      Every CSR position represents a directed edge and the position of a neighbor
+      within the list of a vertex is called its slot.
+    * Every undirected edge gets an id (`edges`, `adjacency_edges`).
+    * Every vertex passage gets an id. The passages of a vertex are consecutive and
+      enumerated like `itertools.combinations_with_replacement(neighbors, 2)`.
+      `passage_table[v, i, j]` is the passage through v between the neighbors in
+      slot i and slot j (-1 for invalid slots).
+
+    The snapshot does not notice changes of the graph. If you change the edges or move
+    the vertices, you have to compile it again.
+    """
+
+    def __init__(self, graph: nx.Graph):
+        self.graph = graph
+        self.vertices: typing.List[PointVertex] = list(graph.nodes)
+        self.vertex_ids: typing.Dict[PointVertex, int] = {
+            v: i for i, v in enumerate(self.vertices)
+        }
+        n = len(self.vertices)
+        self.coordinates = _readonly(
+            np.array([(v.x, v.y) for v in self.vertices], dtype=float).reshape(n, 2)
+        )
+        self._build_adjacency()
+        self._build_edges()
+        self._build_passages()
+        self._build_geometry()
+        self._passages: typing.Optional[typing.List[VertexPassage]] = None
+        self._passage_ids: typing.Optional[typing.Dict[VertexPassage, int]] = None
+        self._coverage_matrix: typing.Optional[sp.csr_matrix] = None
+        self._flow_matrix: typing.Optional[sp.csr_matrix] = None
+
+    def _build_adjacency(self):
+        n = len(self.vertices)
+        neighbors = [
+            [self.vertex_ids[w] for w in self.graph.neighbors(v)] for v in self.vertices
+        ]
+        self._neighbors = {
+            v: tuple(self.vertices[w] for w in nbrs)
+            for v, nbrs in zip(self.vertices, neighbors)
+        }
+        degrees = np.array([len(nbrs) for nbrs in neighbors], dtype=np.int64)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        self.degrees = _readonly(degrees)
+        self.max_degree = int(degrees.max()) if n else 0
+        self.adjacency_indptr = _readonly(indptr)
+        self.adjacency_indices = _readonly(
+            np.fromiter(
+                itertools.chain.from_iterable(neighbors),
+                dtype=np.int64,
+                count=int(indptr[-1]),
+            )
+        )
+        # source vertex and slot of every directed edge (CSR position)
+        self.adjacency_sources = _readonly(np.repeat(np.arange(n), degrees))
+        self.adjacency_slots = _readonly(
+            np.arange(len(self.adjacency_indices)) - indptr[self.adjacency_sources]
+        )
+        self._slots = {
+            (v, w): s for v, nbrs in enumerate(neighbors) for s, w in enumerate(nbrs)
+        }
+
+    def _build_edges(self):
+        n = len(self.vertices)
+        src = self.adjacency_sources
+        dst = self.adjacency_indices
+        keys = src * n + dst
+        order = np.argsort(keys)
+        reverse = order[np.searchsorted(keys[order], dst * n + src)]
+        self._dedge_order = _readonly(order)
+        self._dedge_keys = _readonly(keys[order])
+        # position of the opposite directed edge
+        self.adjacency_reverse = _readonly(reverse)
+        forward = src < dst
+        edge_of_forward = np.cumsum(forward) - 1
+        adjacency_edges = np.where(
+            forward, edge_of_forward, edge_of_forward[reverse]
+        ).astype(np.int64)
+        self.adjacency_edges = _readonly(adjacency_edges)
+        self.edges = _readonly(np.stack([src[forward], dst[forward]], axis=1))
+
+    def _build_passages(self):
+        n = len(self.vertices)
+        degrees = self.degrees
+        counts = degrees * (degrees + 1) // 2
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        num_passages = int(indptr[-1])
+        passage_vertex = np.repeat(np.arange(n), counts)
+        slot_a = np.zeros(num_passages, dtype=np.int64)
+        slot_b = np.zeros(num_passages, dtype=np.int64)
+        local = np.arange(num_passages) - indptr[passage_vertex]
+        for d in np.unique(degrees):
+            if d == 0:
+                continue
+            rows, cols = np.triu_indices(d)  # combinations_with_replacement order
+            mask = degrees[passage_vertex] == d
+            slot_a[mask] = rows[local[mask]]
+            slot_b[mask] = cols[local[mask]]
+        table = np.full((n, self.max_degree, self.max_degree), -1, dtype=np.int64)
+        ids = np.arange(num_passages)
+        table[passage_vertex, slot_a, slot_b] = ids
+        table[passage_vertex, slot_b, slot_a] = ids
+        offsets = self.adjacency_indptr[passage_vertex]
+        self.passage_indptr = _readonly(indptr)
+        self.passage_vertex = _readonly(passage_vertex)
+        self.passage_slot_a = _readonly(slot_a)
+        self.passage_slot_b = _readonly(slot_b)
+        self.passage_end_a = _readonly(self.adjacency_indices[offsets + slot_a])
+        self.passage_end_b = _readonly(self.adjacency_indices[offsets + slot_b])
+        # directed edges v->end of the passage ends
+        self.passage_dedge_a = _readonly(offsets + slot_a)
+        self.passage_dedge_b = _readonly(offsets + slot_b)
+        self.passage_is_uturn = _readonly(slot_a == slot_b)
+        # how often a passage uses its edges (a u-turn uses the edge twice)
+        self.passage_multiplicity = _readonly(np.where(slot_a == slot_b, 2, 1))
+        self.passage_table = _readonly(table)
+
+    def _build_geometry(self):
+        src = self.coordinates[self.adjacency_sources]
+        dst = self.coordinates[self.adjacency_indices]
+        delta = dst - src
+        # direction of every directed edge in [0, 2pi)
+        self.dedge_directions = _readonly(
+            np.arctan2(delta[:, 1], delta[:, 0]) % (2 * np.pi)
+        )
+        p0 = self.coordinates[self.edges[:, 0]]
+        p1 = self.coordinates[self.edges[:, 1]]
+        self.edge_lengths = _readonly(
+            np.sqrt((p0[:, 0] - p1[:, 0]) ** 2 + (p0[:, 1] - p1[:, 1]) ** 2)
+        )
+        # turn angle of every passage: 0 for straight, pi for a u-turn
+        a = self.dedge_directions[self.passage_dedge_a]
+        b = self.dedge_directions[self.passage_dedge_b]
+        angle = np.minimum((a - b) % (2 * np.pi), (b - a) % (2 * np.pi))
+        self.passage_turn_angles = _readonly(np.pi - angle)
+
+    def __len__(self):
+        return len(self.vertices)
+
+    @property
+    def number_of_passages(self) -> int:
+        return len(self.passage_vertex)
+
+    @property
+    def number_of_edges(self) -> int:
+        return len(self.edges)
+
+    @property
+    def passages(self) -> typing.List[VertexPassage]:
+        """
+        The VertexPassage objects, indexed by passage id. Created on first use.
+        """
+        if self._passages is None:
+            vertices = self.vertices
+            self._passages = [
+                VertexPassage(vertices[v], end_a=vertices[a], end_b=vertices[b])
+                for v, a, b in zip(
+                    self.passage_vertex.tolist(),
+                    self.passage_end_a.tolist(),
+                    self.passage_end_b.tolist(),
+                )
+            ]
+        return self._passages
+
+    @property
+    def passage_ids(self) -> typing.Dict[VertexPassage, int]:
+        if self._passage_ids is None:
+            self._passage_ids = {vp: i for i, vp in enumerate(self.passages)}
+        return self._passage_ids
+
+    def coverage_matrix(self) -> sp.csr_matrix:
+        """
+        The vertex/passage incidence matrix (n x #passages). Row v sums up the
+        passages through v, i.e., the coverage of v.
+        """
+        if self._coverage_matrix is None:
+            p = self.number_of_passages
+            self._coverage_matrix = sp.csr_matrix(
+                (np.ones(p), (self.passage_vertex, np.arange(p))),
+                shape=(len(self), p),
+            )
+        return self._coverage_matrix
+
+    def flow_matrix(self) -> sp.csr_matrix:
+        """
+        The edge/passage incidence matrix (m x #passages). For the edge (v, w) with
+        v < w, row e counts the passages through v leaving to w positively and the
+        passages through w leaving to v negatively. U-turns leave twice.
+        A feasible cycle cover x satisfies `flow_matrix() @ x == 0`.
+        """
+        if self._flow_matrix is None:
+            p = self.number_of_passages
+            ids = np.arange(p)
+            rows = []
+            signs = []
+            for dedges in (self.passage_dedge_a, self.passage_dedge_b):
+                edges = self.adjacency_edges[dedges]
+                rows.append(edges)
+                forward = self.edges[edges, 0] == self.passage_vertex
+                signs.append(np.where(forward, 1.0, -1.0))
+            # duplicate entries (u-turns) are summed up
+            self._flow_matrix = sp.csr_matrix(
+                (np.concatenate(signs), (np.concatenate(rows), np.tile(ids, 2))),
+                shape=(self.number_of_edges, p),
+            )
+        return self._flow_matrix
+
+    def neighbors(self, v: PointVertex) -> typing.Tuple[PointVertex, ...]:
+        return self._neighbors[v]
+
+    def neighbor_ids(self, v: int) -> np.ndarray:
+        return self.adjacency_indices[
+            self.adjacency_indptr[v] : self.adjacency_indptr[v + 1]
+        ]
+
+    def slot(self, v: int, w: int) -> int:
+        """
+        The position of w in the neighbor list of v.
+        """
+        return self._slots[(v, w)]
+
+    def dedge(self, v: int, w: int) -> int:
+        """
+        The CSR position of the directed edge v->w.
+        """
+        return int(self.adjacency_indptr[v]) + self._slots[(v, w)]
+
+    def dedges(self, v: np.ndarray, w: np.ndarray) -> np.ndarray:
+        """
+        Vectorized `dedge`: the CSR positions of the directed edges v[i]->w[i].
+        """
+        keys = np.asarray(v, dtype=np.int64) * len(self) + np.asarray(w)
+        pos = np.searchsorted(self._dedge_keys, keys)
+        pos = np.minimum(pos, len(self._dedge_keys) - 1)
+        if len(keys) and np.any(self._dedge_keys[pos] != keys):
+            msg = "Not all vertex pairs are neighbors."
+            raise ValueError(msg)
+        return self._dedge_order[pos]
+
+    def edge_id(self, v: int, w: int) -> int:
+        return int(self.adjacency_edges[self.dedge(v, w)])
+
+    def passages_of_vertex(self, v: int) -> range:
+        return range(int(self.passage_indptr[v]), int(self.passage_indptr[v + 1]))
+
+    def passage_id(self, v: int, end_a: int, end_b: int) -> int:
+        return int(
+            self.passage_table[v, self._slots[(v, end_a)], self._slots[(v, end_b)]]
+        )
+
+    def passage_ids_of(
+        self, v: np.ndarray, end_a: np.ndarray, end_b: np.ndarray
+    ) -> np.ndarray:
+        """
+        Vectorized `passage_id`.
+        """
+        indptr = self.adjacency_indptr[v]
+        slot_a = self.dedges(v, end_a) - indptr
+        slot_b = self.dedges(v, end_b) - indptr
+        return self.passage_table[v, slot_a, slot_b]
+
+    def outgoing_passages(self, v: int, out: int) -> np.ndarray:
+        """
+        The ids of all passages through v that have an end at `out`.
+        """
+        return self.passage_table[v, self._slots[(v, out)], : self.degrees[v]]
+
+
+class CompiledInstance(CompiledGraph):
+    """
+    The compiled form of a PointBasedInstance. Use `PointBasedInstance.compiled()`
+    to obtain a cached version.
+    """
+
+    def __init__(self, instance):
+        super().__init__(instance.graph)
+        self.instance = instance
+        self.touring_costs = instance.touring_costs
+        self.coverage_necessities = instance.coverage_necessities
+        self._cheapest_cycle_costs: typing.Optional[np.ndarray] = None
+        self._penalty_candidates: typing.Optional[
+            typing.Tuple[np.ndarray, np.ndarray]
+        ] = None
+
+    def vertex_passage_costs(self, halving: bool = True) -> np.ndarray:
+        """
+        The costs of all passages, indexed by passage id.
+        """
+        return self.touring_costs.vertex_passage_costs(self, halving=halving)
+
+    def cheapest_cycle_costs(self) -> np.ndarray:
+        """
+        The costs of the cheapest cycle covering a vertex (indexed by vertex id): going
+        to the neighbor with the cheapest edge and back, with a u-turn at both ends.
+        Isolated vertices have infinite costs.
+        """
+        if self._cheapest_cycle_costs is None:
+            edge_costs = self.touring_costs.edge_distance_costs(self)
+            dedge_costs = edge_costs[self.adjacency_edges]
+            # sorted by vertex, then by costs. Equal costs keep the neighbor order.
+            order = np.lexsort((dedge_costs, self.adjacency_sources))
+            has_neighbors = self.degrees > 0
+            cheapest = order[self.adjacency_indptr[:-1][has_neighbors]]
+            uturn_costs = np.pi * self.touring_costs.vertex_turn_factors(self)
+            costs = np.full(len(self), np.inf)
+            costs[has_neighbors] = (
+                uturn_costs[has_neighbors]
+                + 2 * dedge_costs[cheapest]
+                + uturn_costs[self.adjacency_indices[cheapest]]
+            )
+            self._cheapest_cycle_costs = _readonly(costs)
+        return self._cheapest_cycle_costs
+
+    def penalty_candidates(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        The vertex ids and penalties for which a penalty variable is useful, i.e., the
+        penalty is cheaper than the cheapest cycle covering the vertex. The entries are
+        sorted by vertex id and keep the order of the penalty vectors.
+        """
+        if self._penalty_candidates is None:
+            vectors = [
+                self.coverage_necessities[v].penalty_vector for v in self.vertices
+            ]
+            counts = np.array([len(p) for p in vectors], dtype=np.int64)
+            vertex = np.repeat(np.arange(len(self)), counts)
+            penalties = np.fromiter(
+                itertools.chain.from_iterable(vectors),
+                dtype=float,
+                count=int(counts.sum()),
+            )
+            assert np.all(penalties > 0.0), "all penalties should be positive"
+            keep = penalties < self.cheapest_cycle_costs()[vertex]
+            self._penalty_candidates = (
+                _readonly(vertex[keep]),
+                _readonly(penalties[keep]),
+            )
+        return self._penalty_candidates
+
+
+class CompiledGraphTest(unittest.TestCase):
+    def _graph(self):
+        points = [PointVertex(x, y) for x, y in [(0, 0), (1, 0), (1, 1), (0, 1)]]
+        graph = nx.Graph()
+        graph.add_nodes_from(points)
+        graph.add_edges_from(
+            [(points[i], points[(i + 1) % 4]) for i in range(4)]
+            + [(points[0], points[2])]
+        )
+        return graph, points
+
+    def test_passages(self):
+        graph, points = self._graph()
+        cg = CompiledGraph(graph)
+        assert cg.number_of_passages == 8 + 2 * graph.number_of_edges()
+        for v in graph.nodes:
+            vid = cg.vertex_ids[v]
+            expected = [
+                VertexPassage(v, end_a=a, end_b=b)
+                for a, b in itertools.combinations_with_replacement(
+                    graph.neighbors(v), r=2
+                )
+            ]
+            assert [cg.passages[p] for p in cg.passages_of_vertex(vid)] == expected
+            for p in cg.passages_of_vertex(vid):
+                vp = cg.passages[p]
+                ids = (cg.vertex_ids[vp.end_a], cg.vertex_ids[vp.end_b])
+                assert cg.passage_id(vid, *ids) == p
+                assert cg.passage_id(vid, ids[1], ids[0]) == p
+        p = np.arange(cg.number_of_passages)
+        ids = cg.passage_ids_of(cg.passage_vertex, cg.passage_end_b, cg.passage_end_a)
+        assert ids.tolist() == p.tolist()
+        with self.assertRaises(ValueError):
+            cg.dedges(np.array([0]), np.array([0]))
+
+    def test_edges(self):
+        graph, points = self._graph()
+        cg = CompiledGraph(graph)
+        assert cg.number_of_edges == graph.number_of_edges()
+        for v, w in graph.edges:
+            vi, wi = cg.vertex_ids[v], cg.vertex_ids[w]
+            assert cg.edge_id(vi, wi) == cg.edge_id(wi, vi)
+            assert cg.adjacency_reverse[cg.dedge(vi, wi)] == cg.dedge(wi, vi)
+            assert sorted(cg.edges[cg.edge_id(vi, wi)]) == sorted((vi, wi))
+
+    def test_geometry(self):
+        graph, points = self._graph()
+        cg = CompiledGraph(graph)
+        for p, vp in enumerate(cg.passages):
+            self.assertAlmostEqual(cg.passage_turn_angles[p], vp.turn_angle())
+        for e, (v, w) in enumerate(cg.edges.tolist()):
+            vp = VertexPassage(cg.vertices[v], cg.vertices[w], cg.vertices[w])
+            self.assertAlmostEqual(cg.edge_lengths[e], 0.5 * vp.distance())
+
+    def test_matrices(self):
+        graph, points = self._graph()
+        cg = CompiledGraph(graph)
+        cov = cg.coverage_matrix()
+        flow = cg.flow_matrix()
+        self.assertEqual(cov.shape, (4, cg.number_of_passages))
+        self.assertEqual(flow.shape, (cg.number_of_edges, cg.number_of_passages))
+        # the passages of a triangle 0-1-2 form a cycle
+        ids = [cg.vertex_ids[p] for p in points[:3]]
+        x = np.zeros(cg.number_of_passages)
+        for i in range(3):
+            x[cg.passage_id(ids[i], ids[i - 1], ids[(i + 1) % 3])] = 1.0
+        assert np.all(flow @ x == 0)
+        assert list(cov @ x) == [1.0, 1.0, 1.0, 0.0]
+        # a single u-turn is not feasible
+        uturn = np.zeros(cg.number_of_passages)
+        uturn[cg.passage_id(ids[0], ids[1], ids[1])] = 1.0
+        assert abs(flow @ uturn).sum() == 2.0
+
+    def test_outgoing(self):
+        graph, points = self._graph()
+        cg = CompiledGraph(graph)
+        v, out = cg.vertex_ids[points[0]], cg.vertex_ids[points[1]]
+        outgoing = {cg.passages[p] for p in cg.outgoing_passages(v, out)}
+        assert outgoing == {
+            VertexPassage(points[0], end_a=points[1], end_b=n)
+            for n in graph.neighbors(points[0])
+        }
+
+
+class CompiledInstanceTest(unittest.TestCase):
+    def test_penalty_candidates(self):
+        from .coverage_necessity import CoverageNecessities, PenaltyCoverage
+        from .grid_instance import PointBasedInstance
+        from .muliplied_touring_costs import SimpleTouringCosts
+
+        points = [PointVertex(x, y) for x, y in [(0, 0), (2, 0), (2, 1), (0, 1)]]
+        graph = nx.Graph()
+        graph.add_nodes_from(points)
+        graph.add_edges_from([(points[i], points[(i + 1) % 4]) for i in range(4)])
+        tc = SimpleTouringCosts(turn_factor=1.0, distance_factor=1.0)
+        necessities = CoverageNecessities()
+        necessities[points[0]] = PenaltyCoverage(1.0)
+        necessities[points[1]] = PenaltyCoverage(100.0)
+        ci = PointBasedInstance(graph, tc, necessities).compiled()
+        costs = ci.cheapest_cycle_costs()
+        for v in points:
+            n = min(graph.neighbors(v), key=lambda n: tc.distance_cost_of_edge(v, n))
+            expected = (
+                tc.turn_cost_at_vertex(v, (n, n))
+                + 2 * tc.distance_cost_of_edge(v, n)
+                + tc.turn_cost_at_vertex(n, (v, v))
+            )
+            self.assertAlmostEqual(costs[ci.vertex_ids[v]], expected)
+        vertex_ids, penalties = ci.penalty_candidates()
+        assert list(vertex_ids) == [ci.vertex_ids[points[0]]]
+        assert list(penalties) == [1.0]
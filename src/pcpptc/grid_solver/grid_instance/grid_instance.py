@@ -1,5 +1,6 @@
 import networkx as nx
 
+from .compiled_instance import CompiledInstance
 from .coverage_necessity import CoverageNecessities
 from .muliplied_touring_costs import TouringCosts
 
@@ -22,3 +23,13 @@ class PointBasedInstance:
             raise ValueError(msg)
         self.touring_costs = touring_costs
         self.coverage_necessities = coverage_necessities
+        self._compiled = None
+
+    def compiled(self) -> CompiledInstance:
+        """
+        Returns the array-backed form of the instance. It is created on the first call
+        and cached afterwards, so do not modify the graph after solving started.
+        """
+        if self._compiled is None:
+            self._compiled = CompiledInstance(self)
+        return self._compiled
@@ -1,15 +1,30 @@
 import abc
 import typing
+import unittest
 
 import networkx as nx
+import numpy as np
 
 from pcpptc.utils import Point, distance, turn_angle
 
+from .compiled_instance import CompiledGraph
 from .point import PointVertex
 from .vertex_passage import VertexPassage
 
 
 class TouringCosts(abc.ABC):
+    def __init__(self):
+        # passage cost tables of the last compiled graph, see `vertex_passage_costs`
+        self._compiled: typing.Optional[CompiledGraph] = None
+        self._passage_costs: typing.Dict[bool, np.ndarray] = {}
+
+    def __getstate__(self):
+        # the cache refers to the whole compiled graph, e.g., of a process pool job
+        state = self.__dict__.copy()
+        state["_compiled"] = None
+        state["_passage_costs"] = {}
+        return state
+
     @abc.abstractmethod
     def vertex_passage_cost(
         self,
@@ -37,9 +52,78 @@ class TouringCosts(abc.ABC):
     def distance_cost_of_edge(self, p0: PointVertex, p1: PointVertex) -> float:
         pass
 
+    def vertex_turn_factors(self, compiled: CompiledGraph) -> np.ndarray:
+        """
+        The turn costs per radian at every vertex (indexed by vertex id).
+        Overwrite it with a vectorized version if possible.
+        """
+        return np.array(
+            [self.turn_cost_at_vertex(v, angle=1.0) for v in compiled.vertices],
+            dtype=float,
+        )
+
+    def edge_distance_costs(self, compiled: CompiledGraph) -> np.ndarray:
+        """
+        The distance costs of every edge (indexed by edge id).
+        Overwrite it with a vectorized version if possible.
+        """
+        vertices = compiled.vertices
+        return np.array(
+            [
+                self.distance_cost_of_edge(vertices[v], vertices[w])
+                for v, w in compiled.edges.tolist()
+            ],
+            dtype=float,
+        )
+
+    def vertex_passage_costs(
+        self, compiled: CompiledGraph, halving: bool = True
+    ) -> np.ndarray:
+        """
+        The costs of all vertex passages of a compiled graph (indexed by passage id).
+        The table is computed in one pass and cached. As long as no other compiled
+        graph is requested, `vertex_passage_cost` uses it for O(1) lookups.
+        """
+        if compiled is not self._compiled:
+            self._compiled = compiled
+            self._passage_costs = {}
+        if halving not in self._passage_costs:
+            turn_costs = (
+                self.vertex_turn_factors(compiled)[compiled.passage_vertex]
+                * compiled.passage_turn_angles
+            )
+            edge_costs = self.edge_distance_costs(compiled)
+            distance_costs = (
+                edge_costs[compiled.adjacency_edges[compiled.passage_dedge_a]]
+                + edge_costs[compiled.adjacency_edges[compiled.passage_dedge_b]]
+            )
+            if halving:
+                distance_costs *= 0.5
+            costs = distance_costs + turn_costs
+            costs.setflags(write=False)
+            self._passage_costs[halving] = costs
+        return self._passage_costs[halving]
+
+    def _cached_vertex_passage_cost(
+        self,
+        vp: VertexPassage,
+        halving: bool,
+        forced_orientation: typing.Optional[float],
+    ) -> typing.Optional[float]:
+        """
+        Returns the cost from the cached table or None if it has to be computed.
+        """
+        if self._compiled is None or forced_orientation is not None:
+            return None
+        i = self._compiled.passage_ids.get(vp)
+        if i is None:
+            return None
+        return float(self.vertex_passage_costs(self._compiled, halving)[i])
+
 
 class SimpleTouringCosts(TouringCosts):
     def __init__(self, turn_factor: float, distance_factor: float):
+        super().__init__()
         self.turn_factor = turn_factor
         self.distance_factor = distance_factor
 
@@ -49,6 +133,9 @@ class SimpleTouringCosts(TouringCosts):
         halving: bool = True,
         forced_orientation: typing.Optional[float] = None,
     ) -> float:
+        cached = self._cached_vertex_passage_cost(vp, halving, forced_orientation)
+        if cached is not None:
+            return cached
         turn_costs = self.turn_cost_at_vertex(
             vp.v, ends=vp.endpoints(), forced_orientation=forced_orientation
         )
@@ -92,9 +179,16 @@ class SimpleTouringCosts(TouringCosts):
         dist = distance(p0, p1)
         return self.distance_factor * dist
 
+    def vertex_turn_factors(self, compiled: CompiledGraph) -> np.ndarray:
+        return np.full(len(compiled), self.turn_factor, dtype=float)
+
+    def edge_distance_costs(self, compiled: CompiledGraph) -> np.ndarray:
+        return self.distance_factor * compiled.edge_lengths
+
 
 class MultipliedTouringCosts(TouringCosts):
     def __init__(self, graph: nx.Graph, turn_factor: float, distance_factor: float):
+        super().__init__()
         self.graph = graph
         self._turn_factor = turn_factor
         self._distance_factor = distance_factor
@@ -105,6 +199,9 @@ class MultipliedTouringCosts(TouringCosts):
         halving: bool = True,
         forced_orientation: typing.Optional[float] = None,
     ) -> float:
+        cached = self._cached_vertex_passage_cost(vp, halving, forced_orientation)
+        if cached is not None:
+            return cached
         turn_costs = self.turn_cost_at_vertex(
             vp.v, ends=vp.endpoints(), forced_orientation=forced_orientation
         )
@@ -149,3 +246,64 @@ class MultipliedTouringCosts(TouringCosts):
         multiplier = self.graph[p0][p1]["multiplier"]
         dist = distance(p0, p1)
         return self._distance_factor * multiplier * dist
+
+    def vertex_turn_factors(self, compiled: CompiledGraph) -> np.ndarray:
+        nodes = self.graph.nodes
+        multipliers = np.array(
+            [nodes[v]["multiplier"] for v in compiled.vertices], dtype=float
+        )
+        return multipliers * self._turn_factor
+
+    def edge_distance_costs(self, compiled: CompiledGraph) -> np.ndarray:
+        vertices = compiled.vertices
+        multipliers = np.array(
+            [
+                self.graph[vertices[v]][vertices[w]]["multiplier"]
+                for v, w in compiled.edges.tolist()
+            ],
+            dtype=float,
+        )
+        return self._distance_factor * multipliers * compiled.edge_lengths
+
+
+class VertexPassageCostTableTest(unittest.TestCase):
+    def test_table_matches_single_costs(self):
+        points = [PointVertex(x, y) for x, y in [(0, 0), (1, 0), (1, 1), (0, 2)]]
+        graph = nx.Graph()
+        graph.add_nodes_from(points, multiplier=1.0)
+        graph.nodes[points[1]]["multiplier"] = 3.0
+        for i in range(4):
+            graph.add_edge(points[i], points[(i + 1) % 4], multiplier=1.0)
+        graph.add_edge(points[0], points[2], multiplier=2.0)
+        compiled = CompiledGraph(graph)
+        for create in (
+            lambda: SimpleTouringCosts(turn_factor=2.0, distance_factor=1.5),
+            lambda: MultipliedTouringCosts(graph, turn_factor=2.0, distance_factor=1.5),
+        ):
+            for halving in (True, False):
+                # without a cached table, the costs are computed per passage
+                single = create()
+                expected = [
+                    single.vertex_passage_cost(vp, halving=halving)
+                    for vp in compiled.passages
+                ]
+                self.assertIsNone(single._compiled)
+                tc = create()
+                table = tc.vertex_passage_costs(compiled, halving=halving)
+                for a, b in zip(table, expected):
+                    self.assertAlmostEqual(a, b)
+                vp = compiled.passages[5]
+                self.assertEqual(tc.vertex_passage_cost(vp, halving), table[5])
+
+    def test_pickle_without_cache(self):
+        import pickle
+
+        graph = nx.Graph()
+        graph.add_edge(PointVertex(0, 0), PointVertex(1, 0))
+        tc = SimpleTouringCosts(turn_factor=2.0, distance_factor=1.5)
+        tc.vertex_passage_costs(CompiledGraph(graph))
+        copy = pickle.loads(pickle.dumps(tc))
+        self.assertIsNone(copy._compiled)
+        self.assertEqual(copy._passage_costs, {})
+        self.assertEqual(copy.turn_factor, 2.0)
+        self.assertIsNotNone(tc._compiled)
@@ -2,12 +2,16 @@ from .coverage_analysis import compute_coverage_area_of_tour, compute_grid_cover
 from .cycle_solution import Cycle, create_cycle_solution
 from .feasibility import is_feasible_cycle_cover
 from .fractional_solution import FractionalSolution
+from .sparse_fractional_solution import SparseFractionalSolution
+from .validation import Validation
 
 __all__ = [
     "FractionalSolution",
+    "SparseFractionalSolution",
     "Cycle",
     "create_cycle_solution",
     "is_feasible_cycle_cover",
+    "Validation",
     "compute_coverage_area_of_tour",
     "compute_grid_coverage_area",
 ]
@@ -3,6 +3,7 @@ import typing
 import unittest
 
 import networkx as nx
+import numpy as np
 
 from pcpptc.utils import distance, turn_angle
 
@@ -15,6 +16,8 @@ from .feasibility import (
     is_integral,
 )
 from .fractional_solution import FractionalSolution
+from .sparse_fractional_solution import SparseFractionalSolution
+from .validation import Validation
 
 
 class Cycle:
@@ -235,80 +238,122 @@ class CycleTest(unittest.TestCase):
         assert len(cc) == 1
         assert len(cc[0]) == 4
 
+    def test_sparse(self):
+        from ..grid_instance import CompiledGraph
 
-class VertexPassageSet:
+        ring = self.points(6)
+        fs = self.cycles_to_frac([ring, ring[:2] + [ring[2], ring[1]]])
+        graph = create_minimal_graph_from_solution(fs)
+        sparse = SparseFractionalSolution.from_fractional_solution(
+            CompiledGraph(graph), fs
+        )
+        for solution in (fs, sparse):
+            cc = create_cycle_solution(graph, solution, Validation())
+            assert len(cc) == 1
+            assert len(cc[0]) == 10
+
+    def test_not_integral(self):
+        points = self.points(2)
+        fs = self.cycles_to_frac([[points[0], points[1]]])
+        fs[VertexPassage(points[0], end_a=points[1], end_b=points[1])] = 0.5
+        with self.assertRaises(ValueError):
+            create_cycle_solution(create_minimal_graph_from_solution(fs), fs)
+
+    def test_zero_passages(self):
+        from ..grid_instance import CompiledGraph
+
+        points = self.points(3)
+        fs = self.cycles_to_frac([[points[0], points[1]]])
+        graph = create_minimal_graph_from_solution(fs)
+        graph.add_edge(points[1], points[2])
+        # rounded to zero, so no flow has to leave the edge to points[2]
+        fs[VertexPassage(points[1], end_a=points[0], end_b=points[2])] = 0.0
+        fs[VertexPassage(points[2], end_a=points[1], end_b=points[1])] = 0.05
+        sparse = SparseFractionalSolution.from_fractional_solution(
+            CompiledGraph(graph), fs
+        )
+        for solution in (fs, sparse):
+            cc = create_cycle_solution(graph, solution)
+            assert len(cc) == 1
+            assert len(cc[0]) == 2
+
+
+def decompose_into_cycles(
+    centers: np.ndarray, ends_a: np.ndarray, ends_b: np.ndarray, counts: np.ndarray
+) -> typing.List[typing.List[int]]:
     """
-    A multi-set of vertex passages from a solution.
-    The solution should be approximately integral (the maximal rounding can be specified).
-    Allows to iterate nicely through the passages.
+    Decomposes an integral, flow feasible multi-set of passages into closed walks in
+    linear time (Hierholzer). Passage i goes through the vertex `centers[i]` between
+    `ends_a[i]` and `ends_b[i]` (any integer vertex ids) and is used `counts[i]`
+    times. Walks that share a half-edge are merged into one. Returns the walks as
+    lists of passage indices.
+
+    The state of the walk is the half-edge (v, u) of arriving at v from u. All
+    passages at v with an end at u are in the bucket of this half-edge. A passage is
+    in two buckets (one for a u-turn) and removed lazily from the other bucket once
+    it is used up.
     """
-
-    def __init__(
-        self, graph: nx.Graph, fractional_solution: FractionalSolution, eps: float = 0.1
-    ):
-        self.graph = graph
-        self._counts = {}
-        for vp, x in fractional_solution:
-            n = round(x)
-            if abs(n - x) > eps:
-                msg = f"Cannot round {x}. Above epsilon."
-                raise ValueError(msg)
-            if n > 0:
-                self._counts[vp] = n
-
-    def pop(self, vp: VertexPassage) -> int:
-        n = self._counts[vp]
-        n -= 1
-        assert n >= 0, "Should always be positive"
-        if n == 0:
-            self._counts.pop(vp)
-        else:
-            self._counts[vp] = n
-        return n
-
-    def next(
-        self, current_vertex: PointVertex, previous_vertex: PointVertex
-    ) -> typing.Optional[PointVertex]:
-        if current_vertex == previous_vertex:
-            msg = "Current vertex cannot be previous."
+    n = int(max(centers.max(), ends_a.max(), ends_b.max())) + 1 if len(centers) else 0
+    keys_a = centers * n + ends_a
+    keys_b = centers * n + ends_b
+    keys = np.union1d(keys_a, keys_b)
+    half_a, half_b = np.searchsorted(keys, keys_a), np.searchsorted(keys, keys_b)
+    # the half-edge of the other side, reached after leaving to an end
+    opposite_a = np.searchsorted(keys, ends_a * n + centers)
+    opposite_b = np.searchsorted(keys, ends_b * n + centers)
+    for opposite, ends in ((opposite_a, ends_a), (opposite_b, ends_b)):
+        found = np.minimum(opposite, len(keys) - 1)
+        if np.any(keys[found] != ends * n + centers):
+            msg = "The passages are not flow feasible (an edge is used on one side)."
             raise ValueError(msg)
-        for v in self.graph.neighbors(current_vertex):
-            assert v != current_vertex, "Cannot be neighbord to itself"
-            vp = VertexPassage(v=current_vertex, end_a=previous_vertex, end_b=v)
-            if vp in self._counts:
-                return v
-        return None
-
-    def any_remaining(self) -> typing.Optional[VertexPassage]:
-        for vp, _x in self._counts.items():
-            return vp
-        return None
-
-    def is_empty(self) -> bool:
-        return len(self._counts) == 0
-
-
-def _collect_cycle(
-    remaining_passages: VertexPassageSet, v: PointVertex, prev: PointVertex
-) -> typing.Iterable[VertexPassage]:
-    start_v = v
-    start_prev = prev
-    while True:
-        n = remaining_passages.next(v, prev)
-        if n:
-            vp = VertexPassage(v=v, end_a=prev, end_b=n)
-            remaining_passages.pop(vp)
-            yield vp
-            prev = v
-            v = n
-        else:
-            assert prev == start_prev and v == start_v, "Should be a cycle"
-            assert remaining_passages.next(start_v, start_prev) is None
-            return
+    # buckets of the half-edges in CSR form
+    not_uturn = half_a != half_b
+    passages = np.arange(len(centers))
+    bucket_halves = np.concatenate([half_a, half_b[not_uturn]])
+    bucket_passages = np.concatenate([passages, passages[not_uturn]])
+    order = np.argsort(bucket_halves, kind="stable")
+    indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(bucket_halves, minlength=len(keys)), out=indptr[1:])
+
+    bucket = bucket_passages[order].tolist()
+    pointer = indptr[:-1].tolist()
+    bucket_end = indptr[1:].tolist()
+    remaining = np.asarray(counts, dtype=np.int64).tolist()
+    half_a, opposite_a, opposite_b = (
+        half_a.tolist(),
+        opposite_a.tolist(),
+        opposite_b.tolist(),
+    )
+    walks = []
+    for first in range(len(remaining)):
+        while remaining[first] > 0:
+            states = [half_a[first]]
+            used = [-1]
+            walk = []
+            while states:
+                h = states[-1]
+                i = pointer[h]
+                while i < bucket_end[h] and remaining[bucket[i]] == 0:
+                    i += 1
+                pointer[h] = i
+                if i == bucket_end[h]:
+                    states.pop()
+                    p = used.pop()
+                    if p >= 0:
+                        walk.append(p)
+                    continue
+                p = bucket[i]
+                remaining[p] -= 1
+                states.append(opposite_b[p] if h == half_a[p] else opposite_a[p])
+                used.append(p)
+            walks.append(walk)
+    return walks
 
 
 def create_cycle_solution(
-    graph: nx.Graph, fractional_solution: FractionalSolution
+    graph: nx.Graph,
+    fractional_solution: FractionalSolution,
+    validation: typing.Optional[Validation] = None,
 ) -> typing.List[Cycle]:
     """
     Create from a nearly-integral fractional solution a list of cycles.
@@ -322,48 +367,59 @@ def create_cycle_solution(
     ```
 
     It will not repeat vertices. You have to close the cycle_cover by yourself.
+    The solution can also be a SparseFractionalSolution, which skips the hashing of
+    the passages. According to `validation` (nothing by default), the solution is
+    checked to be a feasible cycle cover of the graph and the cycles to be connected
+    (expensive).
     """
-    remaining_passages = VertexPassageSet(graph, fractional_solution)
-    cycles = []
-    assert are_all_passages_between_neighbors(graph, fractional_solution)
-    assert is_flow_feasible(fractional_solution, raise_exception=True)
-    assert is_integral(fractional_solution)
-
-    while not remaining_passages.is_empty():
-        vp = remaining_passages.any_remaining()
-        stack = list(_collect_cycle(remaining_passages, vp.v, vp.end_b))
-        assert (
-            len(stack) >= 2
-        ), "Stack should be filled with at least two vertex passages"
-        assert (
-            remaining_passages.next(stack[0].v, stack[-1].v) is None
-        ), "Should not be greedily extensible"
-        cycle = []
-        while len(stack) >= 2:
-            # only happens rarely. Needs multi-coverage to happen which many instances don't need.
-            assert Cycle(cycle + stack[::-1]).is_connected()
-            subcycle = list(
-                _collect_cycle(remaining_passages, v=stack[-1].v, prev=stack[-2].v)
+    if validation is None:
+        validation = Validation("off")
+    validation.check(
+        "cycle_solution",
+        lambda: are_all_passages_between_neighbors(graph, fractional_solution)
+        and is_flow_feasible(fractional_solution, raise_exception=True)
+        and is_integral(fractional_solution),
+    )
+    if isinstance(fractional_solution, SparseFractionalSolution):
+        ids, values = fractional_solution.ids, fractional_solution.values
+    else:
+        passages, values = [], []
+        for vp, x in fractional_solution:
+            passages.append(vp)
+            values.append(x)
+        values = np.array(values, dtype=float)
+    counts = np.round(values)
+    if np.any(np.abs(counts - values) > 0.1):
+        msg = "Cannot round the solution. Above epsilon."
+        raise ValueError(msg)
+    # passages rounded to zero (or negative noise) are not used
+    used = counts > 0
+    counts = counts[used]
+    if isinstance(fractional_solution, SparseFractionalSolution):
+        compiled = fractional_solution.compiled
+        ids = ids[used]
+        centers = compiled.passage_vertex[ids]
+        ends_a = compiled.passage_end_a[ids]
+        ends_b = compiled.passage_end_b[ids]
+        all_passages = compiled.passages
+        passages = [all_passages[i] for i in ids.tolist()]
+    else:
+        passages = [vp for vp, u in zip(passages, used.tolist()) if u]
+        vertex_ids = {}
+
+        def ids_of(points) -> np.ndarray:
+            return np.array(
+                [vertex_ids.setdefault(p, len(vertex_ids)) for p in points],
+                dtype=np.int64,
             )
-            cycle.append(stack.pop())
-            assert Cycle(cycle + subcycle[::-1] + stack[::-1]).is_connected()
-            if subcycle:
-                assert Cycle(subcycle).is_connected()
-                for _i, vp in enumerate(subcycle):
-                    stack.append(vp)
-                assert Cycle(cycle + stack[::-1]).is_connected()
-                assert subcycle[-1] == stack[-1]
-                assert subcycle[-2] == stack[-2]
-            assert cycle[-1] in fractional_solution
-        if stack:
-            cycle.append(stack.pop())
-        assert len(stack) == 0, "Should be empty"
-        assert len(cycle) >= 2
-        cycle = Cycle(cycle)
-        assert cycle.is_connected(), "Created cycle_cover should be connected"
-        cycles.append(cycle)
-        assert all(
-            remaining_passages.next(cycle[i], cycle[i + 1]) is None
-            for i in range(len(cycle))
-        )
+
+        centers = ids_of(vp.v for vp in passages)
+        ends_a = ids_of(vp.end_a for vp in passages)
+        ends_b = ids_of(vp.end_b for vp in passages)
+    walks = decompose_into_cycles(centers, ends_a, ends_b, counts.astype(np.int64))
+    cycles = [Cycle([passages[i] for i in walk]) for walk in walks]
+    validation.check(
+        "cycles",
+        lambda: all(len(cycle) >= 2 and cycle.is_connected() for cycle in cycles),
+    )
     return cycles
@@ -2,6 +2,7 @@ import typing
 import unittest
 
 import networkx as nx
+import numpy as np
 
 from ..grid_instance.coverage_necessity import (
     CoverageNecessities,
@@ -15,6 +16,7 @@ from ..grid_instance.point import PointVertex
 from ..grid_instance.vertex_passage import VertexPassage
 from .create_minimal_instance import create_minimal_graph_from_solution
 from .fractional_solution import FractionalSolution
+from .sparse_fractional_solution import SparseFractionalSolution
 
 
 def _calculate_flow_at(
@@ -122,6 +124,23 @@ def is_feasible_cycle_cover(
             print("Solution uses illegal passages.")
             return False
         return True
+    if (
+        isinstance(solution, SparseFractionalSolution)
+        and solution.compiled.graph is instance.graph
+    ):
+        # passages are legal by construction
+        necessary = np.array(
+            [
+                instance.coverage_necessities[v].number_of_necessary_coverages()
+                for v in solution.compiled.vertices
+            ],
+            dtype=float,
+        )
+        return (
+            solution.is_integral(eps=1e-5)
+            and solution.is_flow_feasible()
+            and bool(np.all(solution.coverages() >= necessary))
+        )
     return (
         is_integral(solution)
         and is_flow_feasible(solution)
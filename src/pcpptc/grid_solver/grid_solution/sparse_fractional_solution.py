@@ -0,0 +1,285 @@
+"""
+An array-backed alternative to FractionalSolution. The usages are stored as a sparse
+vector over the passage ids of a CompiledGraph, such that summing up solutions or
+computing the coverage does not have to hash VertexPassage objects.
+"""
+
+import typing
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from ..grid_instance.compiled_instance import CompiledGraph
+from ..grid_instance.point import PointVertex
+from ..grid_instance.vertex_passage import VertexPassage
+from .fractional_solution import FractionalSolution
+
+
+class SparseFractionalSolution:
+    """
+    The usages of the passages of a compiled graph as sorted, unique passage ids
+    (`ids`) and their values (`values`). Values up to `eps` are dropped.
+    The object is immutable; adding and subtracting create new solutions.
+
+    It provides the reading part of the FractionalSolution API (iteration,
+    `sol[vp]`, `at_vertex`, `coverage`, ...), so it can be passed to most functions
+    expecting a FractionalSolution. Use `to_fractional_solution` for everything else.
+    """
+
+    eps = FractionalSolution.eps
+
+    def __init__(
+        self,
+        compiled: CompiledGraph,
+        ids: typing.Optional[np.ndarray] = None,
+        values: typing.Optional[np.ndarray] = None,
+    ):
+        """
+        `ids` may contain duplicates, their values are summed up.
+        """
+        self.compiled = compiled
+        if ids is None or len(ids) == 0:
+            self.ids = np.zeros(0, dtype=np.int64)
+            self.values = np.zeros(0, dtype=float)
+            return
+        ids, inverse = np.unique(np.asarray(ids, dtype=np.int64), return_inverse=True)
+        values = np.bincount(
+            inverse, weights=np.asarray(values, dtype=float), minlength=len(ids)
+        )
+        keep = values > self.eps
+        self.ids = ids[keep]
+        self.values = values[keep]
+
+    @classmethod
+    def from_dense(
+        cls, compiled: CompiledGraph, values: np.ndarray
+    ) -> "SparseFractionalSolution":
+        """
+        From a vector of values indexed by passage id, e.g., the values of an LP.
+        """
+        ids = np.flatnonzero(values > cls.eps)
+        return cls(compiled, ids, values[ids])
+
+    @classmethod
+    def from_fractional_solution(
+        cls, compiled: CompiledGraph, fractional_solution: FractionalSolution
+    ) -> "SparseFractionalSolution":
+        passage_ids = compiled.passage_ids
+        usages = list(fractional_solution)
+        ids = np.fromiter(
+            (passage_ids[vp] for vp, _x in usages), dtype=np.int64, count=len(usages)
+        )
+        values = np.fromiter((x for _vp, x in usages), dtype=float, count=len(usages))
+        return cls(compiled, ids, values)
+
+    @classmethod
+    def from_cycles(cls, compiled: CompiledGraph, cycles) -> "SparseFractionalSolution":
+        """
+        The sum of the passages of the cycles (`Cycle` objects).
+        """
+        passage_ids = compiled.passage_ids
+        ids = [passage_ids[vp] for cycle in cycles for vp in cycle.passages]
+        return cls(compiled, np.array(ids, dtype=np.int64), np.ones(len(ids)))
+
+    def to_fractional_solution(self) -> FractionalSolution:
+        fs = FractionalSolution()
+        passages = self.compiled.passages
+        for i, x in zip(self.ids.tolist(), self.values.tolist()):
+            fs[passages[i]] = x
+        return fs
+
+    def dense(self) -> np.ndarray:
+        """
+        The values of all passages, indexed by passage id.
+        """
+        values = np.zeros(self.compiled.number_of_passages)
+        values[self.ids] = self.values
+        return values
+
+    def _other(self, other) -> "SparseFractionalSolution":
+        if isinstance(other, FractionalSolution):
+            return SparseFractionalSolution.from_fractional_solution(
+                self.compiled, other
+            )
+        if other.compiled is not self.compiled:
+            msg = "Solutions belong to different compiled graphs."
+            raise ValueError(msg)
+        return other
+
+    def __add__(self, other) -> "SparseFractionalSolution":
+        other = self._other(other)
+        return SparseFractionalSolution(
+            self.compiled,
+            np.concatenate([self.ids, other.ids]),
+            np.concatenate([self.values, other.values]),
+        )
+
+    def __radd__(self, other) -> "SparseFractionalSolution":
+        if isinstance(other, int) and other == 0:  # allows `sum(solutions)`
+            return self
+        return self + other
+
+    def __sub__(self, other) -> "SparseFractionalSolution":
+        """
+        Like FractionalSolution, only the positive differences are kept.
+        """
+        other = self._other(other)
+        return SparseFractionalSolution(
+            self.compiled,
+            np.concatenate([self.ids, other.ids]),
+            np.concatenate([self.values, -other.values]),
+        )
+
+    def _position(self, vp: VertexPassage) -> int:
+        i = self.compiled.passage_ids.get(vp)
+        if i is None:
+            return -1
+        pos = int(np.searchsorted(self.ids, i))
+        if pos < len(self.ids) and self.ids[pos] == i:
+            return pos
+        return -1
+
+    def __getitem__(self, vp: VertexPassage) -> float:
+        pos = self._position(vp)
+        return float(self.values[pos]) if pos >= 0 else 0.0
+
+    def __contains__(self, item) -> bool:
+        return self._position(item) >= 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> typing.Iterable[typing.Tuple[VertexPassage, float]]:
+        """
+        Iterates over all non-zero vertex passages.
+        """
+        passages = self.compiled.passages
+        for i, x in zip(self.ids.tolist(), self.values.tolist()):
+            yield passages[i], x
+
+    def __eq__(self, other):
+        other = self._other(other)
+        if not np.array_equal(self.ids, other.ids):
+            # entries up to eps may be missing on one side
+            diff = (self - other) + (other - self)
+            return len(diff) == 0
+        return bool(np.all(np.abs(self.values - other.values) <= self.eps))
+
+    def _vertex_slice(self, v: int) -> slice:
+        indptr = self.compiled.passage_indptr
+        begin, end = np.searchsorted(self.ids, [indptr[v], indptr[v + 1]])
+        return slice(int(begin), int(end))
+
+    def at_vertex(self, pv: PointVertex) -> typing.Dict[VertexPassage, float]:
+        s = self._vertex_slice(self.compiled.vertex_ids[pv])
+        passages = self.compiled.passages
+        return {
+            passages[i]: x
+            for i, x in zip(self.ids[s].tolist(), self.values[s].tolist())
+        }
+
+    def coverages(self) -> np.ndarray:
+        """
+        The coverage of every vertex, indexed by vertex id. As the passages of a vertex
+        have consecutive ids, this is a segment sum over the sorted entries.
+        """
+        return np.bincount(
+            self.compiled.passage_vertex[self.ids],
+            weights=self.values,
+            minlength=len(self.compiled),
+        )
+
+    def coverage(self, v: PointVertex) -> float:
+        return float(self.values[self._vertex_slice(self.compiled.vertex_ids[v])].sum())
+
+    def vertices(self) -> typing.List[PointVertex]:
+        vertices = self.compiled.vertices
+        return [vertices[v] for v in np.unique(self.compiled.passage_vertex[self.ids])]
+
+    def angle_sum(self) -> float:
+        """
+        Return the sum of turn angles of the solution.
+        """
+        return float(self.values @ self.compiled.passage_turn_angles[self.ids])
+
+    def length(self) -> float:
+        """
+        Returns the length of the solution
+        """
+        cg = self.compiled
+        edge_lengths = cg.edge_lengths[cg.adjacency_edges]  # per directed edge
+        distances = (
+            edge_lengths[cg.passage_dedge_a[self.ids]]
+            + edge_lengths[cg.passage_dedge_b[self.ids]]
+        )
+        return float(0.5 * (self.values @ distances))
+
+    def is_integral(self, eps=0.01) -> bool:
+        return bool(np.all(np.abs(np.round(self.values) - self.values) <= eps))
+
+    def is_flow_feasible(self, eps=1e-5) -> bool:
+        """
+        Checks if every edge has the same amount of incoming and outgoing passages.
+        """
+        flow = self.compiled.flow_matrix()[:, self.ids] @ self.values
+        return bool(np.all(np.abs(flow) <= eps))
+
+
+class SparseFractionalSolutionTest(unittest.TestCase):
+    def _graph(self):
+        points = [PointVertex(x, y) for x, y in [(0, 0), (1, 0), (1, 1), (0, 1)]]
+        graph = nx.Graph()
+        graph.add_nodes_from(points)
+        graph.add_edges_from([(points[i], points[(i + 1) % 4]) for i in range(4)])
+        return CompiledGraph(graph), points
+
+    def _square(self, points) -> FractionalSolution:
+        fs = FractionalSolution()
+        for i in range(4):
+            fs[VertexPassage(points[i], points[i - 1], points[(i + 1) % 4])] = 1.0
+        return fs
+
+    def test_conversion(self):
+        cg, points = self._graph()
+        fs = self._square(points)
+        sfs = SparseFractionalSolution.from_fractional_solution(cg, fs)
+        assert len(sfs) == 4
+        assert sfs.to_fractional_solution() == fs
+        assert sfs == fs
+        assert SparseFractionalSolution.from_dense(cg, sfs.dense()) == sfs
+        self.assertAlmostEqual(sfs.length(), fs.length())
+        self.assertAlmostEqual(sfs.angle_sum(), fs.angle_sum())
+
+    def test_arithmetic(self):
+        cg, points = self._graph()
+        fs = self._square(points)
+        sfs = SparseFractionalSolution.from_fractional_solution(cg, fs)
+        double = sum([sfs, sfs])
+        assert double == fs + fs
+        assert list(double.coverages()) == [2.0, 2.0, 2.0, 2.0]
+        assert double.coverage(points[0]) == 2.0
+        assert (double - sfs) == sfs
+        assert len(sfs - double) == 0
+        uturn = VertexPassage(points[0], points[1], points[1])
+        half = sfs + SparseFractionalSolution(
+            cg, [cg.passage_ids[uturn]], np.array([0.5])
+        )
+        assert half[uturn] == 0.5
+        assert uturn in half
+        assert uturn not in sfs
+        assert len(half.at_vertex(points[0])) == 2
+
+    def test_feasibility(self):
+        cg, points = self._graph()
+        sfs = SparseFractionalSolution.from_fractional_solution(
+            cg, self._square(points)
+        )
+        assert sfs.is_integral()
+        assert sfs.is_flow_feasible()
+        uturn = VertexPassage(points[0], points[1], points[1])
+        broken = sfs + SparseFractionalSolution(
+            cg, [cg.passage_ids[uturn]], np.array([0.5])
+        )
+        assert not broken.is_integral()
+        assert not broken.is_flow_feasible()
@@ -0,0 +1,86 @@
+"""
+Validation of the intermediate solutions of the grid solver. The checks are full
+passes over the instance, so how much is checked is configurable.
+"""
+
+import typing
+import unittest
+from collections import Counter
+
+from ..grid_instance import PointBasedInstance
+from .feasibility import is_feasible_cycle_cover
+from .fractional_solution import FractionalSolution
+
+VALIDATION_LEVELS = ("off", "sampled", "full")
+
+
+class Validation:
+    """
+    The validation level of the solver:
+    - "off": Nothing is checked (production).
+    - "sampled": Only the first and then every `sample_every`-th check of each kind.
+    - "full": Everything is checked (tests/CI).
+    A failed check raises an AssertionError, independent of `python -O`.
+    """
+
+    def __init__(self, level: str = "full", sample_every: int = 10):
+        if level not in VALIDATION_LEVELS:
+            msg = f"Unknown validation level '{level}', use one of {VALIDATION_LEVELS}."
+            raise ValueError(msg)
+        if sample_every < 1:
+            msg = "sample_every has to be positive."
+            raise ValueError(msg)
+        self.level = level
+        self.sample_every = sample_every
+        self._calls = Counter()
+
+    def active(self, kind: str) -> bool:
+        """
+        Returns True if the next check of this kind should be done.
+        """
+        if self.level == "off":
+            return False
+        if self.level == "full":
+            return True
+        self._calls[kind] += 1
+        return (self._calls[kind] - 1) % self.sample_every == 0
+
+    def check(self, kind: str, condition: typing.Callable[[], bool]):
+        """
+        Evaluates the condition only if the check is active.
+        """
+        if self.active(kind) and not condition():
+            msg = f"Validation '{kind}' failed."
+            raise AssertionError(msg)
+
+    def check_cycle_cover(
+        self, kind: str, instance: PointBasedInstance, solution: FractionalSolution
+    ):
+        self.check(kind, lambda: is_feasible_cycle_cover(instance, solution))
+
+    def __repr__(self):
+        return f"Validation({self.level})"
+
+
+class ValidationTest(unittest.TestCase):
+    def test_levels(self):
+        assert not any(Validation("off").active("a") for _ in range(5))
+        assert all(Validation("full").active("a") for _ in range(5))
+        sampled = Validation("sampled", sample_every=3)
+        assert [sampled.active("a") for _ in range(7)] == [
+            True,
+            False,
+            False,
+            True,
+            False,
+            False,
+            True,
+        ]
+        assert sampled.active("b")
+        with self.assertRaises(ValueError):
+            Validation("sometimes")
+
+    def test_check(self):
+        Validation("off").check("a", lambda: False)
+        with self.assertRaises(AssertionError):
+            Validation("full").check("a", lambda: False)
@@ -1,3 +1,4 @@
+import typing
 from dataclasses import dataclass
 
 from .cycle_connecting import connect_cycles_via_pcst
@@ -6,7 +7,8 @@ from .cycle_cover.solver import CycleCoverSolver, CycleCoverSolverCallbacks
 from .grid_instance import PointBasedInstance
 from .grid_solution import (
     Cycle,
-    FractionalSolution,
+    SparseFractionalSolution,
+    Validation,
     create_cycle_solution,
     is_feasible_cycle_cover,
 )
@@ -29,10 +31,23 @@ class GridSolverParameter:
     r: int = 2
     adaptive: bool = True
     integralize: int = 50
+    integralize_workers: int = 1  # processes for solving the BnB nodes in parallel
+    integralize_parallel_nodes: int = 1  # open BnB nodes branched at once
+    matching_candidates: typing.Optional[int] = None  # transitions per strip end
+    matching_tile_size: typing.Optional[float] = None  # match in tiles of this size
+    matching_workers: int = 1  # processes for matching the tiles
+    strip_workers: int = 1  # workers for selecting the atomic strips
+    strip_executor: str = "process"  # "thread" or "process"
     cc_opt_steps: int = 25
     cc_opt_size: int = 50
     t_opt_steps: int = 25
     t_opt_size: int = 50
+    pcst_bounded_connections: bool = False  # search connections up to the prizes
+    pcst_max_connections: typing.Optional[int] = None  # connections per cycle
+    pcst_engine: str = "mip"  # "mip", "approx" (pcst_fast), or "hybrid"
+    pcst_time_limit: typing.Optional[float] = 60.0  # seconds for the hybrid MIP
+    lp_backend: str = "gurobi"  # "gurobi" or "highs", see `lp_backend.LP_BACKENDS`
+    validation: str = "full"  # "off" (production), "sampled", or "full" (CI)
     callbacks: GridSolverCallbacks = GridSolverCallbacks()
 
 
@@ -44,15 +59,34 @@ class GridSolver:
 
     def __init__(self, **kwargs):
         self.params = GridSolverParameter(**kwargs)
+        self.validation = Validation(self.params.validation)
         self.cc_solver = CycleCoverSolver(
             k=self.params.k,
             r=self.params.r,
             adaptive_strips=self.params.adaptive,
             integralize=self.params.integralize,
             callbacks=self.params.callbacks.cc_callbacks,
+            lp_backend=self.params.lp_backend,
+            integralize_workers=self.params.integralize_workers,
+            integralize_parallel_nodes=self.params.integralize_parallel_nodes,
+            matching_candidates=self.params.matching_candidates,
+            matching_tile_size=self.params.matching_tile_size,
+            matching_workers=self.params.matching_workers,
+            strip_workers=self.params.strip_workers,
+            strip_executor=self.params.strip_executor,
+        )
+        self.cc_optimizer = CcLns(
+            self.params.cc_opt_size,
+            self.params.cc_opt_steps,
+            lp_backend=self.params.lp_backend,
+            validation=self.validation,
+        )
+        self.tour_optimizer = TourLns(
+            self.params.t_opt_size,
+            self.params.t_opt_steps,
+            lp_backend=self.params.lp_backend,
+            validation=self.validation,
         )
-        self.cc_optimizer = CcLns(self.params.cc_opt_size, self.params.cc_opt_steps)
-        self.tour_optimizer = TourLns(self.params.t_opt_size, self.params.t_opt_steps)
 
     def __str__(self):
         return f"GridSolver({self.params})"
@@ -80,12 +114,24 @@ class GridSolver:
         )
         cc = self.cc_solver.optimize(instance)
         cc = self.cc_optimizer.optimize(instance, cc)
-        cc = create_cycle_solution(instance.graph, cc)
-        assert is_feasible_cycle_cover(
+        cc = create_cycle_solution(instance.graph, cc, validation=self.validation)
+        self.validation.check(
+            "cycle_cover",
+            lambda: is_feasible_cycle_cover(
+                instance,
+                SparseFractionalSolution.from_cycles(instance.compiled(), cc),
+            ),
+        )
+        tour = connect_cycles_via_pcst(
             instance,
-            sum((c.to_fractional_solution() for c in cc), FractionalSolution()),
+            cc,
+            self.params.lp_backend,
+            validation=self.validation,
+            bounded_connections=self.params.pcst_bounded_connections,
+            max_connections=self.params.pcst_max_connections,
+            pcst_engine=self.params.pcst_engine,
+            pcst_time_limit=self.params.pcst_time_limit,
         )
-        tour = connect_cycles_via_pcst(instance, cc)
         if not tour:
             print("Result is empty tour.")
             opportunity_loss = sum(
@@ -94,11 +140,15 @@ class GridSolver:
             )
             self.params.callbacks.on_grid_solution(None, 0.0, opportunity_loss)
             return Cycle([])
-        assert is_feasible_cycle_cover(instance, tour.to_fractional_solution())
+        self.validation.check_cycle_cover(
+            "tour", instance, tour.to_fractional_solution()
+        )
         # cc = create_cycle_solution(instance.graph, tour)
         # assert len(cc)==1
         tour_fs = self.tour_optimizer.optimize(instance, tour.to_fractional_solution())
-        tour = create_cycle_solution(instance.graph, tour_fs)
+        tour = create_cycle_solution(
+            instance.graph, tour_fs, validation=self.validation
+        )
         assert len(tour) <= 1
         tour = tour[0] if tour else Cycle([])
         touring_costs = sum(
@@ -0,0 +1,34 @@
+"""
+Solver-agnostic (mixed integer) linear programming for the grid solver.
+The fractional LP, its branch and bound, the LNS MIPs, and the PCST MIP only use
+`LpModel`, such that Gurobi can be replaced by the open-source solver HiGHS.
+"""
+
+from .gurobi_model import GurobiModel
+from .highs_model import HighsModel
+from .model import EQUAL, GREATER_EQUAL, LESS_EQUAL, Basis, LpModel
+
+LP_BACKENDS = {"gurobi": GurobiModel, "highs": HighsModel}
+
+
+def create_lp_model(backend: str = "gurobi", name: str = "lp") -> LpModel:
+    """
+    Creates an empty model of the given backend ("gurobi" or "highs").
+    """
+    if backend not in LP_BACKENDS:
+        msg = f"Unknown LP backend '{backend}'. Use one of {list(LP_BACKENDS)}."
+        raise ValueError(msg)
+    return LP_BACKENDS[backend](name)
+
+
+__all__ = [
+    "LpModel",
+    "Basis",
+    "GurobiModel",
+    "HighsModel",
+    "LP_BACKENDS",
+    "create_lp_model",
+    "LESS_EQUAL",
+    "GREATER_EQUAL",
+    "EQUAL",
+]
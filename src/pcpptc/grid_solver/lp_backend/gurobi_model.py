@@ -0,0 +1,159 @@
+import math
+import typing
+
+import numpy as np
+import scipy.sparse as sp
+
+from .model import EQUAL, GREATER_EQUAL, Basis, LpModel, Values
+
+
+class GurobiModel(LpModel):
+    """
+    LpModel based on gurobipy. Requires a Gurobi license for larger models.
+    """
+
+    def __init__(self, name: str = "lp"):
+        import gurobipy as gp
+
+        self._gp = gp
+        self.model = gp.Model(name)
+        self.model.setParam("OutputFlag", 0)
+        self._vars = []
+        self._constrs = []  # indexed by handle, None if removed
+
+    def _select(self, columns) -> list:
+        if columns is None:
+            return self._vars
+        return [self._vars[i] for i in columns]
+
+    def add_variables(
+        self,
+        n: int,
+        lb: Values = 0.0,
+        ub: Values = math.inf,
+        obj: Values = 0.0,
+        integer: bool = False,
+    ) -> np.ndarray:
+        GRB = self._gp.GRB
+        vtype = GRB.INTEGER if integer else GRB.CONTINUOUS
+        ub = np.minimum(ub, GRB.INFINITY)
+        variables = self.model.addMVar(n, lb=lb, ub=ub, obj=obj, vtype=vtype)
+        columns = np.arange(len(self._vars), len(self._vars) + n)
+        self._vars.extend(variables.tolist())
+        return columns
+
+    def add_constraints(
+        self,
+        matrix: sp.spmatrix,
+        sense: str,
+        rhs: Values,
+        columns: typing.Optional[typing.Sequence[int]] = None,
+    ) -> np.ndarray:
+        self._check_sense(sense)
+        GRB = self._gp.GRB
+        if sense == EQUAL:
+            grb_sense = GRB.EQUAL
+        elif sense == GREATER_EQUAL:
+            grb_sense = GRB.GREATER_EQUAL
+        else:
+            grb_sense = GRB.LESS_EQUAL
+        if columns is None:
+            variables = self._vars[: matrix.shape[1]]
+        else:
+            variables = self._select(columns)
+        rhs = np.broadcast_to(np.asarray(rhs, dtype=float), (matrix.shape[0],))
+        constrs = self.model.addMConstr(
+            sp.csr_matrix(matrix), variables, grb_sense, rhs
+        ).tolist()
+        handles = np.arange(len(self._constrs), len(self._constrs) + len(constrs))
+        self._constrs.extend(constrs)
+        return handles
+
+    def remove_constraints(self, handles: typing.Sequence[int]):
+        constrs = [self._constrs[h] for h in handles]
+        for h in handles:
+            self._constrs[h] = None
+        self.model.remove(constrs)
+
+    def set_bounds(self, columns: typing.Sequence[int], lb: Values, ub: Values):
+        variables = self._select(columns)
+        n = len(variables)
+        ub = np.minimum(ub, self._gp.GRB.INFINITY)
+        self.model.setAttr("LB", variables, np.broadcast_to(lb, (n,)).tolist())
+        self.model.setAttr("UB", variables, np.broadcast_to(ub, (n,)).tolist())
+
+    def set_objective(self, columns: typing.Sequence[int], coefficients: Values):
+        variables = self._select(columns)
+        values = np.broadcast_to(coefficients, (len(variables),)).tolist()
+        self.model.setAttr("Obj", variables, values)
+
+    def set_start(self, columns: typing.Sequence[int], values: Values):
+        variables = self._select(columns)
+        values = np.broadcast_to(values, (len(variables),)).tolist()
+        self.model.setAttr("Start", variables, values)
+
+    def optimize(self):
+        self.model.optimize()
+
+    def is_optimal(self) -> bool:
+        return self.model.Status == self._gp.GRB.OPTIMAL
+
+    def is_infeasible(self) -> bool:
+        GRB = self._gp.GRB
+        return self.model.Status in (GRB.INFEASIBLE, GRB.INF_OR_UNBD)
+
+    def set_iteration_limit(self, limit: typing.Optional[int]):
+        if limit is None:
+            self.model.setParam("IterationLimit", self._gp.GRB.INFINITY)
+            self.model.setParam("Method", -1)  # automatic
+        else:
+            self.model.setParam("IterationLimit", limit)
+            self.model.setParam("Method", 1)  # dual simplex
+
+    def set_time_limit(self, seconds: typing.Optional[float]):
+        if seconds is None:
+            seconds = self._gp.GRB.INFINITY
+        self.model.setParam("TimeLimit", seconds)
+
+    def has_solution(self) -> bool:
+        return self.model.SolCount > 0
+
+    def objective_value(self) -> float:
+        return self.model.ObjVal
+
+    def dual_bound(self) -> typing.Optional[float]:
+        if self.is_optimal():
+            return self.model.ObjVal
+        GRB = self._gp.GRB
+        if self.model.Status not in (GRB.ITERATION_LIMIT, GRB.TIME_LIMIT):
+            return None
+        try:
+            bound = self.model.ObjBound
+        except self._gp.GurobiError:
+            return None  # e.g., stopped before a dual feasible basis
+        return bound if math.isfinite(bound) else None
+
+    def values(
+        self, columns: typing.Optional[typing.Sequence[int]] = None
+    ) -> np.ndarray:
+        return np.array(self.model.getAttr("X", self._select(columns)), dtype=float)
+
+    def reduced_costs(
+        self, columns: typing.Optional[typing.Sequence[int]] = None
+    ) -> np.ndarray:
+        return np.array(self.model.getAttr("RC", self._select(columns)), dtype=float)
+
+    def _alive_constrs(self) -> list:
+        return [c for c in self._constrs if c is not None]
+
+    def get_basis(self) -> typing.Optional[Basis]:
+        try:
+            vbasis = self.model.getAttr("VBasis", self._vars)
+            cbasis = self.model.getAttr("CBasis", self._alive_constrs())
+        except self._gp.GurobiError:
+            return None  # e.g., not solved by simplex
+        return np.array(vbasis, dtype=np.int8), np.array(cbasis, dtype=np.int8)
+
+    def set_basis(self, basis: Basis):
+        self.model.setAttr("VBasis", self._vars, basis[0].tolist())
+        self.model.setAttr("CBasis", self._alive_constrs(), basis[1].tolist())
@@ -0,0 +1,215 @@
+import math
+import typing
+
+import numpy as np
+import scipy.sparse as sp
+
+from .model import EQUAL, GREATER_EQUAL, Basis, LpModel, Values
+
+
+class HighsModel(LpModel):
+    """
+    LpModel based on the open-source solver HiGHS (`pip install highspy`).
+    Changes of bounds and constraints keep the last basis, such that resolving
+    starts warm.
+    """
+
+    def __init__(self, name: str = "lp"):
+        import highspy
+
+        self._highspy = highspy
+        self.name = name
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue("output_flag", False)
+        self._num_cols = 0
+        self._is_mip = False
+        self._start: typing.Dict[int, float] = {}
+        # current row index of every handle, -1 if removed
+        self._rows = np.zeros(0, dtype=np.int64)
+
+    def _columns(self, columns) -> np.ndarray:
+        if columns is None:
+            return np.arange(self._num_cols, dtype=np.int32)
+        return np.asarray(columns, dtype=np.int32).reshape(-1)
+
+    def add_variables(
+        self,
+        n: int,
+        lb: Values = 0.0,
+        ub: Values = math.inf,
+        obj: Values = 0.0,
+        integer: bool = False,
+    ) -> np.ndarray:
+        def array(values):
+            return np.array(np.broadcast_to(values, (n,)), dtype=np.float64)
+
+        empty_int = np.zeros(0, dtype=np.int32)
+        self.highs.addCols(
+            n, array(obj), array(lb), array(ub), 0, empty_int, empty_int, np.zeros(0)
+        )
+        columns = np.arange(self._num_cols, self._num_cols + n)
+        self._num_cols += n
+        if integer and n > 0:
+            self._is_mip = True
+            self.highs.changeColsIntegrality(
+                n,
+                columns.astype(np.int32),
+                np.array([self._highspy.HighsVarType.kInteger] * n),
+            )
+        return columns
+
+    def add_constraints(
+        self,
+        matrix: sp.spmatrix,
+        sense: str,
+        rhs: Values,
+        columns: typing.Optional[typing.Sequence[int]] = None,
+    ) -> np.ndarray:
+        self._check_sense(sense)
+        matrix = sp.csr_matrix(matrix)
+        matrix.sum_duplicates()
+        k = matrix.shape[0]
+        rhs = np.array(np.broadcast_to(rhs, (k,)), dtype=np.float64)
+        if sense == EQUAL:
+            lower, upper = rhs, rhs
+        elif sense == GREATER_EQUAL:
+            lower, upper = rhs, np.full(k, math.inf)
+        else:
+            lower, upper = np.full(k, -math.inf), rhs
+        indices = matrix.indices
+        if columns is not None:
+            indices = np.asarray(columns)[indices]
+        self.highs.addRows(
+            k,
+            lower,
+            upper,
+            matrix.nnz,
+            matrix.indptr[:-1].astype(np.int32),
+            indices.astype(np.int32),
+            matrix.data.astype(np.float64),
+        )
+        first_row = self.highs.getNumRow() - k
+        handles = np.arange(len(self._rows), len(self._rows) + k)
+        self._rows = np.concatenate([self._rows, np.arange(first_row, first_row + k)])
+        return handles
+
+    def remove_constraints(self, handles: typing.Sequence[int]):
+        handles = np.asarray(handles, dtype=np.int64)
+        rows = np.sort(self._rows[handles])
+        if np.any(rows < 0):
+            msg = "Constraint has already been removed."
+            raise KeyError(msg)
+        self.highs.deleteRows(len(rows), rows.astype(np.int32))
+        self._rows[handles] = -1
+        alive = self._rows >= 0
+        # rows behind deleted rows move forward
+        self._rows[alive] -= np.searchsorted(rows, self._rows[alive])
+
+    def set_bounds(self, columns: typing.Sequence[int], lb: Values, ub: Values):
+        columns = self._columns(columns)
+        n = len(columns)
+        self.highs.changeColsBounds(
+            n,
+            columns,
+            np.array(np.broadcast_to(lb, (n,)), dtype=np.float64),
+            np.array(np.broadcast_to(ub, (n,)), dtype=np.float64),
+        )
+
+    def set_objective(self, columns: typing.Sequence[int], coefficients: Values):
+        columns = self._columns(columns)
+        n = len(columns)
+        self.highs.changeColsCost(
+            n, columns, np.array(np.broadcast_to(coefficients, (n,)), dtype=np.float64)
+        )
+
+    def set_start(self, columns: typing.Sequence[int], values: Values):
+        columns = self._columns(columns)
+        values = np.broadcast_to(values, (len(columns),))
+        self._start.update(zip(columns.tolist(), values.tolist()))
+
+    def optimize(self):
+        if self._is_mip and self._start:
+            columns = np.array(list(self._start.keys()), dtype=np.int32)
+            values = np.array(list(self._start.values()), dtype=np.float64)
+            self.highs.setSolution(len(columns), columns, values)
+        self.highs.run()
+
+    def is_optimal(self) -> bool:
+        return self.highs.getModelStatus() == self._highspy.HighsModelStatus.kOptimal
+
+    def is_infeasible(self) -> bool:
+        return self.highs.getModelStatus() == self._highspy.HighsModelStatus.kInfeasible
+
+    def set_iteration_limit(self, limit: typing.Optional[int]):
+        # HiGHS solves LPs by the dual simplex by default
+        if limit is None:
+            limit = 2**31 - 1  # the default of HiGHS
+        self.highs.setOptionValue("simplex_iteration_limit", limit)
+
+    def set_time_limit(self, seconds: typing.Optional[float]):
+        if seconds is None:
+            seconds = float("inf")  # the default of HiGHS
+        self.highs.setOptionValue("time_limit", float(seconds))
+
+    def has_solution(self) -> bool:
+        feasible = self._highspy.SolutionStatus.kSolutionStatusFeasible
+        status = self.highs.getInfo().primal_solution_status
+        return int(status) == int(feasible)  # an enum or an int, by version
+
+    def objective_value(self) -> float:
+        return self.highs.getInfo().objective_function_value
+
+    def dual_bound(self) -> typing.Optional[float]:
+        if self.is_optimal():
+            return self.objective_value()
+        status = self._highspy.HighsModelStatus
+        if self.highs.getModelStatus() not in (
+            status.kIterationLimit,
+            status.kTimeLimit,
+        ):
+            return None
+        info = self.highs.getInfo()
+        if self._is_mip:
+            bound = info.mip_dual_bound
+        else:
+            # the objective of a dual feasible basis is a lower bound
+            feasible = self._highspy.SolutionStatus.kSolutionStatusFeasible
+            if int(info.dual_solution_status) != int(feasible):
+                return None
+            bound = info.objective_function_value
+        return bound if math.isfinite(bound) else None
+
+    def values(
+        self, columns: typing.Optional[typing.Sequence[int]] = None
+    ) -> np.ndarray:
+        values = np.array(self.highs.getSolution().col_value, dtype=float)
+        if columns is None:
+            return values
+        return values[np.asarray(columns, dtype=np.int64)]
+
+    def reduced_costs(
+        self, columns: typing.Optional[typing.Sequence[int]] = None
+    ) -> np.ndarray:
+        duals = np.array(self.highs.getSolution().col_dual, dtype=float)
+        if columns is None:
+            return duals
+        return duals[np.asarray(columns, dtype=np.int64)]
+
+    def get_basis(self) -> typing.Optional[Basis]:
+        basis = self.highs.getBasis()
+        if not basis.valid:
+            return None
+        return (
+            np.array(list(map(int, basis.col_status)), dtype=np.int8),
+            np.array(list(map(int, basis.row_status)), dtype=np.int8),
+        )
+
+    def set_basis(self, basis: Basis):
+        status = self._highspy.HighsBasisStatus
+        # indexed by the value of the status
+        statuses = sorted(status.__members__.values(), key=int)
+        highs_basis = self._highspy.HighsBasis()
+        highs_basis.col_status = list(map(statuses.__getitem__, basis[0].tolist()))
+        highs_basis.row_status = list(map(statuses.__getitem__, basis[1].tolist()))
+        highs_basis.valid = True
+        self.highs.setBasis(highs_basis)
@@ -0,0 +1,84 @@
+import math
+import unittest
+
+import scipy.sparse as sp
+
+from . import EQUAL, GREATER_EQUAL, LESS_EQUAL, LP_BACKENDS, create_lp_model
+
+
+class LpBackendTest(unittest.TestCase):
+    def _test_lp(self, backend: str):
+        # min x + 2y s.t. x + y >= 2, x <= 1.5
+        model = create_lp_model(backend)
+        x, y = model.add_variables(2, obj=[1.0, 2.0]).tolist()
+        model.add_constraints(sp.csr_matrix([[1.0, 1.0]]), GREATER_EQUAL, 2.0)
+        c = model.add_constraint({x: 1.0}, LESS_EQUAL, 1.5)
+        model.optimize()
+        assert model.is_optimal()
+        self.assertAlmostEqual(model.objective_value(), 2.5)
+        self.assertAlmostEqual(model.values([y])[0], 0.5)
+        model.remove_constraints([c])
+        model.optimize()
+        self.assertAlmostEqual(model.objective_value(), 2.0)
+        model.set_bounds([x], 0.0, 1.0)
+        model.optimize()
+        self.assertAlmostEqual(model.objective_value(), 3.0)
+        model.set_objective([y], 0.5)
+        model.optimize()
+        self.assertAlmostEqual(model.objective_value(), 1.0)
+        model.add_constraint({x: 1.0, y: -1.0}, EQUAL, 1.0)
+        model.optimize()
+        assert not model.is_optimal()
+        assert model.is_infeasible()
+
+    def _test_mip(self, backend: str):
+        # min -x - y s.t. 2x + 2y <= 5, x, y integer
+        model = create_lp_model(backend)
+        cols = model.add_variables(2, obj=-1.0, integer=True)
+        model.add_constraints(sp.csr_matrix([[2.0, 2.0]]), LESS_EQUAL, 5.0, cols)
+        model.set_start(cols, [1, 1])
+        model.set_time_limit(60.0)
+        model.optimize()
+        assert model.is_optimal() and model.has_solution()
+        self.assertAlmostEqual(model.objective_value(), -2.0)
+        self.assertAlmostEqual(sum(model.values()), 2.0)
+
+    def _test_basis(self, backend: str):
+        # min x + y s.t. x + 2y >= 2, x - y == 0
+        model = create_lp_model(backend)
+        cols = model.add_variables(2, obj=1.0)
+        model.add_constraints(sp.csr_matrix([[1.0, 2.0]]), GREATER_EQUAL, 2.0)
+        model.add_constraints(sp.csr_matrix([[1.0, -1.0]]), EQUAL, 0.0)
+        model.optimize()
+        basis = model.get_basis()
+        self.assertIsNotNone(basis)
+        self.assertEqual(len(basis[0]), 2)
+        self.assertEqual(len(basis[1]), 2)
+        model.set_bounds(cols[:1], 1.0, 1.0)
+        model.optimize()
+        self.assertAlmostEqual(model.objective_value(), 2.0)
+        model.set_bounds(cols[:1], 0.0, math.inf)
+        model.set_basis(basis)
+        model.optimize()
+        self.assertAlmostEqual(model.objective_value(), 4.0 / 3.0)
+        # the objective after a limited dual simplex is a lower bound
+        model.set_iteration_limit(0)
+        model.set_bounds(cols[:1], 1.0, 1.0)
+        model.optimize()
+        bound = model.dual_bound()
+        self.assertIsNotNone(bound)
+        self.assertLessEqual(bound, 2.0 + 1e-6)
+        model.set_iteration_limit(None)
+        model.optimize()
+        assert model.is_optimal()
+        self.assertAlmostEqual(model.objective_value(), 2.0)
+
+    def test_backends(self):
+        for backend in LP_BACKENDS:
+            self._test_lp(backend)
+            self._test_mip(backend)
+            self._test_basis(backend)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_lp_model("cplex")
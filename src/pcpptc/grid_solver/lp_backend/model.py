@@ -0,0 +1,163 @@
+import abc
+import math
+import typing
+
+import numpy as np
+import scipy.sparse as sp
+
+LESS_EQUAL = "<="
+GREATER_EQUAL = ">="
+EQUAL = "=="
+SENSES = (LESS_EQUAL, GREATER_EQUAL, EQUAL)
+
+Values = typing.Union[float, typing.Sequence[float], np.ndarray]
+# The status of every column and row, encoded by the backend.
+Basis = typing.Tuple[np.ndarray, np.ndarray]
+
+
+class LpModel(abc.ABC):
+    """
+    A minimal interface to a (mixed integer) linear program solver that is used by
+    the grid solver. Variables are addressed by their column index and constraints by
+    the handle returned when adding them. The objective is always minimized.
+    """
+
+    @abc.abstractmethod
+    def add_variables(
+        self,
+        n: int,
+        lb: Values = 0.0,
+        ub: Values = math.inf,
+        obj: Values = 0.0,
+        integer: bool = False,
+    ) -> np.ndarray:
+        """
+        Adds n variables and returns their column indices.
+        """
+
+    @abc.abstractmethod
+    def add_constraints(
+        self,
+        matrix: sp.spmatrix,
+        sense: str,
+        rhs: Values,
+        columns: typing.Optional[typing.Sequence[int]] = None,
+    ) -> np.ndarray:
+        """
+        Adds the constraints `matrix @ x[columns] <sense> rhs` and returns their
+        handles. If `columns` is None, the i-th column of the matrix refers to the
+        i-th variable.
+        """
+
+    def add_constraint(
+        self, coefficients: typing.Dict[int, float], sense: str, rhs: float
+    ) -> int:
+        """
+        Adds a single constraint `sum(c*x[i] for i, c in coefficients) <sense> rhs`.
+        """
+        columns = list(coefficients.keys())
+        matrix = sp.csr_matrix(
+            (list(coefficients.values()), ([0] * len(columns), range(len(columns)))),
+            shape=(1, len(columns)),
+        )
+        return int(self.add_constraints(matrix, sense, [rhs], columns)[0])
+
+    @abc.abstractmethod
+    def remove_constraints(self, handles: typing.Sequence[int]):
+        pass
+
+    @abc.abstractmethod
+    def set_bounds(self, columns: typing.Sequence[int], lb: Values, ub: Values):
+        pass
+
+    @abc.abstractmethod
+    def set_objective(self, columns: typing.Sequence[int], coefficients: Values):
+        """
+        Sets the objective coefficients of the given columns.
+        """
+
+    @abc.abstractmethod
+    def set_start(self, columns: typing.Sequence[int], values: Values):
+        """
+        Sets a (partial) start solution for mixed integer programs.
+        """
+
+    @abc.abstractmethod
+    def optimize(self):
+        pass
+
+    @abc.abstractmethod
+    def is_optimal(self) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def is_infeasible(self) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def set_iteration_limit(self, limit: typing.Optional[int]):
+        """
+        Limits the simplex iterations of the following optimizations (None for no
+        limit). LPs are then solved by the dual simplex, such that `dual_bound` is
+        still available if the LP is started from a dual feasible basis (e.g., from an
+        optimal basis after changing bounds).
+        """
+
+    @abc.abstractmethod
+    def set_time_limit(self, seconds: typing.Optional[float]):
+        """
+        Limits the time of the following optimizations (None for no limit). Check
+        `has_solution` for the best solution found within the limit.
+        """
+
+    @abc.abstractmethod
+    def has_solution(self) -> bool:
+        """
+        If the last optimization found a feasible solution (not necessarily optimal).
+        """
+
+    @abc.abstractmethod
+    def objective_value(self) -> float:
+        pass
+
+    @abc.abstractmethod
+    def dual_bound(self) -> typing.Optional[float]:
+        """
+        A lower bound on the optimal objective value from the last optimization, also
+        if it has been stopped by a limit (None if there is no valid bound, e.g., the
+        dual simplex has not reached a dual feasible basis).
+        """
+
+    @abc.abstractmethod
+    def values(
+        self, columns: typing.Optional[typing.Sequence[int]] = None
+    ) -> np.ndarray:
+        """
+        The values of the variables in the last solution.
+        """
+
+    @abc.abstractmethod
+    def reduced_costs(
+        self, columns: typing.Optional[typing.Sequence[int]] = None
+    ) -> np.ndarray:
+        """
+        The reduced costs of the variables in the last solution (only for LPs).
+        """
+
+    @abc.abstractmethod
+    def get_basis(self) -> typing.Optional[Basis]:
+        """
+        The simplex basis of the last solution (None if not available). Together with
+        `set_basis`, it allows to continue from an earlier solution, e.g., from the
+        parent node in a branch and bound. The basis stays valid as long as no
+        variables or constraints are added or removed.
+        """
+
+    @abc.abstractmethod
+    def set_basis(self, basis: Basis):
+        pass
+
+    def _check_sense(self, sense: str):
+        if sense not in SENSES:
+            msg = f"Unknown constraint sense '{sense}'. Use one of {SENSES}."
+            raise ValueError(msg)